@@ -0,0 +1,121 @@
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Optional, Union
+import uvicorn
+from dotenv import load_dotenv
+from fastapi import FastAPI, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from src.rag_system import LearningPathRAG
+from src.daily_plan import parse_plan_date, window_learning_path
+from src.resources import close_async_gemini_clients, get_debug_dump_sink
+
+# Load biến môi trường
+load_dotenv()
+
+rag_system: Optional[LearningPathRAG] = None
+
+
+class LearningPathRequest(BaseModel):
+    """Tham số tạo lộ trình học tập, giống body của POST /api/learning-path trong direct_api.py"""
+    field: str
+    level: str
+    duration: Union[int, float]
+    daily_hours: Union[int, float]
+    interests: List[str]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Khởi tạo RAG system (load index, danh mục khóa học) trong thread pool khi server khởi động,
+    và đóng kết nối của client Gemini async khi server dừng (hoặc reload)
+    """
+    global rag_system
+    try:
+        rag_system = await asyncio.to_thread(LearningPathRAG, cohere_api_key=os.getenv("COHERE_API_KEY"))
+        print("Khởi tạo RAG system thành công!")
+    except Exception as e:
+        print(f"Lỗi khởi tạo RAG system: {str(e)}")
+        rag_system = None
+    yield
+    await close_async_gemini_clients()
+
+
+# Server ASGI: mỗi request tạo lộ trình là một coroutine chờ Cohere/Gemini trên event loop,
+# không chiếm một thread như Flask app trong direct_api.py
+app = FastAPI(title="API Tạo Lộ Trình Học Tập (async)", lifespan=lifespan)
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    """Trả lỗi dữ liệu không hợp lệ cùng định dạng với direct_api.py"""
+    error = exc.errors()[0] if exc.errors() else {}
+    location = ".".join(str(part) for part in error.get("loc", [])[1:])
+    message = f"Thiếu trường {location}" if error.get("type") == "missing" else f"Trường {location} không hợp lệ"
+    return JSONResponse({"error": message}, status_code=400)
+
+
+@app.post("/api/learning-path")
+async def create_learning_path(data: LearningPathRequest, username: str = "anonymous",
+                               date_from: Optional[str] = Query(None, alias="from"),
+                               date_to: Optional[str] = Query(None, alias="to")):
+    """API endpoint để tạo lộ trình học tập"""
+    if rag_system is None:
+        return JSONResponse({"error": "RAG system chưa được khởi tạo"}, status_code=500)
+    try:
+        date_from, date_to = parse_plan_date(date_from), parse_plan_date(date_to)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    print(f"Nhận được yêu cầu tạo lộ trình học tập từ {username}: {data.field}, {data.level}")
+
+    try:
+        start_time = time.time()
+        learning_path = await rag_system.acreate_learning_path(
+            field=data.field,
+            level=data.level,
+            duration=data.duration,
+            daily_hours=data.daily_hours,
+            interests=data.interests
+        )
+        print(f"Tạo lộ trình học tập hoàn tất trong {time.time() - start_time:.2f} giây")
+    except Exception as e:
+        print(f"Lỗi xử lý request: {str(e)}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    if learning_path.get("learning_path", {}).get("is_fallback", False):
+        print(f"Cảnh báo: Sử dụng lộ trình dự phòng - {learning_path['learning_path'].get('fallback_reason', 'Unknown')}")
+
+    # Chỉ trả về daily_plan trong khoảng ngày được yêu cầu
+    return window_learning_path(learning_path, date_from, date_to)
+
+
+@app.get("/health")
+async def health_check():
+    """API endpoint để kiểm tra trạng thái"""
+    status = {"status": "ok", "rag_system": rag_system is not None}
+
+    query_cache = getattr(rag_system.vectorstore, "query_cache", None) if rag_system is not None else None
+    if query_cache is not None:
+        status["query_cache"] = query_cache.stats()
+
+    if rag_system is not None:
+        status["result_cache"] = rag_system.result_cache.stats()
+        status["coalescing"] = rag_system.inflight.stats()
+        status["json_parsing"] = rag_system.json_metrics.stats()
+
+    status["debug_dump"] = get_debug_dump_sink().stats()
+
+    if rag_system is not None and rag_system.google_api_key:
+        status["gemini"] = rag_system.async_gemini_client.metrics.stats()
+
+    return status
+
+
+if __name__ == '__main__':
+    print("Khởi động ASGI API service...")
+    uvicorn.run("asgi_api:app", host="0.0.0.0", port=int(os.getenv("PORT", "8000")))
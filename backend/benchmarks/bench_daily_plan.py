@@ -0,0 +1,112 @@
+"""
+Benchmark sinh daily_plan của lộ trình dự phòng
+
+So sánh baseline_daily_plan (bản chép nguyên văn vòng lặp tính từng ngày cũ trong
+generate_fallback_learning_path) với expand_daily_plan (NumPy) cho lộ trình 1, 6, 12 và 24
+tháng, đồng thời kiểm tra hai kết quả giống hệt nhau sau khi serialize JSON.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_daily_plan.py
+"""
+import os
+import sys
+import json
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.daily_plan import build_plan_template, expand_daily_plan
+
+DURATIONS = [1, 6, 12, 24]
+DAILY_HOURS = [1, 2, 3, 1.5]
+TOPICS = ["Cú pháp cơ bản", "Cấu trúc dữ liệu", "Hàm và module", "Xử lý ngoại lệ",
+          "Lập trình hướng đối tượng", "Làm việc với file", "Thư viện chuẩn", "Kiểm thử"]
+TASKS = ["bài tập cơ bản", "dự án nhỏ", "đọc tài liệu", "viết ghi chú", "giải bài tập trực tuyến"]
+
+
+def baseline_daily_plan(start_date, duration, daily_hours, field_topics, level_tasks):
+    """
+    Bản tham chiếu: vòng lặp tính từng ngày của generate_fallback_learning_path trước khi có
+    daily_plan_template, chép nguyên văn (chỉ đổi nơi thêm ngày thành danh sách daily_plan)
+    """
+    daily_plan = []
+    # Tạo kế hoạch chi tiết theo từng ngày
+    for day in range(duration * 30):  # Ước tính 30 ngày mỗi tháng
+        current_date = start_date + timedelta(days=day)
+        weekday = current_date.weekday()
+        day_of_week = ["Thứ Hai", "Thứ Ba", "Thứ Tư", "Thứ Năm", "Thứ Sáu", "Thứ Bảy", "Chủ Nhật"][weekday]
+
+        # Tính toán giai đoạn hiện tại để tạo nội dung phù hợp
+        phase = min(day // 30 + 1, 3)  # Giai đoạn 1, 2, hoặc 3
+
+        # Tạo các nhiệm vụ học tập phù hợp với giai đoạn và trình độ
+        if weekday == 6:  # Chủ nhật
+            if phase == 1:
+                tasks = [
+                    f"Ôn tập kiến thức cơ bản về {field_topics[day % len(field_topics)]} ({daily_hours/2} giờ)",
+                    f"Làm bài tập thực hành về {field_topics[(day+1) % len(field_topics)]} ({daily_hours/2} giờ)"
+                ]
+            elif phase == 2:
+                tasks = [
+                    f"Ôn tập và tổng hợp kiến thức tuần trước ({daily_hours/3} giờ)",
+                    f"Thực hành dự án nhỏ về {field_topics[(day+2) % len(field_topics)]} ({daily_hours/3} giờ)",
+                    f"Lập kế hoạch học tập cho tuần mới ({daily_hours/3} giờ)"
+                ]
+            else:
+                tasks = [
+                    f"Đánh giá tiến độ dự án ({daily_hours/3} giờ)",
+                    f"Thực hành nâng cao về {field_topics[(day+3) % len(field_topics)]} ({daily_hours/3} giờ)",
+                    f"Chuẩn bị nội dung thuyết trình dự án ({daily_hours/3} giờ)"
+                ]
+        else:
+            # Ngày thường
+            if phase == 1:
+                time_per_task = daily_hours / 2
+                tasks = [
+                    f"Học lý thuyết về {field_topics[day % len(field_topics)]} ({time_per_task} giờ)",
+                    f"Thực hành {level_tasks[day % len(level_tasks)]} ({time_per_task} giờ)"
+                ]
+            elif phase == 2:
+                time_per_task = daily_hours / 3
+                tasks = [
+                    f"Học kỹ thuật {field_topics[(day+1) % len(field_topics)]} ({time_per_task} giờ)",
+                    f"Ứng dụng {level_tasks[(day+1) % len(level_tasks)]} ({time_per_task} giờ)",
+                    f"Nghiên cứu tình huống thực tế về {field_topics[(day+2) % len(field_topics)]} ({time_per_task} giờ)"
+                ]
+            else:
+                time_per_task = daily_hours / 3
+                tasks = [
+                    f"Học nâng cao về {field_topics[(day+3) % len(field_topics)]} ({time_per_task} giờ)",
+                    f"Phát triển dự án ứng dụng {field_topics[(day+4) % len(field_topics)]} ({time_per_task} giờ)",
+                    f"Giải quyết vấn đề phức tạp trong {field_topics[(day+5) % len(field_topics)]} ({time_per_task} giờ)"
+                ]
+
+        daily_plan.append({
+            "date": current_date.strftime("%Y-%m-%d"),
+            "day_of_week": day_of_week,
+            "tasks": tasks
+        })
+    return daily_plan
+
+
+def main():
+    print(f"{'Tháng':>5} {'Số ngày':>8} {'Từng ngày (ms)':>15} {'NumPy (ms)':>11} {'Tăng tốc':>9}")
+    for duration in DURATIONS:
+        start_date = datetime(2025, 4, 24)
+        for daily_hours in DAILY_HOURS:
+            template = build_plan_template(start_date, duration * 30, daily_hours, TOPICS, TASKS)
+            expected = json.dumps(baseline_daily_plan(start_date, duration, daily_hours, TOPICS, TASKS), ensure_ascii=False)
+            actual = json.dumps(expand_daily_plan(template), ensure_ascii=False)
+            assert actual == expected, f"Kết quả khác nhau với lộ trình {duration} tháng, {daily_hours} giờ/ngày"
+
+        template = build_plan_template(start_date, duration * 30, 2, TOPICS, TASKS)
+        number = max(2000 // duration, 20)
+        loop_time = min(timeit.repeat(lambda: baseline_daily_plan(start_date, duration, 2, TOPICS, TASKS),
+                                      number=number, repeat=5)) / number
+        numpy_time = min(timeit.repeat(lambda: expand_daily_plan(template), number=number, repeat=5)) / number
+        print(f"{duration:>5} {duration * 30:>8} {loop_time * 1000:>15.3f} {numpy_time * 1000:>11.3f} {loop_time / numpy_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
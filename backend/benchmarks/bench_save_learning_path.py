@@ -0,0 +1,99 @@
+"""
+Benchmark lưu lộ trình học tập vào database (POST /api/progress/learning-paths/<id>/save)
+
+Tạo lộ trình dự phòng 3, 12 và 24 tháng rồi đo thời gian lưu và số câu SQL được thực thi,
+trên một database SQLite tạm (learning_path.db của dự án không bị sửa).
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_save_learning_path.py
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DURATIONS = [3, 12, 24]
+REPEAT = 5
+TOPICS = ["Cú pháp cơ bản", "Cấu trúc dữ liệu", "Hàm và module", "Xử lý ngoại lệ",
+          "Lập trình hướng đối tượng", "Làm việc với file", "Thư viện chuẩn", "Kiểm thử"]
+TASKS = ["bài tập cơ bản", "dự án nhỏ", "đọc tài liệu", "viết ghi chú", "giải bài tập trực tuyến"]
+
+
+def make_learning_path(duration):
+    from src.daily_plan import build_plan_template
+
+    return {
+        "field": "Python",
+        "level": "Beginner",
+        "duration": duration,
+        "daily_hours": 2,
+        "phases": [{"name": f"Giai đoạn {i + 1}", "duration": duration * 10, "tasks": []} for i in range(3)],
+        "daily_plan": [],
+        "daily_plan_template": build_plan_template(datetime(2025, 4, 24), duration * 30, 2, TOPICS, TASKS)
+    }
+
+
+def main():
+    # database.py mở ./learning_path.db theo thư mục hiện tại nên chạy trong thư mục tạm
+    workdir = tempfile.mkdtemp(prefix="bench_save_")
+    os.chdir(workdir)
+    try:
+        from flask import Flask
+        from sqlalchemy import event
+        from src.database import engine, SessionLocal, User, Task
+        from src.auth_api import active_tokens
+        from src.progress_api import progress_api
+
+        db = SessionLocal()
+        user = User(username="bench", email="bench@example.com", hashed_password="-")
+        db.add(user)
+        db.commit()
+        active_tokens["bench"] = user.id
+        db.close()
+
+        app = Flask(__name__)
+        app.register_blueprint(progress_api)
+        client = app.test_client()
+        headers = {"Authorization": "Bearer bench"}
+
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        print(f"{'Tháng':>5} {'Số task':>8} {'Tạo mới (ms)':>13} {'Lưu lại (ms)':>13} {'Số câu SQL':>11}")
+        for duration in DURATIONS:
+            body = {"learning_path": make_learning_path(duration)}
+
+            create_times = []
+            path_id = 0
+            for _ in range(REPEAT):
+                statements.clear()
+                start = time.perf_counter()
+                response = client.post("/api/progress/learning-paths/0/save", json=body, headers=headers)
+                create_times.append(time.perf_counter() - start)
+                path_id = response.get_json()["path_id"]
+            statement_count = len(statements)
+
+            # Lưu lại lộ trình đã có (xóa task cũ rồi thêm lại)
+            update_times = []
+            for _ in range(REPEAT):
+                start = time.perf_counter()
+                client.post(f"/api/progress/learning-paths/{path_id}/save", json=body, headers=headers)
+                update_times.append(time.perf_counter() - start)
+
+            db = SessionLocal()
+            task_count = db.query(Task).filter(Task.learning_path_id == path_id).count()
+            db.close()
+            print(f"{duration:>5} {task_count:>8} {min(create_times) * 1000:>13.1f} "
+                  f"{min(update_times) * 1000:>13.1f} {statement_count:>11}")
+    finally:
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
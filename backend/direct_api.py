@@ -1,12 +1,15 @@
 import os
+import copy
 import json
 import time
 import sys
 import io
-from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from dotenv import load_dotenv
 from src.rag_system import LearningPathRAG
+from src.job_queue import LearningPathJobQueue, JobQueueFullError
+from src.daily_plan import parse_daily_hours, parse_duration, parse_plan_date, window_learning_path
+from src.resources import get_debug_dump_sink
 
 # Cấu hình encoding cho console
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
@@ -49,6 +52,36 @@ except Exception as e:
     print(f"Lỗi khởi tạo RAG system: {str(e)}")
     rag_system = None
 
+# Hàng đợi job cho chế độ submit/poll, job được lưu trong SQLite
+try:
+    job_queue = LearningPathJobQueue(rag_system) if rag_system is not None else None
+except Exception as e:
+    print(f"Lỗi khởi tạo hàng đợi job: {str(e)}")
+    job_queue = None
+
+# Nơi ghi dữ liệu debug (mặc định tắt, xem src/debug_dump.py)
+debug_sink = get_debug_dump_sink()
+
+REQUIRED_LEARNING_PATH_FIELDS = ['field', 'level', 'duration', 'daily_hours', 'interests']
+
+def validate_learning_path_request(data):
+    """Kiểm tra dữ liệu request tạo lộ trình, trả về thông báo lỗi hoặc None"""
+    if not isinstance(data, dict):
+        return "Dữ liệu request không hợp lệ"
+    for field in REQUIRED_LEARNING_PATH_FIELDS:
+        if field not in data:
+            return f"Thiếu trường {field}"
+    try:
+        parse_duration(data['duration'])
+        parse_daily_hours(data['daily_hours'])
+    except ValueError as e:
+        return str(e)
+    return None
+
+def get_plan_window():
+    """Đọc khoảng ngày ?from=&to= (YYYY-MM-DD) của daily_plan, raise ValueError nếu sai định dạng"""
+    return parse_plan_date(request.args.get('from')), parse_plan_date(request.args.get('to'))
+
 @app.route('/api/learning-path', methods=['POST'])
 def create_learning_path():
     """API endpoint để tạo lộ trình học tập"""
@@ -62,10 +95,13 @@ def create_learning_path():
         username = request.args.get('username', 'anonymous')
         
         # Kiểm tra dữ liệu
-        required_fields = ['field', 'level', 'duration', 'daily_hours', 'interests']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Thiếu trường {field}"}), 400
+        error = validate_learning_path_request(data)
+        if error:
+            return jsonify({"error": error}), 400
+        try:
+            date_from, date_to = get_plan_window()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         print(f"Nhận được yêu cầu tạo lộ trình học tập từ {username}: {data['field']}, {data['level']}")
         
@@ -81,29 +117,141 @@ def create_learning_path():
         elapsed_time = time.time() - start_time
         print(f"Tạo lộ trình học tập hoàn tất trong {elapsed_time:.2f} giây")
         
-        # Lưu kết quả vào file để debug
-        try:
-            save_path = f"learning_path_{username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            with open(save_path, "w", encoding="utf-8") as f:
-                json.dump(learning_path, f, ensure_ascii=False, indent=2)
-            print(f"Đã lưu lộ trình học tập vào file {save_path}")
-        except Exception as e:
-            print(f"Không thể lưu lộ trình học tập: {str(e)}")
+        # Lưu kết quả để debug (bật bằng DEBUG_DUMP_ENABLED, ghi trên thread nền)
+        if debug_sink.sample():
+            debug_sink.write("api_learning_path", copy.deepcopy(learning_path), username=username, elapsed=round(elapsed_time, 3))
         
         # Kiểm tra xem có phải là fallback không
         if "learning_path" in learning_path and learning_path["learning_path"].get("is_fallback", False):
             print(f"Cảnh báo: Sử dụng lộ trình dự phòng - {learning_path['learning_path'].get('fallback_reason', 'Unknown')}")
         
-        return jsonify(learning_path), 200
+        # Chỉ trả về daily_plan trong khoảng ngày được yêu cầu
+        return jsonify(window_learning_path(learning_path, date_from, date_to)), 200
         
     except Exception as e:
         print(f"Lỗi xử lý request: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/learning-path/stream', methods=['POST'])
+def stream_learning_path():
+    """API endpoint tạo lộ trình học tập dạng server-sent events"""
+    if rag_system is None:
+        return jsonify({"error": "RAG system chưa được khởi tạo"}), 500
+    
+    data = request.json
+    username = request.args.get('username', 'anonymous')
+    
+    error = validate_learning_path_request(data)
+    if error:
+        return jsonify({"error": error}), 400
+    try:
+        date_from, date_to = get_plan_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    print(f"Nhận được yêu cầu stream lộ trình học tập từ {username}: {data['field']}, {data['level']}")
+    
+    def generate():
+        # Mỗi khóa học, giai đoạn, ngày học được gửi ngay khi Gemini sinh xong
+        for event, payload in rag_system.stream_learning_path(
+            field=data['field'],
+            level=data['level'],
+            duration=data['duration'],
+            daily_hours=data['daily_hours'],
+            interests=data['interests']
+        ):
+            if event == "complete":
+                payload = window_learning_path(payload, date_from, date_to)
+            yield f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False, default=float)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@app.route('/api/learning-path/jobs', methods=['POST'])
+def submit_learning_path_job():
+    """API endpoint gửi yêu cầu tạo lộ trình học tập, trả về job id ngay lập tức"""
+    if job_queue is None:
+        return jsonify({"error": "Hàng đợi job chưa được khởi tạo"}), 500
+    
+    data = request.json
+    username = request.args.get('username', 'anonymous')
+    
+    error = validate_learning_path_request(data)
+    if error:
+        return jsonify({"error": error}), 400
+    
+    params = {field: data[field] for field in REQUIRED_LEARNING_PATH_FIELDS}
+    try:
+        job_id = job_queue.submit(params, username=username)
+    except JobQueueFullError as e:
+        print(f"Từ chối job từ {username}: {str(e)}")
+        return jsonify({"error": "Hệ thống đang quá tải, vui lòng thử lại sau"}), 503, {"Retry-After": "30"}
+    except Exception as e:
+        print(f"Lỗi tạo job: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/learning-path/jobs/{job_id}"
+    }), 202
+
+@app.route('/api/learning-path/jobs/<job_id>', methods=['GET'])
+def get_learning_path_job(job_id):
+    """API endpoint lấy trạng thái hoặc kết quả của job tạo lộ trình học tập"""
+    if job_queue is None:
+        return jsonify({"error": "Hàng đợi job chưa được khởi tạo"}), 500
+    
+    try:
+        date_from, date_to = get_plan_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Không tìm thấy job"}), 404
+    if job.get("result"):
+        try:
+            job["result"] = window_learning_path(job["result"], date_from, date_to)
+        except Exception as e:
+            print(f"Lỗi xử lý kết quả job {job_id}: {str(e)}")
+            return jsonify({"error": f"Kết quả job không hợp lệ: {str(e)}"}), 500
+    return jsonify(job), 200
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """API endpoint để kiểm tra trạng thái"""
-    return jsonify({"status": "ok", "rag_system": rag_system is not None}), 200
+    status = {"status": "ok", "rag_system": rag_system is not None}
+    
+    # Thống kê cache vector câu truy vấn
+    query_cache = getattr(rag_system.vectorstore, "query_cache", None) if rag_system is not None else None
+    if query_cache is not None:
+        status["query_cache"] = query_cache.stats()
+    
+    # Thống kê cache lộ trình học tập
+    if rag_system is not None:
+        status["result_cache"] = rag_system.result_cache.stats()
+        status["coalescing"] = rag_system.inflight.stats()
+        status["json_parsing"] = rag_system.json_metrics.stats()
+    
+    # Thống kê ghi dữ liệu debug
+    status["debug_dump"] = debug_sink.stats()
+    
+    # Thống kê các lần gọi Gemini API
+    if rag_system is not None and rag_system.google_api_key:
+        status["gemini"] = rag_system.gemini_client.metrics.stats()
+    
+    # Số job đang chờ/đang chạy
+    if job_queue is not None:
+        status["jobs"] = job_queue.stats()
+    
+    return jsonify(status), 200
 
 @app.route('/', methods=['GET'])
 def home():
@@ -0,0 +1,118 @@
+"""
+In EXPLAIN QUERY PLAN cho các câu SQL mà mỗi endpoint của progress API thực thi
+
+Tool chạy trên một bản sao của learning_path.db (database gốc không bị sửa): gọi lần lượt
+từng endpoint bằng Flask test client, ghi lại các câu SQL được thực thi rồi in query plan
+của từng câu. Các bước SCAN toàn bảng tasks/progress được đánh dấu để dễ phát hiện
+truy vấn thiếu index.
+
+Chạy từ thư mục backend:
+    python explain_queries.py [--db learning_path.db] [--username admin]
+"""
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+WATCHED_TABLES = ("tasks", "progress", "learning_paths")
+
+
+def capture_statements(engine, event, call):
+    """Gọi call() và trả về danh sách (câu SQL, tham số) đã được thực thi"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = call()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return response, statements
+
+
+def print_plans(engine, name, response, statements):
+    print(f"\n=== {name} (HTTP {response.status_code}, {len(statements)} câu SQL)")
+    with engine.connect() as connection:
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+            print("\n" + " ".join(statement.split()))
+            for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters):
+                detail = row[-1]
+                full_scan = detail.startswith("SCAN") and any(f" {table}" in detail for table in WATCHED_TABLES) \
+                    and "INDEX" not in detail
+                print(f"  {'!!' if full_scan else '  '} {detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=os.path.join(BACKEND_DIR, "learning_path.db"), help="File database SQLite")
+    parser.add_argument("--username", help="Người dùng dùng để gọi API (mặc định: người dùng có nhiều task nhất)")
+    args = parser.parse_args()
+
+    # database.py mở ./learning_path.db theo thư mục hiện tại nên chạy trong thư mục tạm chứa bản sao
+    workdir = tempfile.mkdtemp(prefix="explain_queries_")
+    shutil.copy(args.db, os.path.join(workdir, "learning_path.db"))
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(workdir)
+    try:
+        from flask import Flask
+        from sqlalchemy import event, func
+        from src.database import engine, SessionLocal, User, LearningPath, Task
+        from src.auth_api import active_tokens
+        from src.progress_api import progress_api
+
+        db = SessionLocal()
+        try:
+            query = db.query(User)
+            if args.username:
+                user = query.filter(User.username == args.username).first()
+            else:
+                user = query.outerjoin(Task, Task.user_id == User.id).group_by(User.id) \
+                    .order_by(func.count(Task.id).desc()).first()
+            if user is None:
+                print("Không tìm thấy người dùng")
+                return 1
+            path = db.query(LearningPath).filter(LearningPath.user_id == user.id).first()
+            task = db.query(Task).filter(Task.user_id == user.id).first()
+            user_id, username = user.id, user.username
+            path_id = path.id if path else 0
+            task_id = task.id if task else 0
+        finally:
+            db.close()
+
+        app = Flask(__name__)
+        app.register_blueprint(progress_api)
+        client = app.test_client()
+        active_tokens["explain-queries"] = user_id
+        headers = {"Authorization": "Bearer explain-queries"}
+        print(f"Database: {args.db} (bản sao tại {workdir}), người dùng: {username}")
+
+        endpoints = [
+            ("GET /api/progress/learning-paths",
+             lambda: client.get("/api/progress/learning-paths", headers=headers)),
+            (f"GET /api/progress/learning-paths/{path_id}",
+             lambda: client.get(f"/api/progress/learning-paths/{path_id}", headers=headers)),
+            (f"POST /api/progress/tasks/{task_id}/toggle",
+             lambda: client.post(f"/api/progress/tasks/{task_id}/toggle", headers=headers)),
+            (f"POST /api/progress/tasks/{task_id}/notes",
+             lambda: client.post(f"/api/progress/tasks/{task_id}/notes", headers=headers, json={"notes": "explain"})),
+            ("GET /api/progress/stats/weekly",
+             lambda: client.get("/api/progress/stats/weekly", headers=headers)),
+        ]
+        for name, call in endpoints:
+            response, statements = capture_statements(engine, event, call)
+            print_plans(engine, name, response, statements)
+        return 0
+    finally:
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
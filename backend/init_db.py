@@ -3,12 +3,10 @@ from werkzeug.security import generate_password_hash
 from datetime import datetime
 import os
 import logging
+from src.logging_config import setup_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Configure logging (shared by the whole app, see src/logging_config.py)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 def init_db():
@@ -0,0 +1,34 @@
+from src.database import SessionLocal
+from src.phase_progress import rebuild_phase_counters
+import argparse
+import logging
+from src.logging_config import setup_logging
+
+# Configure logging (shared by the whole app, see src/logging_config.py)
+setup_logging()
+logger = logging.getLogger(__name__)
+
+def repair_progress(learning_path_ids=None):
+    """Rebuild the per-phase task counters of progress rows from the tasks table"""
+    try:
+        db = SessionLocal()
+        try:
+            updated = rebuild_phase_counters(db, learning_path_ids)
+            db.commit()
+            logger.info(f"Rebuilt phase counters, {updated} progress rows updated")
+        finally:
+            db.close()
+        
+        return True
+    except Exception as e:
+        logger.error(f"Error repairing progress: {str(e)}")
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild completed/total task counters of progress rows")
+    parser.add_argument("--path-id", type=int, action="append", dest="path_ids",
+                        help="Only rebuild this learning path (can be repeated, default: all paths)")
+    args = parser.parse_args()
+    
+    logger.info("Repairing progress counters...")
+    repair_progress(args.path_ids)
@@ -1 +1,4 @@
-# This file is intentionally empty to mark the directory as a Python package 
\ No newline at end of file
+from dotenv import load_dotenv
+
+# Load biến môi trường từ .env trước khi các module con đọc cấu hình ở cấp module
+load_dotenv()
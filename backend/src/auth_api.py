@@ -10,16 +10,10 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy import and_, or_, func
 
 from src.database import SessionLocal, User, LearningPath, Task, Progress
+from src.logging_config import setup_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('auth.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging (shared by the whole app, see src/logging_config.py)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Create blueprint
@@ -0,0 +1,273 @@
+import os
+import numpy as np
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+WEEKDAY_NAMES = ["Thứ Hai", "Thứ Ba", "Thứ Tư", "Thứ Năm", "Thứ Sáu", "Thứ Bảy", "Chủ Nhật"]
+
+DATE_FORMAT = "%Y-%m-%d"
+
+# Số ngày của mỗi giai đoạn trong lộ trình dự phòng (giai đoạn cuối kéo dài đến hết lộ trình)
+DAYS_PER_PHASE = 30
+
+# Số ngày ước tính cho mỗi tháng của lộ trình
+DAYS_PER_MONTH = 30
+
+# Số ngày tối đa của một daily_plan (giới hạn cứng khi sinh hoặc lưu lộ trình)
+DAILY_PLAN_MAX_DAYS = int(os.getenv("DAILY_PLAN_MAX_DAYS", str(5 * 12 * DAYS_PER_MONTH)))
+
+# Quy tắc sinh nhiệm vụ hàng ngày của lộ trình dự phòng theo giai đoạn.
+# Mỗi nhiệm vụ: (mẫu câu, danh sách lấy nội dung "topics"/"tasks"/None, độ lệch chỉ số, số phần chia daily_hours).
+# Nội dung của ngày thứ day là danh_sách[(day + độ lệch) % len(danh_sách)].
+FALLBACK_PHASE_RULES = [
+    {
+        "weekday": [
+            ("Học lý thuyết về {}", "topics", 0, 2),
+            ("Thực hành {}", "tasks", 0, 2)
+        ],
+        "sunday": [
+            ("Ôn tập kiến thức cơ bản về {}", "topics", 0, 2),
+            ("Làm bài tập thực hành về {}", "topics", 1, 2)
+        ]
+    },
+    {
+        "weekday": [
+            ("Học kỹ thuật {}", "topics", 1, 3),
+            ("Ứng dụng {}", "tasks", 1, 3),
+            ("Nghiên cứu tình huống thực tế về {}", "topics", 2, 3)
+        ],
+        "sunday": [
+            ("Ôn tập và tổng hợp kiến thức tuần trước", None, 0, 3),
+            ("Thực hành dự án nhỏ về {}", "topics", 2, 3),
+            ("Lập kế hoạch học tập cho tuần mới", None, 0, 3)
+        ]
+    },
+    {
+        "weekday": [
+            ("Học nâng cao về {}", "topics", 3, 3),
+            ("Phát triển dự án ứng dụng {}", "topics", 4, 3),
+            ("Giải quyết vấn đề phức tạp trong {}", "topics", 5, 3)
+        ],
+        "sunday": [
+            ("Đánh giá tiến độ dự án", None, 0, 3),
+            ("Thực hành nâng cao về {}", "topics", 3, 3),
+            ("Chuẩn bị nội dung thuyết trình dự án", None, 0, 3)
+        ]
+    }
+]
+
+
+def build_plan_template(start_date: datetime, total_days: int, daily_hours: Any,
+                        topics: List[str], tasks: List[str]) -> Dict[str, Any]:
+    """
+    Tạo mô tả rút gọn của daily_plan dự phòng
+
+    Kích thước chỉ phụ thuộc số chủ đề và nhiệm vụ, không phụ thuộc thời lượng lộ trình;
+    các ngày được sinh khi cần bằng expand_daily_plan.
+    """
+    return {
+        "start_date": start_date.strftime(DATE_FORMAT),
+        "total_days": total_days,
+        "daily_hours": daily_hours,
+        "topics": topics,
+        "tasks": tasks
+    }
+
+
+def expand_daily_plan(template: Dict[str, Any], first_day: int = 0, last_day: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Sinh các ngày first_day..last_day-1 (tính từ 0) của daily_plan từ mô tả rút gọn
+
+    Ngày và thứ trong tuần được tính một lần cho cả khoảng bằng mảng datetime64 của NumPy. Mỗi
+    nhiệm vụ chỉ có len(danh sách) câu khác nhau nên các câu được định dạng trước một lần, sau đó
+    chọn cho từng ngày bằng chỉ số mảng thay vì định dạng lại ở mỗi ngày.
+    """
+    total_days = template["total_days"]
+    last_day = total_days if last_day is None else min(last_day, total_days)
+    first_day = max(first_day, 0)
+    if first_day >= last_day:
+        return []
+
+    days = np.arange(first_day, last_day, dtype=np.int64)
+    dates = np.datetime64(template["start_date"], "D") + days
+    date_strings = np.datetime_as_string(dates, unit="D").tolist()
+    # 1970-01-01 (ngày 0 của datetime64) là Thứ Năm, weekday() = 3
+    weekdays = (dates.astype(np.int64) + 3) % 7
+    phases = np.minimum(days // DAYS_PER_PHASE, len(FALLBACK_PHASE_RULES) - 1)
+
+    daily_hours = template["daily_hours"]
+    sources = {"topics": template["topics"], "tasks": template["tasks"]}
+    day_tasks: List[Optional[List[str]]] = [None] * len(days)
+
+    for phase, rules in enumerate(FALLBACK_PHASE_RULES):
+        for kind, is_sunday in (("weekday", weekdays != 6), ("sunday", weekdays == 6)):
+            positions = np.flatnonzero((phases == phase) & is_sunday)
+            if positions.size == 0:
+                continue
+            columns = []
+            for text, source, offset, parts in rules[kind]:
+                suffix = f" ({daily_hours / parts} giờ)"
+                if source is None:
+                    columns.append([text + suffix] * positions.size)
+                    continue
+                items = sources[source]
+                texts = np.array([text.format(item) + suffix for item in items], dtype=object)
+                columns.append(texts[(days[positions] + offset) % len(items)].tolist())
+            for position, tasks in zip(positions.tolist(), zip(*columns)):
+                day_tasks[position] = list(tasks)
+
+    return [
+        {"date": date_string, "day_of_week": WEEKDAY_NAMES[weekday], "tasks": tasks}
+        for date_string, weekday, tasks in zip(date_strings, weekdays.tolist(), day_tasks)
+    ]
+
+
+def parse_plan_date(value: Optional[str]) -> Optional[date]:
+    """Parse tham số ngày YYYY-MM-DD, trả về None nếu không có"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, DATE_FORMAT).date()
+    except ValueError:
+        raise ValueError(f"Ngày không hợp lệ: {value} (định dạng YYYY-MM-DD)")
+
+
+def resolve_window(start: date, end: date, date_from: Optional[date], date_to: Optional[date]) -> Tuple[date, date]:
+    """Xác định khoảng ngày cần trả về; thiếu from/to thì lấy từ ngày bắt đầu/đến ngày cuối của lộ trình"""
+    return date_from or start, date_to or end
+
+
+def parse_duration(duration: Any) -> float:
+    """Chuyển thời lượng lộ trình (tháng, có thể là chuỗi từ client) thành số, raise ValueError nếu không hợp lệ"""
+    try:
+        months = float(duration)
+    except (TypeError, ValueError):
+        raise ValueError(f"Thời lượng không hợp lệ: {duration!r}")
+    if not months >= 0:
+        raise ValueError(f"Thời lượng không hợp lệ: {duration!r}")
+    return months
+
+
+def parse_daily_hours(daily_hours: Any) -> Union[int, float]:
+    """
+    Chuyển số giờ học mỗi ngày (có thể là chuỗi từ client) thành số, raise ValueError nếu không hợp lệ
+
+    Giá trị nguyên được trả về dạng int để nội dung nhiệm vụ giống hệt khi client gửi số nguyên.
+    """
+    if isinstance(daily_hours, bool):
+        raise ValueError(f"Số giờ mỗi ngày không hợp lệ: {daily_hours!r}")
+    try:
+        hours = float(daily_hours)
+    except (TypeError, ValueError):
+        raise ValueError(f"Số giờ mỗi ngày không hợp lệ: {daily_hours!r}")
+    if not 0 <= hours <= 24:
+        raise ValueError(f"Số giờ mỗi ngày không hợp lệ: {daily_hours!r}")
+    return int(hours) if hours.is_integer() else hours
+
+
+def plan_days(duration: Any) -> int:
+    """Số ngày của daily_plan cho thời lượng duration tháng, không vượt quá DAILY_PLAN_MAX_DAYS"""
+    return min(int(parse_duration(duration) * DAYS_PER_MONTH), DAILY_PLAN_MAX_DAYS)
+
+
+def validate_plan_template(template: Any, duration: Any) -> Dict[str, Any]:
+    """
+    Kiểm tra mô tả rút gọn daily_plan do client gửi lên trước khi sinh các ngày
+
+    total_days không được vượt quá số ngày ứng với thời lượng lộ trình (plan_days), để một
+    template sửa tay không thể sinh ra hàng triệu task.
+
+    Raises:
+        ValueError: Nếu template không hợp lệ
+    """
+    if not isinstance(template, dict):
+        raise ValueError("daily_plan_template không hợp lệ")
+    parse_plan_date(template.get("start_date"))
+    total_days = template.get("total_days")
+    if isinstance(total_days, bool) or not isinstance(total_days, int) or total_days < 0:
+        raise ValueError(f"daily_plan_template.total_days không hợp lệ: {total_days!r}")
+    max_days = plan_days(duration)
+    if total_days > max_days:
+        raise ValueError(f"daily_plan_template.total_days ({total_days}) vượt quá {max_days} ngày của lộ trình")
+    daily_hours = template.get("daily_hours")
+    if isinstance(daily_hours, bool) or not isinstance(daily_hours, (int, float)):
+        raise ValueError(f"daily_plan_template.daily_hours không hợp lệ: {daily_hours!r}")
+    for key in ("topics", "tasks"):
+        items = template.get(key)
+        if not isinstance(items, list) or not items or not all(isinstance(item, str) for item in items):
+            raise ValueError(f"daily_plan_template.{key} phải là danh sách chuỗi không rỗng")
+    return template
+
+
+def materialize_daily_plan(learning_path: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Toàn bộ daily_plan của lộ trình (sinh từ mô tả rút gọn nếu có)
+
+    Các ngày trong daily_plan được ưu tiên hơn ngày cùng ngày tháng sinh từ template, nên ngày
+    client đã sửa (kể cả khi chỉ gửi lại một khoảng ngày kèm template) không bị mất khi lưu.
+
+    Raises:
+        ValueError: Nếu template không hợp lệ hoặc daily_plan dài hơn DAILY_PLAN_MAX_DAYS
+    """
+    daily_plan = learning_path.get("daily_plan") or []
+    if len(daily_plan) > DAILY_PLAN_MAX_DAYS:
+        raise ValueError(f"daily_plan dài hơn {DAILY_PLAN_MAX_DAYS} ngày")
+    template = learning_path.get("daily_plan_template")
+    if not template:
+        return daily_plan
+
+    days = expand_daily_plan(validate_plan_template(template, learning_path.get("duration", 0)))
+    edited = {day.get("date"): day for day in daily_plan if isinstance(day, dict)}
+    return [edited.get(day["date"], day) for day in days]
+
+
+def window_learning_path(result: Dict[str, Any], date_from: Optional[date] = None,
+                         date_to: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Giới hạn daily_plan của lộ trình trong khoảng [date_from, date_to]
+
+    Không có from/to thì trả về toàn bộ daily_plan và bỏ daily_plan_template (client hiển thị và
+    lưu daily_plan nên mặc định phải đầy đủ; không gửi cả hai dạng). Khi có from/to, lộ trình có
+    daily_plan_template chỉ sinh các ngày trong khoảng và giữ template để client sinh hoặc lưu các
+    ngày còn lại; lộ trình có daily_plan đầy đủ (từ Gemini) được lọc theo ngày. Kết quả được thêm
+    daily_plan_window gồm khoảng ngày đã trả về và tổng số ngày để client lấy tiếp các phần khác.
+
+    Returns:
+        Bản sao nông của result (result không bị sửa)
+    """
+    learning_path = result.get("learning_path")
+    if not isinstance(learning_path, dict):
+        return result
+
+    has_window = date_from is not None or date_to is not None
+    template = learning_path.get("daily_plan_template")
+    if template:
+        start = datetime.strptime(template["start_date"], DATE_FORMAT).date()
+        total_days = template["total_days"]
+        end = start + timedelta(days=max(total_days - 1, 0))
+        date_from, date_to = resolve_window(start, end, date_from, date_to)
+        days = expand_daily_plan(template, (date_from - start).days, (date_to - start).days + 1)
+    else:
+        daily_plan = learning_path.get("daily_plan") or []
+        total_days = len(daily_plan)
+        try:
+            start = datetime.strptime(daily_plan[0]["date"], DATE_FORMAT).date() if daily_plan else date.today()
+            end = datetime.strptime(daily_plan[-1]["date"], DATE_FORMAT).date() if daily_plan else start
+        except (KeyError, TypeError, ValueError):
+            start = end = date.today()
+        date_from, date_to = resolve_window(start, end, date_from, date_to)
+        first, last = date_from.strftime(DATE_FORMAT), date_to.strftime(DATE_FORMAT)
+        days = [day for day in daily_plan if first <= str(day.get("date", "")) <= last] if has_window else daily_plan
+
+    windowed_path = dict(learning_path)
+    windowed_path["daily_plan"] = days
+    if not has_window:
+        windowed_path.pop("daily_plan_template", None)
+    windowed_path["daily_plan_window"] = {
+        "from": date_from.strftime(DATE_FORMAT),
+        "to": date_to.strftime(DATE_FORMAT),
+        "total_days": total_days
+    }
+    windowed = dict(result)
+    windowed["learning_path"] = windowed_path
+    return windowed
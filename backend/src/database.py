@@ -1,8 +1,11 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, ForeignKey, Float
+import logging
+from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Index, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 # Tạo database URL
 SQLALCHEMY_DATABASE_URL = "sqlite:///./learning_path.db"
 
@@ -45,6 +48,11 @@ class LearningPath(Base):
     total_days = Column(Integer)
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Danh sách lộ trình của người dùng, mới nhất trước
+        Index("ix_learning_paths_user_created", "user_id", "created_at"),
+    )
+    
     # Relationships
     user = relationship("User", back_populates="learning_paths")
     tasks = relationship("Task", back_populates="learning_path")
@@ -63,6 +71,15 @@ class Task(Base):
     phase = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Task của một lộ trình theo ngày (chi tiết lộ trình, đếm task, xóa khi lưu lại)
+        Index("ix_tasks_path_date", "learning_path_id", "date"),
+        # Đếm task đã hoàn thành trong một giai đoạn (toggle)
+        Index("ix_tasks_path_phase_completed", "learning_path_id", "phase", "completed"),
+        # Task đã hoàn thành của người dùng theo ngày (thống kê tuần, streak)
+        Index("ix_tasks_user_completed_date", "user_id", "completed", "date"),
+    )
+    
     # Relationships
     learning_path = relationship("LearningPath", back_populates="tasks")
     user = relationship("User", back_populates="tasks")
@@ -75,8 +92,17 @@ class Progress(Base):
     learning_path_id = Column(Integer, ForeignKey("learning_paths.id"))
     skill_name = Column(String)
     progress_percentage = Column(Float)
+    # Số task đã hoàn thành / tổng số task của giai đoạn, cập nhật cùng transaction khi toggle
+    # (NULL với dữ liệu cũ, được tính lại khi cần hoặc bằng repair_progress.py)
+    completed_tasks = Column(Integer)
+    total_tasks = Column(Integer)
     last_updated = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Tiến độ theo kỹ năng (giai đoạn) của một lộ trình
+        Index("ix_progress_path_skill", "learning_path_id", "skill_name"),
+    )
+    
     # Relationships
     user = relationship("User", back_populates="progress")
     learning_path = relationship("LearningPath", back_populates="progress")
@@ -91,8 +117,68 @@ class ChatHistory(Base):
     resources = Column(String)  # JSON string of resources
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+
+    id = Column(String, primary_key=True, index=True)  # uuid4 hex
+    username = Column(String)
+    status = Column(String, index=True)  # queued, running, completed, failed
+    params = Column(String)  # JSON string of request parameters
+    result = Column(String)  # JSON string of generated learning path
+    error = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    # Worker đang chạy job và hạn lease; worker gia hạn lease trong khi chạy, job running
+    # có lease đã hết hạn (worker bị dừng) mới được đưa lại vào hàng đợi
+    owner = Column(String)
+    lease_expires_at = Column(DateTime)
+
+def upgrade_schema(bind=engine):
+    """
+    Nâng cấp database đã tồn tại lên schema hiện tại
+
+    create_all chỉ tạo bảng còn thiếu, không thêm cột hoặc index mới vào bảng đã có, nên các
+    cột (cho phép NULL) và index được khai báo trong model nhưng chưa có trong database được
+    tạo ở đây. Chạy lại nhiều lần không có tác dụng phụ.
+
+    Returns:
+        Danh sách tên cột (table.column) và index vừa được tạo
+    """
+    inspector = inspect(bind)
+    table_names = inspector.get_table_names()
+    existing = {
+        table_name: {index["name"] for index in inspector.get_indexes(table_name)}
+        for table_name in table_names
+    }
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in table_names:
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                column_type = column.type.compile(dialect=bind.dialect)
+                with bind.begin() as connection:
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                created.append(f"{table.name}.{column.name}")
+    
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing.get(table.name, set()):
+                index.create(bind=bind, checkfirst=True)
+                created.append(index.name)
+    
+    if created:
+        # Cập nhật thống kê để SQLite chọn index mới
+        with bind.begin() as connection:
+            connection.execute(text("ANALYZE"))
+        logger.info(f"Đã nâng cấp schema: {', '.join(created)}")
+    return created
+
 # Tạo database
 Base.metadata.create_all(bind=engine)
+upgrade_schema()
 
 # Dependency
 def get_db():
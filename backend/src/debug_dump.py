@@ -0,0 +1,138 @@
+import os
+import json
+import queue
+import random
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bật ghi dữ liệu debug (lộ trình đã parse, phản hồi Gemini không parse được) ra file
+DEBUG_DUMP_ENABLED = os.getenv("DEBUG_DUMP_ENABLED", "false").lower() in ("1", "true", "yes")
+# Thư mục chứa file debug
+DEBUG_DUMP_DIR = os.getenv("DEBUG_DUMP_DIR", "debug_dumps")
+# Tỷ lệ request được ghi (0.0 - 1.0)
+DEBUG_DUMP_SAMPLE_RATE = float(os.getenv("DEBUG_DUMP_SAMPLE_RATE", "0.1"))
+# Kích thước tối đa (byte) của mỗi file trước khi xoay vòng, và số file cũ được giữ lại
+DEBUG_DUMP_MAX_BYTES = int(os.getenv("DEBUG_DUMP_MAX_BYTES", str(10 * 1024 * 1024)))
+DEBUG_DUMP_BACKUP_COUNT = int(os.getenv("DEBUG_DUMP_BACKUP_COUNT", "3"))
+# Số bản ghi tối đa chờ ghi; khi đầy bản ghi mới bị bỏ qua thay vì làm chậm request
+DEBUG_DUMP_QUEUE_SIZE = int(os.getenv("DEBUG_DUMP_QUEUE_SIZE", "100"))
+
+
+class DebugDumpSink:
+    """
+    Ghi dữ liệu debug ra file JSON Lines trên một thread nền
+
+    dump() chỉ lấy mẫu và đưa bản ghi vào hàng đợi nên không làm tăng thời gian xử lý request;
+    việc serialize và ghi file diễn ra trên thread nền. Mỗi loại dữ liệu (kind) được ghi vào
+    <directory>/<kind>.jsonl, file được xoay vòng khi vượt quá max_bytes và chỉ giữ
+    backup_count file cũ nên dung lượng đĩa bị giới hạn.
+    """
+
+    def __init__(self, directory: str = DEBUG_DUMP_DIR, enabled: bool = DEBUG_DUMP_ENABLED,
+                 sample_rate: float = DEBUG_DUMP_SAMPLE_RATE, max_bytes: int = DEBUG_DUMP_MAX_BYTES,
+                 backup_count: int = DEBUG_DUMP_BACKUP_COUNT, queue_size: int = DEBUG_DUMP_QUEUE_SIZE):
+        self.directory = directory
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def sample(self) -> bool:
+        """Quyết định có ghi bản ghi tiếp theo hay không (đã bật và được chọn khi lấy mẫu)"""
+        return self.enabled and random.random() < self.sample_rate
+
+    def dump(self, kind: str, data: Any, **context: Any) -> bool:
+        """
+        Lấy mẫu rồi đưa một bản ghi vào hàng đợi ghi
+
+        Returns:
+            True nếu bản ghi được đưa vào hàng đợi
+        """
+        return self.sample() and self.write(kind, data, **context)
+
+    def write(self, kind: str, data: Any, **context: Any) -> bool:
+        """
+        Đưa một bản ghi vào hàng đợi ghi, không lấy mẫu
+
+        data được serialize trên thread nền nên không được sửa sau khi gọi write.
+
+        Returns:
+            True nếu bản ghi được đưa vào hàng đợi, False nếu hàng đợi đầy
+        """
+        self._ensure_worker()
+        record = {"time": datetime.now().isoformat(), "kind": kind, **context, "data": data}
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def _ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name="debug-dump", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            try:
+                self._write(record)
+                with self._lock:
+                    self.written += 1
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                logger.warning(f"Không thể ghi dữ liệu debug {record.get('kind')}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, record: Dict[str, Any]):
+        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        path = os.path.join(self.directory, f"{record['kind']}.jsonl")
+        if os.path.exists(path) and os.path.getsize(path) + len(line) > self.max_bytes:
+            self._rotate(path)
+        with open(path, "ab") as f:
+            f.write(line)
+
+    def _rotate(self, path: str):
+        """Đổi tên path -> path.1 -> path.2 ..., xóa file cũ nhất"""
+        if self.backup_count <= 0:
+            os.remove(path)
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{path}.{index + 1}")
+        os.replace(path, f"{path}.1")
+
+    def flush(self):
+        """Chờ ghi xong các bản ghi đang trong hàng đợi"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sample_rate": self.sample_rate,
+                "pending": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "errors": self.errors
+            }
@@ -0,0 +1,233 @@
+import os
+import pickle
+import hashlib
+import logging
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Cache embedding trên đĩa, khóa theo hash của nội dung khóa học và tên model"""
+
+    def __init__(self, cache_file: str):
+        """
+        Args:
+            cache_file: Đường dẫn đến file pickle lưu cache
+        """
+        self.cache_file = cache_file
+        self._vectors: Dict[str, List[float]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def make_key(text: str, model: str) -> str:
+        """Tạo khóa cache từ tên model và nội dung văn bản"""
+        return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._vectors)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._vectors
+
+    def put(self, key: str, vector: List[float]):
+        """Thêm một vector đã có sẵn vào cache"""
+        with self._lock:
+            self._vectors[key] = list(vector)
+            self._dirty = True
+
+    def load(self):
+        """Tải cache từ file nếu tồn tại"""
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, "rb") as f:
+                self._vectors = pickle.load(f)
+            logger.info(f"Đã tải {len(self._vectors)} embedding từ cache {self.cache_file}")
+        except Exception as e:
+            logger.warning(f"Không thể đọc cache embedding, bỏ qua: {str(e)}")
+            self._vectors = {}
+
+    def save(self):
+        """Ghi cache ra file (chỉ khi có thay đổi)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            folder = os.path.dirname(self.cache_file)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            # Ghi ra file tạm rồi đổi tên để không làm hỏng cache khi bị ngắt giữa chừng;
+            # mỗi lần ghi dùng một file tạm riêng để các worker cùng đồng bộ không ghi đè lên nhau
+            with tempfile.NamedTemporaryFile(dir=folder or ".", suffix=".tmp", delete=False) as f:
+                tmp_file = f.name
+                try:
+                    pickle.dump(self._vectors, f)
+                except BaseException:
+                    f.close()
+                    os.remove(tmp_file)
+                    raise
+            os.replace(tmp_file, self.cache_file)
+            self._dirty = False
+
+    def retain(self, keys: Iterable[str]):
+        """Chỉ giữ lại các khóa còn dùng để file cache không phình to theo thời gian"""
+        keep = set(keys)
+        with self._lock:
+            stale = [key for key in self._vectors if key not in keep]
+            for key in stale:
+                del self._vectors[key]
+            if stale:
+                self._dirty = True
+                logger.info(f"Đã xóa {len(stale)} embedding cũ khỏi cache")
+
+    def embed_documents(self, texts: List[str], model: str,
+                        embed_fn: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """
+        Lấy embedding cho danh sách văn bản, chỉ gọi embed_fn cho các văn bản chưa có trong cache
+
+        Args:
+            texts: Danh sách văn bản cần embedding
+            model: Tên model embedding (là một phần của khóa cache)
+            embed_fn: Hàm embedding gốc, ví dụ CohereEmbeddings.embed_documents
+
+        Returns:
+            Danh sách vector theo đúng thứ tự của texts
+        """
+        keys = [self.make_key(text, model) for text in texts]
+
+        # Tra cache và giữ lại các vector tìm thấy trong khóa; embed_fn được gọi ngoài khóa
+        found = {}
+        missing = {}
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in found or key in missing:
+                    continue
+                vector = self._vectors.get(key)
+                if vector is not None:
+                    found[key] = vector
+                else:
+                    missing[key] = text
+
+        logger.info(f"Cache embedding: {len(texts) - len(missing)} hit, {len(missing)} miss")
+
+        if missing:
+            vectors = embed_fn(list(missing.values()))
+            with self._lock:
+                for key, vector in zip(missing.keys(), vectors):
+                    found[key] = self._vectors[key] = list(vector)
+                self._dirty = True
+
+        return [found[key] for key in keys]
+
+
+class QueryEmbeddingCache:
+    """Cache LRU có TTL cho vector của câu truy vấn, khóa theo câu truy vấn đã chuẩn hóa và tên model"""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600):
+        """
+        Args:
+            max_size: Số câu truy vấn tối đa được giữ trong cache
+            ttl: Thời gian sống của mỗi vector (giây)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Chuẩn hóa câu truy vấn: bỏ khoảng trắng thừa và chuyển về chữ thường"""
+        return " ".join(query.split()).lower()
+
+    def get(self, query: str, model: str) -> Optional[List[float]]:
+        """Lấy vector trong cache, trả về None nếu không có hoặc đã hết hạn"""
+        key = (self.normalize(query), model)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, vector = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, query: str, model: str, vector: List[float]):
+        """Lưu vector vào cache, loại bỏ phần tử ít dùng nhất khi vượt quá kích thước"""
+        key = (self.normalize(query), model)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def embed_query(self, query: str, model: str, embed_fn: Callable[[str], List[float]]) -> List[float]:
+        """Lấy vector của câu truy vấn từ cache, chỉ gọi embed_fn khi cache miss"""
+        vector = self.get(query, model)
+        if vector is None:
+            vector = embed_fn(query)
+            self.put(query, model, vector)
+        return vector
+
+    async def aembed_query(self, query: str, model: str,
+                           aembed_fn: Callable[[str], Awaitable[List[float]]]) -> List[float]:
+        """Phiên bản async của embed_query, chỉ await aembed_fn khi cache miss"""
+        vector = self.get(query, model)
+        if vector is None:
+            vector = await aembed_fn(query)
+            self.put(query, model, vector)
+        return vector
+
+    def embed_queries(self, queries: List[str], model: str,
+                      embed_many_fn: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """
+        Lấy vector cho nhiều câu truy vấn, gom tất cả các câu cache miss vào một lần gọi embed_many_fn
+
+        Returns:
+            Danh sách vector theo đúng thứ tự của queries
+        """
+        vectors: List[Optional[List[float]]] = [self.get(query, model) for query in queries]
+
+        # Gom các câu truy vấn chưa có vector (theo dạng chuẩn hóa) để chỉ embedding một lần
+        missing: Dict[str, List[int]] = {}
+        for i, (query, vector) in enumerate(zip(queries, vectors)):
+            if vector is None:
+                missing.setdefault(self.normalize(query), []).append(i)
+
+        if missing:
+            first_queries = [queries[positions[0]] for positions in missing.values()]
+            new_vectors = embed_many_fn(first_queries)
+            for query, positions, vector in zip(first_queries, missing.values(), new_vectors):
+                self.put(query, model, vector)
+                for i in positions:
+                    vectors[i] = vector
+
+        return vectors
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Thống kê hit/miss của cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total > 0 else 0.0
+            }
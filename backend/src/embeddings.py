@@ -0,0 +1,104 @@
+import os
+import re
+import math
+import hashlib
+import logging
+from collections import Counter
+from typing import List, Optional, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_cohere import CohereEmbeddings
+
+logger = logging.getLogger(__name__)
+
+# Backend embedding: "cohere" (mặc định, gọi API) hoặc "local" (chạy trên CPU, không cần mạng)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "cohere").lower()
+
+COHERE_EMBEDDING_MODEL = "embed-multilingual-v3.0"
+
+# Số chiều của vector khi dùng backend local
+LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", "512"))
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class HashedNgramEmbeddings(Embeddings):
+    """
+    Embedding cục bộ bằng cách chiếu n-gram ký tự và từ vào không gian có số chiều cố định
+
+    Mỗi từ và mỗi n-gram ký tự (3-5 ký tự) được băm vào một chiều của vector với dấu +/-,
+    trọng số là log tần suất, sau đó vector được chuẩn hóa L2. Không dùng IDF để vector của
+    một văn bản không phụ thuộc vào phần còn lại của danh mục (nhờ đó vẫn dùng được cache).
+    Kết quả hoàn toàn xác định, không cần mạng.
+    """
+
+    def __init__(self, dim: int = LOCAL_EMBEDDING_DIM, ngram_range: Tuple[int, int] = (3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.model = f"local-hashed-ngram-v1-{dim}"
+
+    def _features(self, text: str) -> Counter:
+        features = Counter()
+        min_n, max_n = self.ngram_range
+        for token in _TOKEN_PATTERN.findall(text.lower()):
+            features[f"w:{token}"] += 1
+            padded = f"<{token}>"
+            for n in range(min_n, max_n + 1):
+                for i in range(len(padded) - n + 1):
+                    features[f"c:{padded[i:i + n]}"] += 1
+        return features
+
+    def _embed_text(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, count in self._features(text).items():
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign * (1.0 + math.log(count))
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed(self, texts: List[str], *, input_type: Optional[str] = None) -> List[List[float]]:
+        """Cùng chữ ký với CohereEmbeddings.embed; input_type không ảnh hưởng tới kết quả"""
+        return [self._embed_text(text) for text in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed(texts, input_type="search_document")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed([text], input_type="search_query")[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # Tính toán nhanh trên CPU, không cần chuyển sang thread pool như mặc định của Embeddings
+        return self.embed_query(text)
+
+
+def create_embeddings(backend: Optional[str] = None, cohere_api_key: Optional[str] = None) -> Tuple[Embeddings, str]:
+    """
+    Tạo đối tượng embedding theo cấu hình
+
+    Args:
+        backend: "cohere" hoặc "local", mặc định lấy từ biến môi trường EMBEDDING_BACKEND
+        cohere_api_key: API key của Cohere (chỉ dùng cho backend "cohere")
+
+    Returns:
+        Tuple (embeddings, tên model) - tên model được dùng trong khóa cache và metadata của index
+    """
+    backend = (backend or EMBEDDING_BACKEND).lower()
+
+    if backend == "local":
+        embeddings = HashedNgramEmbeddings()
+        logger.info(f"Sử dụng embedding cục bộ {embeddings.model}")
+        return embeddings, embeddings.model
+
+    if backend != "cohere":
+        raise ValueError(f"EMBEDDING_BACKEND không hợp lệ: {backend}")
+
+    embeddings = CohereEmbeddings(
+        cohere_api_key=cohere_api_key or "",
+        model=COHERE_EMBEDDING_MODEL,
+        user_agent="langchain",
+    )
+    return embeddings, COHERE_EMBEDDING_MODEL
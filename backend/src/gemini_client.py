@@ -0,0 +1,315 @@
+import os
+import json
+import time
+import asyncio
+import random
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Iterator, Optional
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models"
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+
+# Timeout (giây) khi kết nối và khi chờ phản hồi từ Gemini
+GEMINI_CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "5"))
+GEMINI_READ_TIMEOUT = float(os.getenv("GEMINI_READ_TIMEOUT", "120"))
+
+# Số lần thử lại tối đa khi gặp lỗi 429/5xx hoặc lỗi kết nối, và thời gian chờ cơ sở (giây)
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "2"))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "0.5"))
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "8"))
+
+# Số request đồng thời tối đa tới Gemini trong một process, và thời gian tối đa chờ đến lượt
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_QUEUE_TIMEOUT = float(os.getenv("GEMINI_QUEUE_TIMEOUT", "30"))
+
+# Giới hạn riêng cho AsyncGeminiClient (asgi_api.py): mỗi request đang chờ chỉ là một coroutine
+# nên có thể giữ hàng trăm request đồng thời trên một event loop, thay vì số thread của GeminiClient
+GEMINI_ASYNC_MAX_CONCURRENCY = int(os.getenv("GEMINI_ASYNC_MAX_CONCURRENCY", "256"))
+GEMINI_ASYNC_QUEUE_TIMEOUT = float(os.getenv("GEMINI_ASYNC_QUEUE_TIMEOUT", "120"))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class GeminiConcurrencyError(Exception):
+    """Không lấy được lượt gọi Gemini trong thời gian cho phép"""
+
+
+class GeminiHTTPError(Exception):
+    """Gemini trả về mã lỗi HTTP"""
+
+    def __init__(self, status_code: int, message: str = ""):
+        super().__init__(f"Lỗi API HTTP {status_code}: {message[:500]}")
+        self.status_code = status_code
+
+
+class GeminiMetrics:
+    """Thống kê độ trễ và kết quả của từng lần gọi Gemini"""
+
+    def __init__(self, max_samples: int = 1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=max_samples)
+        self.requests = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.status_counts: Dict[str, int] = {}
+
+    def record_attempt(self, status: str, latency: float, attempt: int):
+        with self._lock:
+            self.attempts += 1
+            if attempt > 1:
+                self.retries += 1
+            self._latencies.append(latency)
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+    def record_request(self, success: bool):
+        with self._lock:
+            self.requests += 1
+            if not success:
+                self.failures += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                "requests": self.requests,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "failures": self.failures,
+                "status_counts": dict(self.status_counts),
+            }
+        if latencies:
+            stats["latency_p50"] = round(latencies[len(latencies) // 2], 3)
+            stats["latency_p95"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3)
+            stats["latency_max"] = round(latencies[-1], 3)
+        return stats
+
+
+class BaseGeminiClient:
+    """Cấu hình và chính sách thử lại dùng chung cho client đồng bộ và client async"""
+
+    def __init__(self, api_key: str, model: str = GEMINI_MODEL,
+                 connect_timeout: float = GEMINI_CONNECT_TIMEOUT,
+                 read_timeout: float = GEMINI_READ_TIMEOUT,
+                 max_retries: int = GEMINI_MAX_RETRIES):
+        self.api_key = api_key
+        self.model = model
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.metrics = GeminiMetrics()
+
+    def url(self, method: str = "generateContent") -> str:
+        return f"{GEMINI_BASE_URL}/{self.model}:{method}"
+
+    @staticmethod
+    def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+        """Thời gian chờ trước lần thử lại: ưu tiên header Retry-After, nếu không thì full-jitter backoff"""
+        if retry_after:
+            try:
+                return min(float(retry_after), GEMINI_BACKOFF_MAX)
+            except ValueError:
+                pass
+        return random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * (2 ** (attempt - 1))))
+
+
+class GeminiClient(BaseGeminiClient):
+    """
+    Client HTTP dùng chung cho Gemini API
+
+    Dùng một requests.Session với connection pool (keep-alive), timeout kết nối/đọc,
+    thử lại có giới hạn với backoff ngẫu nhiên khi gặp 429/5xx, và giới hạn số request
+    đồng thời trong process.
+    """
+
+    def __init__(self, api_key: str, model: str = GEMINI_MODEL,
+                 connect_timeout: float = GEMINI_CONNECT_TIMEOUT,
+                 read_timeout: float = GEMINI_READ_TIMEOUT,
+                 max_retries: int = GEMINI_MAX_RETRIES,
+                 max_concurrency: int = GEMINI_MAX_CONCURRENCY):
+        super().__init__(api_key, model, connect_timeout, read_timeout, max_retries)
+        self.timeout = (connect_timeout, read_timeout)
+
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+    def _send(self, payload: Dict[str, Any], method: str, params: Dict[str, str], **kwargs) -> requests.Response:
+        """Gửi request (đã có lượt gọi), thử lại khi gặp lỗi tạm thời"""
+        attempt = 0
+        while True:
+            attempt += 1
+            start_time = time.perf_counter()
+            try:
+                response = self.session.post(
+                    self.url(method),
+                    params=params,
+                    json=payload,
+                    timeout=self.timeout,
+                    **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                latency = time.perf_counter() - start_time
+                self.metrics.record_attempt(type(e).__name__, latency, attempt)
+                logger.warning(f"Gemini lần thử {attempt}: {type(e).__name__} sau {latency:.2f} giây")
+                if attempt > self.max_retries:
+                    self.metrics.record_request(False)
+                    raise
+                time.sleep(self.backoff_delay(attempt))
+                continue
+
+            latency = time.perf_counter() - start_time
+            self.metrics.record_attempt(str(response.status_code), latency, attempt)
+            logger.info(f"Gemini lần thử {attempt}: HTTP {response.status_code} trong {latency:.2f} giây")
+
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt <= self.max_retries:
+                delay = self.backoff_delay(attempt, response.headers.get("Retry-After"))
+                response.close()
+                time.sleep(delay)
+                continue
+
+            self.metrics.record_request(response.status_code == 200)
+            return response
+
+    def _acquire(self):
+        if not self._semaphore.acquire(timeout=GEMINI_QUEUE_TIMEOUT):
+            self.metrics.record_request(False)
+            raise GeminiConcurrencyError("Quá nhiều request đồng thời tới Gemini API")
+
+    def post(self, payload: Dict[str, Any], method: str = "generateContent", **kwargs) -> requests.Response:
+        """
+        Gửi request tới Gemini, thử lại khi gặp lỗi tạm thời
+
+        Returns:
+            Response cuối cùng (có thể có mã lỗi nếu đã hết số lần thử lại)
+
+        Raises:
+            GeminiConcurrencyError: Khi không lấy được lượt gọi trong GEMINI_QUEUE_TIMEOUT giây
+            requests.RequestException: Khi lỗi kết nối/timeout ở lần thử cuối cùng
+        """
+        self._acquire()
+        try:
+            return self._send(payload, method, {"key": self.api_key}, **kwargs)
+        finally:
+            self._semaphore.release()
+
+    def stream(self, payload: Dict[str, Any]) -> Iterator[str]:
+        """
+        Gọi streamGenerateContent (server-sent events) và trả về từng đoạn văn bản ngay khi nhận được
+
+        Chỉ thử lại trước khi nhận được phản hồi; lượt gọi được giữ cho đến khi đọc hết stream.
+
+        Raises:
+            GeminiHTTPError: Khi Gemini trả về mã lỗi
+        """
+        self._acquire()
+        try:
+            response = self._send(payload, "streamGenerateContent", {"key": self.api_key, "alt": "sse"}, stream=True)
+            try:
+                if response.status_code != 200:
+                    raise GeminiHTTPError(response.status_code, response.text)
+
+                response.encoding = "utf-8"
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = json.loads(line[len("data:"):])
+                    for candidate in data.get("candidates", [])[:1]:
+                        for part in candidate.get("content", {}).get("parts", []):
+                            if part.get("text"):
+                                yield part["text"]
+            finally:
+                response.close()
+        finally:
+            self._semaphore.release()
+
+
+class AsyncGeminiClient(BaseGeminiClient):
+    """
+    Client async cho Gemini API, dùng trong pipeline asyncio (asgi_api.py)
+
+    Cùng timeout, chính sách thử lại và thống kê với GeminiClient, nhưng dùng httpx.AsyncClient
+    nên mỗi request đang chờ Gemini chỉ là một coroutine, không chiếm một thread. Số request
+    đồng thời được giới hạn bằng asyncio.Semaphore với giới hạn riêng GEMINI_ASYNC_MAX_CONCURRENCY
+    (cao hơn nhiều so với GEMINI_MAX_CONCURRENCY của client đồng bộ); các request vượt quá giới
+    hạn chờ đến lượt trên event loop thay vì chờ trong thread pool.
+
+    Client gắn với event loop tạo ra nó, xem resources.get_async_gemini_client.
+    """
+
+    def __init__(self, api_key: str, model: str = GEMINI_MODEL,
+                 connect_timeout: float = GEMINI_CONNECT_TIMEOUT,
+                 read_timeout: float = GEMINI_READ_TIMEOUT,
+                 max_retries: int = GEMINI_MAX_RETRIES,
+                 max_concurrency: int = GEMINI_ASYNC_MAX_CONCURRENCY,
+                 queue_timeout: float = GEMINI_ASYNC_QUEUE_TIMEOUT):
+        super().__init__(api_key, model, connect_timeout, read_timeout, max_retries)
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            headers={"Content-Type": "application/json"},
+        )
+
+    async def _send(self, payload: Dict[str, Any], method: str, params: Dict[str, str]) -> httpx.Response:
+        """Gửi request (đã có lượt gọi), thử lại khi gặp lỗi tạm thời"""
+        attempt = 0
+        while True:
+            attempt += 1
+            start_time = time.perf_counter()
+            try:
+                response = await self.client.post(self.url(method), params=params, json=payload)
+            except httpx.TransportError as e:
+                latency = time.perf_counter() - start_time
+                self.metrics.record_attempt(type(e).__name__, latency, attempt)
+                logger.warning(f"Gemini (async) lần thử {attempt}: {type(e).__name__} sau {latency:.2f} giây")
+                if attempt > self.max_retries:
+                    self.metrics.record_request(False)
+                    raise
+                await asyncio.sleep(self.backoff_delay(attempt))
+                continue
+
+            latency = time.perf_counter() - start_time
+            self.metrics.record_attempt(str(response.status_code), latency, attempt)
+            logger.info(f"Gemini (async) lần thử {attempt}: HTTP {response.status_code} trong {latency:.2f} giây")
+
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt <= self.max_retries:
+                await asyncio.sleep(self.backoff_delay(attempt, response.headers.get("Retry-After")))
+                continue
+
+            self.metrics.record_request(response.status_code == 200)
+            return response
+
+    async def post(self, payload: Dict[str, Any], method: str = "generateContent") -> httpx.Response:
+        """
+        Gửi request tới Gemini, thử lại khi gặp lỗi tạm thời
+
+        Returns:
+            Response cuối cùng (có thể có mã lỗi nếu đã hết số lần thử lại)
+
+        Raises:
+            GeminiConcurrencyError: Khi không lấy được lượt gọi trong GEMINI_ASYNC_QUEUE_TIMEOUT giây
+            httpx.HTTPError: Khi lỗi kết nối/timeout ở lần thử cuối cùng
+        """
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.metrics.record_request(False)
+            raise GeminiConcurrencyError("Quá nhiều request đồng thời tới Gemini API")
+        try:
+            return await self._send(payload, method, {"key": self.api_key})
+        finally:
+            self._semaphore.release()
+
+    async def aclose(self):
+        await self.client.aclose()
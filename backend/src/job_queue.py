@@ -0,0 +1,312 @@
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from src.database import SessionLocal, GenerationJob
+
+logger = logging.getLogger(__name__)
+
+# Số worker chạy create_learning_path song song và số job tối đa đang chờ/đang chạy
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))
+
+# Thời gian giữ job đã hoàn tất/thất bại trong database (giờ)
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+
+# Thời hạn lease của job đang chạy (giây); worker gia hạn sau mỗi 1/3 thời hạn, job running có
+# lease hết hạn được coi là của worker đã dừng và được đưa lại vào hàng đợi
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+class JobQueueFullError(Exception):
+    """Hàng đợi đã đủ JOB_MAX_PENDING job chưa hoàn tất"""
+
+
+class LearningPathJobQueue:
+    """
+    Hàng đợi job tạo lộ trình học tập
+
+    Mỗi job được lưu vào bảng generation_jobs trong SQLite và chạy trên một thread pool có
+    giới hạn. Client nhận job id ngay khi submit và hỏi lại trạng thái bằng get().
+
+    Nhiều process (ví dụ nhiều worker gunicorn) có thể dùng chung bảng: worker nhận job bằng
+    một UPDATE có điều kiện status = 'queued' nên mỗi job chỉ được một worker chạy, và giữ lease
+    (owner, lease_expires_at) được gia hạn trên thread nền trong khi chạy. Chỉ job running có
+    lease đã hết hạn (worker bị dừng) mới được đưa lại vào hàng đợi.
+    """
+
+    def __init__(self, rag_system, max_workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING,
+                 lease_seconds: float = JOB_LEASE_SECONDS):
+        self.rag_system = rag_system
+        self.max_pending = max_pending
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="learning-path-job")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._last_purge = 0.0
+        self._stopped = threading.Event()
+
+        self.purge_expired()
+        self.recover()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="learning-path-job-lease", daemon=True)
+        self._heartbeat.start()
+
+    def _reserve(self, force: bool = False):
+        with self._lock:
+            if not force and self._pending >= self.max_pending:
+                raise JobQueueFullError(f"Hàng đợi đã có {self._pending} job chưa hoàn tất")
+            self._pending += 1
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, params: Dict[str, Any], username: str = "anonymous") -> str:
+        """
+        Tạo job mới và đưa vào hàng đợi
+
+        Args:
+            params: Tham số của create_learning_path (field, level, duration, daily_hours, interests)
+            username: Người gửi yêu cầu
+
+        Returns:
+            Job id
+
+        Raises:
+            JobQueueFullError: Khi số job chưa hoàn tất đã đạt JOB_MAX_PENDING
+        """
+        self._reserve()
+        job_id = uuid.uuid4().hex
+        db = SessionLocal()
+        try:
+            db.add(GenerationJob(
+                id=job_id,
+                username=username,
+                status=JOB_QUEUED,
+                params=json.dumps(params, ensure_ascii=False),
+                created_at=datetime.utcnow()
+            ))
+            db.commit()
+        except Exception:
+            self._release()
+            raise
+        finally:
+            db.close()
+
+        self._executor.submit(self._run, job_id, params)
+        if time.monotonic() - self._last_purge > 3600:
+            self.purge_expired()
+        logger.info(f"Đã nhận job {job_id} từ {username}: {params.get('field')}, {params.get('level')}")
+        return job_id
+
+    def _lease_expiry(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+
+    def _claim(self, job_id: str) -> bool:
+        """Nhận job đang chờ cho worker này; False nếu job đã được worker khác nhận"""
+        db = SessionLocal()
+        try:
+            claimed = db.query(GenerationJob).filter(
+                GenerationJob.id == job_id,
+                GenerationJob.status == JOB_QUEUED
+            ).update({
+                "status": JOB_RUNNING,
+                "owner": self.owner,
+                "started_at": datetime.utcnow(),
+                "lease_expires_at": self._lease_expiry()
+            }, synchronize_session=False)
+            db.commit()
+            return claimed == 1
+        finally:
+            db.close()
+
+    def _finish(self, job_id: str, **values) -> bool:
+        """Lưu kết quả job nếu worker này vẫn giữ job; False nếu lease đã mất"""
+        db = SessionLocal()
+        try:
+            updated = db.query(GenerationJob).filter(
+                GenerationJob.id == job_id,
+                GenerationJob.status == JOB_RUNNING,
+                GenerationJob.owner == self.owner
+            ).update(dict(values, lease_expires_at=None), synchronize_session=False)
+            db.commit()
+            return updated == 1
+        finally:
+            db.close()
+
+    def _run(self, job_id: str, params: Dict[str, Any]):
+        """Chạy một job trên worker thread và lưu kết quả hoặc lỗi"""
+        try:
+            if not self._claim(job_id):
+                logger.info(f"Job {job_id} đã được worker khác nhận")
+                return
+            result = self.rag_system.create_learning_path(
+                field=params['field'],
+                level=params['level'],
+                duration=params['duration'],
+                daily_hours=params['daily_hours'],
+                interests=params['interests']
+            )
+            saved = self._finish(
+                job_id,
+                status=JOB_COMPLETED,
+                result=json.dumps(result, ensure_ascii=False, default=float),
+                finished_at=datetime.utcnow()
+            )
+            if saved:
+                logger.info(f"Job {job_id} hoàn tất")
+            else:
+                logger.warning(f"Job {job_id} hoàn tất nhưng lease đã hết hạn, bỏ qua kết quả")
+        except Exception as e:
+            logger.error(f"Job {job_id} thất bại: {str(e)}")
+            try:
+                self._finish(job_id, status=JOB_FAILED, error=str(e), finished_at=datetime.utcnow())
+            except Exception as db_error:
+                logger.error(f"Không thể lưu trạng thái job {job_id}: {str(db_error)}")
+        finally:
+            self._release()
+
+    def _renew_leases(self) -> int:
+        """Gia hạn lease của các job worker này đang chạy"""
+        db = SessionLocal()
+        try:
+            renewed = db.query(GenerationJob).filter(
+                GenerationJob.owner == self.owner,
+                GenerationJob.status == JOB_RUNNING
+            ).update({"lease_expires_at": self._lease_expiry()}, synchronize_session=False)
+            db.commit()
+            return renewed
+        finally:
+            db.close()
+
+    def _heartbeat_loop(self):
+        """Thread nền: gia hạn lease và nhận lại job của worker đã dừng"""
+        while not self._stopped.wait(self.lease_seconds / 3):
+            try:
+                self._renew_leases()
+                self.requeue_expired()
+            except Exception as e:
+                logger.error(f"Lỗi gia hạn lease job: {str(e)}")
+
+    def _enqueue(self, jobs):
+        for job_id, params in jobs:
+            # Job cũ luôn được nhận lại, kể cả khi vượt quá giới hạn hàng đợi
+            self._reserve(force=True)
+            self._executor.submit(self._run, job_id, params)
+
+    def requeue_expired(self) -> List[str]:
+        """Đưa lại vào hàng đợi các job running có lease đã hết hạn (worker đã dừng), trả về id các job đó"""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            expired = [
+                (job.id, json.loads(job.params))
+                for job in db.query(GenerationJob).filter(
+                    GenerationJob.status == JOB_RUNNING,
+                    (GenerationJob.lease_expires_at == None) | (GenerationJob.lease_expires_at < now)
+                ).order_by(GenerationJob.created_at)
+            ]
+            requeued = []
+            for job_id, params in expired:
+                # Điều kiện lặp lại trong UPDATE để chỉ một worker nhận lại mỗi job
+                updated = db.query(GenerationJob).filter(
+                    GenerationJob.id == job_id,
+                    GenerationJob.status == JOB_RUNNING,
+                    (GenerationJob.lease_expires_at == None) | (GenerationJob.lease_expires_at < now)
+                ).update({
+                    "status": JOB_QUEUED,
+                    "owner": None,
+                    "started_at": None,
+                    "lease_expires_at": None
+                }, synchronize_session=False)
+                db.commit()
+                if updated == 1:
+                    requeued.append((job_id, params))
+        finally:
+            db.close()
+
+        self._enqueue(requeued)
+        if requeued:
+            logger.info(f"Đã đưa lại {len(requeued)} job có lease hết hạn vào hàng đợi")
+        return [job_id for job_id, _ in requeued]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Lấy trạng thái job (kèm kết quả khi đã hoàn tất), trả về None nếu không tồn tại"""
+        db = SessionLocal()
+        try:
+            job = db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+            if job is None:
+                return None
+
+            data = {
+                "job_id": job.id,
+                "status": job.status,
+                "created_at": job.created_at.isoformat() if job.created_at else None,
+                "started_at": job.started_at.isoformat() if job.started_at else None,
+                "finished_at": job.finished_at.isoformat() if job.finished_at else None
+            }
+            if job.status == JOB_COMPLETED:
+                data["result"] = json.loads(job.result)
+            elif job.status == JOB_FAILED:
+                data["error"] = job.error
+            return data
+        finally:
+            db.close()
+
+    def recover(self):
+        """
+        Nhận các job chưa hoàn tất khi khởi động
+
+        Job running có lease hết hạn được đưa lại vào hàng đợi; job queued được gửi vào thread
+        pool của process này nhưng chỉ chạy nếu _claim thành công, nên job đang chờ ở worker
+        khác không bị chạy hai lần.
+        """
+        requeued = set(self.requeue_expired())
+        db = SessionLocal()
+        try:
+            pending = [
+                (job.id, json.loads(job.params))
+                for job in db.query(GenerationJob)
+                .filter(GenerationJob.status == JOB_QUEUED)
+                .order_by(GenerationJob.created_at)
+                if job.id not in requeued
+            ]
+        finally:
+            db.close()
+
+        self._enqueue(pending)
+        if pending:
+            logger.info(f"Đã đưa lại {len(pending)} job chưa hoàn tất vào hàng đợi")
+
+    def purge_expired(self):
+        """Xóa các job đã kết thúc lâu hơn JOB_RETENTION_HOURS"""
+        self._last_purge = time.monotonic()
+        cutoff = datetime.utcnow() - timedelta(hours=JOB_RETENTION_HOURS)
+        db = SessionLocal()
+        try:
+            deleted = db.query(GenerationJob).filter(
+                GenerationJob.status.in_([JOB_COMPLETED, JOB_FAILED]),
+                GenerationJob.finished_at < cutoff
+            ).delete(synchronize_session=False)
+            db.commit()
+            if deleted:
+                logger.info(f"Đã xóa {deleted} job hết hạn")
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Số job chưa hoàn tất trong process và giới hạn hàng đợi"""
+        with self._lock:
+            return {"pending": self._pending, "max_pending": self.max_pending}
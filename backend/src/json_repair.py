@@ -0,0 +1,227 @@
+import re
+import json
+import threading
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+# Một token (kèm khoảng trắng phía trước) mỗi lần khớp; chuỗi và chú thích được bỏ qua nguyên khối
+# nên dấu ' , : { } bên trong chuỗi (ví dụ tiếng Việt có dấu nháy đơn) không bao giờ bị sửa
+_TOKEN_PATTERN = re.compile(r'''
+  \s*(?:
+    (?P<string>"[^"\\]*(?:\\.[^"\\]*)*")
+  | (?P<partial>"[\s\S]*)
+  | (?P<squote>'[^'\\\n]*(?:\\.[^'\\\n]*)*')
+  | (?P<comment>//[^\n]*|/\*[\s\S]*?(?:\*/|\Z))
+  | (?P<open>[{\[])
+  | (?P<close>[}\]])
+  | (?P<comma>,)
+  | (?P<colon>:)
+  | (?P<bare>[^\s"'{}\[\],:/]+|[/'])
+  )
+''', re.VERBOSE)
+
+_BARE_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_VALUE_START = {"string", "squote", "open", "bare"}
+_VALUE_END = {"string", "squote", "close", "bare"}
+
+_decoder = json.JSONDecoder(strict=False)
+
+
+class Repair(NamedTuple):
+    """Một chỗ sửa trong văn bản JSON: loại sửa và vị trí (chỉ số ký tự trong văn bản gốc)"""
+    kind: str
+    position: int
+
+
+class JSONRepairError(ValueError):
+    """Không tìm thấy hoặc không thể sửa JSON object trong văn bản"""
+
+
+def find_json_start(text: str) -> int:
+    """Vị trí dấu { đầu tiên, ưu tiên phần nằm sau code fence ``` nếu có"""
+    fence = text.find("```")
+    if fence >= 0:
+        start = text.find("{", fence)
+        if start >= 0:
+            return start
+    return text.find("{")
+
+
+def repair_json(text: str, start: int = 0) -> Tuple[str, List[Repair]]:
+    """
+    Duyệt một lần từ vị trí start đến hết object ngoài cùng và sửa các lỗi thường gặp
+
+    Các lỗi được sửa: chú thích // và /* */, dấu phẩy thừa trước } hoặc ], thiếu dấu phẩy giữa
+    hai giá trị, khóa không có dấu nháy kép, chuỗi dùng dấu nháy đơn, True/False/None, và văn bản
+    bị cắt giữa chừng (cắt về giá trị hoàn chỉnh cuối cùng rồi đóng các ngoặc còn mở).
+    Phần văn bản không cần sửa được sao chép nguyên khối.
+
+    Returns:
+        Tuple (văn bản JSON đã sửa, danh sách chỗ đã sửa)
+    """
+    pieces: List[str] = []
+    repairs: List[Repair] = []
+    copied_until = start
+    # Ngăn xếp các container đang mở: True nếu là object
+    stack: List[bool] = []
+    expecting_key = False
+    prev_kind = None
+    pending_comma = None
+    # Điểm cắt an toàn nếu văn bản bị cắt giữa chừng: (số phần tử của pieces, số container đang mở)
+    safe_point = None
+
+    def replace(begin: int, end: int, replacement: str):
+        nonlocal copied_until
+        pieces.append(text[copied_until:begin])
+        pieces.append(replacement)
+        copied_until = end
+
+    def mark_safe(position: int):
+        nonlocal copied_until, safe_point
+        pieces.append(text[copied_until:position])
+        copied_until = position
+        safe_point = (len(pieces), len(stack))
+
+    position = start
+    length = len(text)
+    while position < length:
+        match = _TOKEN_PATTERN.match(text, position)
+        if match is None:
+            # Chỉ còn khoảng trắng
+            break
+        kind = match.lastgroup
+        token = match.group(kind)
+        begin, end = match.span(kind)
+        position = end
+
+        if kind == "comment":
+            replace(begin, end, "")
+            repairs.append(Repair("comment", begin))
+            continue
+
+        if pending_comma is not None:
+            # Dấu phẩy chỉ được ghi lại khi theo sau là một giá trị
+            if kind == "close":
+                repairs.append(Repair("trailing_comma", pending_comma))
+            else:
+                pieces.append(",")
+            pending_comma = None
+        elif prev_kind in _VALUE_END and kind in _VALUE_START and stack:
+            replace(begin, begin, ",")
+            repairs.append(Repair("missing_comma", begin))
+            expecting_key = stack[-1]
+
+        if kind == "partial":
+            # Chuỗi chưa đóng: văn bản bị cắt giữa chừng
+            break
+
+        if kind == "open":
+            stack.append(token == "{")
+            expecting_key = stack[-1]
+            mark_safe(end)
+        elif kind == "close":
+            if not stack:
+                break
+            stack.pop()
+            expecting_key = False
+            if not stack:
+                pieces.append(text[copied_until:end])
+                copied_until = end
+                return "".join(pieces), repairs
+            mark_safe(end)
+        elif kind == "comma":
+            mark_safe(begin)
+            copied_until = end
+            pending_comma = begin
+            expecting_key = bool(stack) and stack[-1]
+        elif kind == "colon":
+            expecting_key = False
+        elif kind == "squote":
+            replace(begin, end, json.dumps(token[1:-1].replace("\\'", "'"), ensure_ascii=False))
+            repairs.append(Repair("single_quotes", begin))
+        elif kind == "bare":
+            if expecting_key:
+                replace(begin, end, json.dumps(token, ensure_ascii=False))
+                repairs.append(Repair("unquoted_key", begin))
+            elif token in _BARE_LITERALS:
+                replace(begin, end, _BARE_LITERALS[token])
+                repairs.append(Repair("literal", begin))
+
+        if kind in ("string", "squote") and stack and (not stack[-1] or prev_kind == "colon"):
+            # Một chuỗi giá trị hoàn chỉnh cũng là điểm cắt an toàn
+            mark_safe(end)
+
+        prev_kind = kind
+
+    # Hết văn bản khi object chưa đóng: cắt về điểm an toàn cuối cùng và đóng các ngoặc còn mở
+    if safe_point is None:
+        raise JSONRepairError("Văn bản JSON bị cắt trước khi có giá trị hoàn chỉnh")
+    piece_count, depth = safe_point
+    del pieces[piece_count:]
+    pieces.extend("}" if is_object else "]" for is_object in reversed(stack[:depth]))
+    repairs.append(Repair("truncated", position))
+    return "".join(pieces), repairs
+
+
+def parse_json_object(text: str) -> Tuple[Any, List[Repair]]:
+    """
+    Tìm và parse JSON object ngoài cùng trong văn bản (ví dụ phản hồi của Gemini)
+
+    Trường hợp thường gặp (JSON hợp lệ, có thể nằm trong code block) được parse trực tiếp
+    trên văn bản gốc, không tạo bản sao. Chỉ khi parse thất bại mới chạy repair_json.
+
+    Returns:
+        Tuple (object đã parse, danh sách chỗ đã sửa - rỗng nếu không cần sửa)
+
+    Raises:
+        JSONRepairError: Khi không tìm thấy object hoặc không thể sửa
+    """
+    start = find_json_start(text)
+    if start < 0:
+        raise JSONRepairError("Không tìm thấy JSON object trong văn bản")
+
+    try:
+        data, _ = _decoder.raw_decode(text, start)
+        return data, []
+    except json.JSONDecodeError:
+        pass
+
+    repaired, repairs = repair_json(text, start)
+    try:
+        return _decoder.decode(repaired), repairs
+    except json.JSONDecodeError as e:
+        raise JSONRepairError(f"Không thể sửa JSON: {str(e)}") from e
+
+
+class JSONParseMetrics:
+    """Thống kê số lần JSON parse được trực tiếp, phải sửa, hoặc không parse được"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.parsed = 0
+        self.repaired = 0
+        self.failed = 0
+        self.repair_kinds: Dict[str, int] = {}
+
+    def record(self, repairs: List[Repair]):
+        with self._lock:
+            if repairs:
+                self.repaired += 1
+                for kind in {repair.kind for repair in repairs}:
+                    self.repair_kinds[kind] = self.repair_kinds.get(kind, 0) + 1
+            else:
+                self.parsed += 1
+
+    def record_failure(self):
+        with self._lock:
+            self.failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.parsed + self.repaired + self.failed
+            return {
+                "parsed": self.parsed,
+                "repaired": self.repaired,
+                "failed": self.failed,
+                "repair_rate": round((self.repaired + self.failed) / total, 4) if total > 0 else 0.0,
+                "repair_kinds": dict(self.repair_kinds)
+            }
@@ -0,0 +1,115 @@
+import re
+import math
+import bisect
+import heapq
+from collections import defaultdict
+from typing import Any, Dict, List
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Trọng số của từng trường khi tính điểm (tiêu đề quan trọng nhất, sau đó là chủ đề)
+FIELD_WEIGHTS = {"title": 3.0, "topics": 2.0, "description": 1.0}
+
+# Trọng số cho các từ chỉ khớp tiền tố với từ trong truy vấn (ví dụ "develop" -> "development")
+PREFIX_MATCH_WEIGHT = 0.5
+MIN_PREFIX_LENGTH = 3
+
+
+def tokenize(text: str) -> List[str]:
+    """Tách văn bản thành các từ viết thường"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class KeywordIndex:
+    """
+    Chỉ mục ngược (inverted index) trên tiêu đề, chủ đề và mô tả khóa học, xếp hạng theo BM25
+
+    Chỉ mục được xây dựng một lần; mỗi truy vấn chỉ duyệt danh sách posting của các từ
+    trong truy vấn nên chi phí không phụ thuộc tuyến tính vào số lượng khóa học.
+    """
+
+    def __init__(self, courses: List[Dict[str, Any]], k1: float = 1.2, b: float = 0.75):
+        self.courses = courses
+        self.k1 = k1
+        self.b = b
+
+        # term -> {doc_id: {field: tf}}
+        self.postings: Dict[str, Dict[int, Dict[str, int]]] = defaultdict(dict)
+        field_lengths = {field: [] for field in FIELD_WEIGHTS}
+
+        for doc_id, course in enumerate(courses):
+            fields = {
+                "title": course.get('title', ''),
+                "topics": " ".join(course.get('topics', [])),
+                "description": course.get('description', '') or '',
+            }
+            for field, text in fields.items():
+                tokens = tokenize(text)
+                field_lengths[field].append(len(tokens))
+                for token in tokens:
+                    field_tf = self.postings[token].setdefault(doc_id, {})
+                    field_tf[field] = field_tf.get(field, 0) + 1
+
+        self.field_lengths = field_lengths
+        self.avg_field_lengths = {
+            field: (sum(lengths) / len(lengths) if lengths else 0.0) or 1.0
+            for field, lengths in field_lengths.items()
+        }
+        self.vocabulary = sorted(self.postings)
+
+        n_docs = len(courses)
+        self.idf = {
+            term: math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def _expand(self, term: str) -> Dict[str, float]:
+        """Tìm các từ trong chỉ mục khớp với từ truy vấn (khớp chính xác hoặc khớp tiền tố)"""
+        matches = {}
+        if term in self.postings:
+            matches[term] = 1.0
+        if len(term) >= MIN_PREFIX_LENGTH:
+            i = bisect.bisect_left(self.vocabulary, term)
+            while i < len(self.vocabulary) and self.vocabulary[i].startswith(term):
+                if self.vocabulary[i] != term:
+                    matches[self.vocabulary[i]] = PREFIX_MATCH_WEIGHT
+                i += 1
+        return matches
+
+    def search(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
+        """
+        Tìm kiếm khóa học theo từ khóa
+
+        Returns:
+            Danh sách khóa học cùng định dạng với VectorStore.search_courses,
+            relevance_score được chuẩn hóa về thang 0-1
+        """
+        scores: Dict[int, float] = defaultdict(float)
+
+        for query_term in set(tokenize(query)):
+            for term, term_weight in self._expand(query_term).items():
+                idf = self.idf[term]
+                for doc_id, field_tf in self.postings[term].items():
+                    score = 0.0
+                    for field, tf in field_tf.items():
+                        norm = 1 - self.b + self.b * self.field_lengths[field][doc_id] / self.avg_field_lengths[field]
+                        score += FIELD_WEIGHTS[field] * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+                    scores[doc_id] += term_weight * idf * score
+
+        if not scores:
+            return []
+
+        top = heapq.nlargest(n_results, scores.items(), key=lambda item: (item[1], -item[0]))
+        max_score = top[0][1]
+
+        results = []
+        for doc_id, score in top:
+            course = self.courses[doc_id]
+            results.append({
+                "title": course['title'],
+                "level": course['level'],
+                "topics": course['topics'],
+                "duration": course['duration'],
+                "relevance_score": round(score / max_score, 4)
+            })
+        return results
@@ -0,0 +1,75 @@
+# Response schema cho chế độ structured output của Gemini (responseMimeType: application/json),
+# khớp với cấu trúc learning_path mà process_learning_path_json mong đợi.
+# Định dạng là tập con OpenAPI 3.0 mà Gemini API hỗ trợ.
+
+_STRING = {"type": "STRING"}
+_STRING_LIST = {"type": "ARRAY", "items": _STRING}
+
+COURSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "title": _STRING,
+        "level": _STRING,
+        "duration": {"type": "INTEGER", "description": "Thời lượng ước tính (tuần)"},
+        "topics": _STRING_LIST
+    },
+    "required": ["title", "level", "duration", "topics"],
+    "propertyOrdering": ["title", "level", "duration", "topics"]
+}
+
+PHASE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "name": _STRING,
+        "duration": {"type": "INTEGER", "description": "Số ngày dự kiến"},
+        "tasks": _STRING_LIST
+    },
+    "required": ["name", "duration", "tasks"],
+    "propertyOrdering": ["name", "duration", "tasks"]
+}
+
+DAY_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "date": {"type": "STRING", "description": "YYYY-MM-DD"},
+        "day_of_week": _STRING,
+        "tasks": {
+            "type": "ARRAY",
+            "items": {"type": "STRING", "description": "Nhiệm vụ kèm thời gian, ví dụ: ... (1.5 giờ)"}
+        }
+    },
+    "required": ["date", "day_of_week", "tasks"],
+    "propertyOrdering": ["date", "day_of_week", "tasks"]
+}
+
+# Thứ tự courses -> phases -> daily_plan giúp chế độ streaming gửi được khóa học và giai đoạn sớm
+LEARNING_PATH_FIELDS = [
+    "field", "level", "duration", "daily_hours", "interests",
+    "courses", "phases", "daily_plan", "overview", "projects", "resources", "tips"
+]
+
+LEARNING_PATH_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "learning_path": {
+            "type": "OBJECT",
+            "properties": {
+                "field": _STRING,
+                "level": _STRING,
+                "duration": {"type": "INTEGER"},
+                "daily_hours": {"type": "NUMBER"},
+                "interests": _STRING_LIST,
+                "courses": {"type": "ARRAY", "items": COURSE_SCHEMA},
+                "phases": {"type": "ARRAY", "items": PHASE_SCHEMA},
+                "daily_plan": {"type": "ARRAY", "items": DAY_SCHEMA},
+                "overview": _STRING,
+                "projects": _STRING_LIST,
+                "resources": _STRING_LIST,
+                "tips": _STRING_LIST
+            },
+            "required": ["courses", "phases", "daily_plan", "overview", "projects", "resources", "tips"],
+            "propertyOrdering": LEARNING_PATH_FIELDS
+        }
+    },
+    "required": ["learning_path"]
+}
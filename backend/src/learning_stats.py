@@ -0,0 +1,54 @@
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from src.database import LearningPath, Task
+
+# Số ngày gần nhất được đếm trong một truy vấn cho thống kê theo ngày và streak; chỉ khi streak
+# kéo dài hết khoảng này mới cần thêm một truy vấn cho các ngày cũ hơn
+STATS_STREAK_WINDOW_DAYS = max(int(os.getenv("STATS_STREAK_WINDOW_DAYS", "90")), 7)
+
+
+def completed_tasks_by_day(db: Session, user_id: int, first_day: Optional[date], last_day: date) -> Dict[date, int]:
+    """
+    Đếm số task đã hoàn thành theo ngày của người dùng bằng một truy vấn GROUP BY date(Task.date)
+
+    Args:
+        first_day: Ngày đầu (None để đếm tất cả các ngày trước last_day)
+        last_day: Ngày cuối (tính cả ngày này)
+
+    Returns:
+        Dict ngày -> số task đã hoàn thành (chỉ gồm các ngày có task hoàn thành)
+    """
+    day = func.date(Task.date)
+    query = db.query(day, func.count(Task.id)).filter(
+        Task.user_id == user_id,
+        Task.completed == True,
+        Task.date < datetime.combine(last_day + timedelta(days=1), datetime.min.time())
+    )
+    if first_day is not None:
+        query = query.filter(Task.date >= datetime.combine(first_day, datetime.min.time()))
+    return {date.fromisoformat(value): count for value, count in query.group_by(day)}
+
+
+def count_streak(counts: Dict[date, int], last_day: date) -> int:
+    """Số ngày liên tiếp có task hoàn thành, tính lùi từ last_day"""
+    streak = 0
+    current_date = last_day
+    while counts.get(current_date, 0) > 0:
+        streak += 1
+        current_date -= timedelta(days=1)
+    return streak
+
+
+def get_overall_counts(db: Session, user_id: int) -> Tuple[int, int, int]:
+    """(số lộ trình, tổng số task, số task đã hoàn thành) của người dùng trong một truy vấn"""
+    total_paths = db.query(func.count(LearningPath.id)).filter(
+        LearningPath.user_id == user_id
+    ).scalar_subquery()
+    return db.query(
+        total_paths,
+        func.count(Task.id),
+        func.coalesce(func.sum(case((Task.completed == True, 1), else_=0)), 0)
+    ).select_from(Task).filter(Task.user_id == user_id).one()
@@ -0,0 +1,105 @@
+import os
+import copy
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+
+# Mức log mặc định của toàn bộ ứng dụng
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Mức log riêng theo module, ví dụ: "src.vector_store=WARNING,src.gemini_client=DEBUG"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# File log chung (xoay vòng theo kích thước); để trống để chỉ ghi ra console
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+LOG_FILE_MAX_BYTES = int(os.getenv("LOG_FILE_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_FILE_BACKUP_COUNT = int(os.getenv("LOG_FILE_BACKUP_COUNT", "5"))
+# Độ dài tối đa của nội dung một dòng log, phần dài hơn bị cắt bỏ
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))
+# Số bản ghi tối đa chờ ghi; khi đầy bản ghi mới bị bỏ qua thay vì làm chậm request
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_lock = threading.Lock()
+_listener: Optional[QueueListener] = None
+
+
+class TruncatingQueueHandler(QueueHandler):
+    """
+    Đưa bản ghi log vào hàng đợi để thread nền ghi ra console/file
+
+    Nội dung log được tạo (kể cả tham số %s) và cắt bớt ở thread gọi trước khi vào hàng đợi,
+    nên thread ghi không giữ tham chiếu tới object lớn. Khi hàng đợi đầy bản ghi bị bỏ qua.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]", max_chars: int = LOG_MAX_MESSAGE_CHARS):
+        super().__init__(log_queue)
+        self.max_chars = max_chars
+        self.dropped = 0
+        self._exception_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = record.getMessage()
+        if len(message) > self.max_chars:
+            message = f"{message[:self.max_chars]}... [đã cắt {len(message) - self.max_chars} ký tự]"
+
+        record = copy.copy(record)
+        record.msg = message
+        record.message = message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_log_levels(spec: str) -> Dict[str, str]:
+    """Parse chuỗi "module=LEVEL,module=LEVEL" thành dict"""
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging():
+    """
+    Cấu hình logging dùng chung cho toàn bộ ứng dụng (chỉ một lần cho mỗi process)
+
+    Mọi logger ghi qua một QueueHandler; console và file log được ghi trên thread nền
+    của QueueListener nên I/O log không nằm trong thời gian xử lý request.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        handlers = [logging.StreamHandler()]
+        if LOG_FILE:
+            handlers.append(RotatingFileHandler(LOG_FILE, maxBytes=LOG_FILE_MAX_BYTES,
+                                                backupCount=LOG_FILE_BACKUP_COUNT, encoding='utf-8'))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(TruncatingQueueHandler(log_queue))
+        root.setLevel(LOG_LEVEL)
+        for name, level in parse_log_levels(LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
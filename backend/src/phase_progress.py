@@ -0,0 +1,60 @@
+from typing import Iterable, Optional, Tuple
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from src.database import Task, Progress
+
+
+def completion_percentage(completed: int, total: int) -> int:
+    """Phần trăm hoàn thành (làm tròn) của một giai đoạn"""
+    return round(completed / total * 100) if total > 0 else 0
+
+
+def count_phase_tasks(db: Session, learning_path_id: int, phase: str) -> Tuple[int, int]:
+    """Đếm (tổng số task, số task đã hoàn thành) của một giai đoạn từ bảng tasks"""
+    total, completed = db.query(
+        func.count(Task.id),
+        func.coalesce(func.sum(case((Task.completed == True, 1), else_=0)), 0)
+    ).filter(
+        Task.learning_path_id == learning_path_id,
+        Task.phase == phase
+    ).one()
+    return total, completed
+
+
+def rebuild_phase_counters(db: Session, learning_path_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Tính lại completed_tasks, total_tasks và progress_percentage của các dòng progress từ bảng tasks
+
+    Dùng một truy vấn GROUP BY (learning_path_id, phase) cho tất cả lộ trình cần tính lại.
+    Không commit; người gọi commit cùng transaction của mình.
+
+    Args:
+        learning_path_ids: Các lộ trình cần tính lại (mặc định là tất cả)
+
+    Returns:
+        Số dòng progress đã cập nhật
+    """
+    counts_query = db.query(
+        Task.learning_path_id,
+        Task.phase,
+        func.count(Task.id),
+        func.coalesce(func.sum(case((Task.completed == True, 1), else_=0)), 0)
+    ).group_by(Task.learning_path_id, Task.phase)
+    progress_query = db.query(Progress)
+    if learning_path_ids is not None:
+        learning_path_ids = list(learning_path_ids)
+        counts_query = counts_query.filter(Task.learning_path_id.in_(learning_path_ids))
+        progress_query = progress_query.filter(Progress.learning_path_id.in_(learning_path_ids))
+
+    counts = {(path_id, phase): (total, completed) for path_id, phase, total, completed in counts_query}
+
+    updated = 0
+    for progress in progress_query:
+        total, completed = counts.get((progress.learning_path_id, progress.skill_name), (0, 0))
+        percentage = completion_percentage(completed, total)
+        if (progress.total_tasks, progress.completed_tasks, progress.progress_percentage) != (total, completed, percentage):
+            progress.total_tasks = total
+            progress.completed_tasks = completed
+            progress.progress_percentage = percentage
+            updated += 1
+    return updated
@@ -3,21 +3,18 @@ import json
 import logging
 from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify
-from sqlalchemy import and_, or_, func, desc
+from sqlalchemy import and_, or_, func, desc, case
 from sqlalchemy.orm import joinedload
 
 from src.database import SessionLocal, User, LearningPath, Task, Progress
 from src.auth_api import get_user_from_token
+from src.daily_plan import materialize_daily_plan
+from src.phase_progress import completion_percentage, count_phase_tasks, rebuild_phase_counters
+from src.learning_stats import STATS_STREAK_WINDOW_DAYS, completed_tasks_by_day, count_streak, get_overall_counts
+from src.logging_config import setup_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('progress.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging (shared by the whole app, see src/logging_config.py)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Create blueprint
@@ -50,6 +47,15 @@ def auth_required(f):
     decorated.__name__ = f.__name__
     return decorated
 
+def format_progress_item(p):
+    """Format a Progress row for JSON responses"""
+    return {
+        "id": p.id,
+        "skill_name": p.skill_name,
+        "progress_percentage": p.progress_percentage,
+        "last_updated": p.last_updated.isoformat() if p.last_updated else None
+    }
+
 @progress_api.route('/learning-paths', methods=['GET'])
 @auth_required
 def get_learning_paths(user):
@@ -57,43 +63,36 @@ def get_learning_paths(user):
     try:
         db = get_db()
         try:
-            # Get learning paths
-            learning_paths = db.query(LearningPath).filter(
+            # Get learning paths with task counts in one grouped query
+            completed_count = func.coalesce(func.sum(case((Task.completed == True, 1), else_=0)), 0)
+            rows = db.query(
+                LearningPath,
+                func.count(Task.id).label('total_tasks'),
+                completed_count.label('completed_tasks')
+            ).outerjoin(
+                Task, Task.learning_path_id == LearningPath.id
+            ).filter(
                 LearningPath.user_id == user.id
+            ).group_by(
+                LearningPath.id
             ).order_by(
                 desc(LearningPath.created_at)
             ).all()
             
-            # Format response
-            result = []
-            for path in learning_paths:
-                # Count completed tasks
-                total_tasks = db.query(func.count(Task.id)).filter(
-                    Task.learning_path_id == path.id
-                ).scalar()
-                
-                completed_tasks = db.query(func.count(Task.id)).filter(
-                    and_(
-                        Task.learning_path_id == path.id,
-                        Task.completed == True
-                    )
-                ).scalar()
-                
-                # Get progress
+            # Get progress for all paths in one query
+            progress_by_path = {}
+            if rows:
                 progress_items = db.query(Progress).filter(
-                    Progress.learning_path_id == path.id
+                    Progress.learning_path_id.in_([path.id for path, _, _ in rows])
+                ).order_by(
+                    Progress.id
                 ).all()
-                
-                progress_data = []
                 for p in progress_items:
-                    progress_data.append({
-                        "id": p.id,
-                        "skill_name": p.skill_name,
-                        "progress_percentage": p.progress_percentage,
-                        "last_updated": p.last_updated.isoformat() if p.last_updated else None
-                    })
-                
-                # Format path
+                    progress_by_path.setdefault(p.learning_path_id, []).append(format_progress_item(p))
+            
+            # Format response
+            result = []
+            for path, total_tasks, completed_tasks in rows:
                 result.append({
                     "id": path.id,
                     "field": path.field,
@@ -106,7 +105,7 @@ def get_learning_paths(user):
                         "total_tasks": total_tasks,
                         "completed_tasks": completed_tasks,
                         "completion_percentage": round(completed_tasks / total_tasks * 100) if total_tasks > 0 else 0,
-                        "skills": progress_data
+                        "skills": progress_by_path.get(path.id, [])
                     }
                 })
             
@@ -163,14 +162,7 @@ def get_learning_path(user, path_id):
                 Progress.learning_path_id == path.id
             ).all()
             
-            progress_data = []
-            for p in progress_items:
-                progress_data.append({
-                    "id": p.id,
-                    "skill_name": p.skill_name,
-                    "progress_percentage": p.progress_percentage,
-                    "last_updated": p.last_updated.isoformat() if p.last_updated else None
-                })
+            progress_data = [format_progress_item(p) for p in progress_items]
             
             # Format response
             result = {
@@ -194,6 +186,41 @@ def get_learning_path(user, path_id):
         logger.error(f"Error getting learning path: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def build_task_rows(daily_plan, phases, learning_path_id, user_id, now):
+    """
+    Build Task rows (dicts for bulk insert) from a daily plan
+    
+    Days are split evenly across phases in order; days with an invalid date are
+    placed at now + day index.
+    """
+    phase_names = [phase.get('name', f'Phase {i+1}') for i, phase in enumerate(phases)]
+    days_per_phase = max(len(daily_plan) // len(phase_names), 1) if phase_names else 1
+    
+    rows = []
+    for day_index, day in enumerate(daily_plan):
+        try:
+            task_date = datetime.fromisoformat(day.get('date'))
+        except (ValueError, TypeError):
+            # If date is invalid, use current date + days
+            task_date = now + timedelta(days=day_index)
+        
+        # Determine phase based on position in the plan
+        phase_index = min(len(phase_names) - 1, day_index // days_per_phase) if phase_names else 0
+        phase_name = phase_names[phase_index] if phase_names else 'Phase 1'
+        
+        for task_desc in day.get('tasks', []):
+            rows.append({
+                "learning_path_id": learning_path_id,
+                "user_id": user_id,
+                "title": task_desc[:50],
+                "description": task_desc,
+                "completed": False,
+                "date": task_date,
+                "phase": phase_name,
+                "created_at": now
+            })
+    return rows
+
 @progress_api.route('/learning-paths/<int:path_id>/save', methods=['POST'])
 @auth_required
 def save_learning_path(user, path_id):
@@ -235,86 +262,53 @@ def save_learning_path(user, path_id):
             learning_path.duration = path_data.get('duration', 0)
             learning_path.daily_hours = path_data.get('daily_hours', 0)
             
+            # Expand the full daily plan (compact fallback plans only carry a template,
+            # checked against the path duration before expanding)
+            try:
+                daily_plan = materialize_daily_plan(path_data)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            
             # Calculate total hours
-            total_days = len(path_data.get('daily_plan', []))
+            total_days = len(daily_plan)
             total_hours = total_days * learning_path.daily_hours
             learning_path.total_hours = total_hours
             learning_path.total_days = total_days
             
-            # Save path to get ID if new
-            db.commit()
-            db.refresh(learning_path)
+            # Flush to get the ID if new; everything is committed in one transaction below
+            db.flush()
             
             # Save tasks
             if existing_path:
                 # Delete existing tasks
                 db.query(Task).filter(Task.learning_path_id == learning_path.id).delete()
             
-            # Process daily plan to create tasks
-            daily_plan = path_data.get('daily_plan', [])
             phases = path_data.get('phases', [])
-            phase_map = {}
-            
-            # Build phase map
-            for i, phase in enumerate(phases):
-                phase_map[i] = phase.get('name', f'Phase {i+1}')
-            
-            # Create tasks from daily plan
-            for day in daily_plan:
-                date_str = day.get('date')
-                try:
-                    task_date = datetime.fromisoformat(date_str)
-                except (ValueError, TypeError):
-                    # If date is invalid, use current date + days
-                    task_date = datetime.utcnow() + timedelta(days=daily_plan.index(day))
-                
-                # Determine phase based on date
-                phase_index = min(len(phases) - 1, daily_plan.index(day) // (total_days // len(phases)))
-                phase_name = phase_map.get(phase_index, f'Phase {phase_index+1}')
-                
-                # Create tasks for this day
-                for task_desc in day.get('tasks', []):
-                    task = Task(
-                        learning_path_id=learning_path.id,
-                        user_id=user.id,
-                        title=task_desc[:50] if len(task_desc) > 50 else task_desc,
-                        description=task_desc,
-                        completed=False,
-                        date=task_date,
-                        phase=phase_name,
-                        created_at=datetime.utcnow()
-                    )
-                    db.add(task)
+            now = datetime.utcnow()
+            db.bulk_insert_mappings(Task, build_task_rows(daily_plan, phases, learning_path.id, user.id, now))
             
-            # Save skills progress placeholders
+            # Save skills progress placeholders (only create new if none exist)
+            create_progress = True
             if existing_path:
-                # Only create new if none exist
-                existing_progress = db.query(Progress).filter(
+                create_progress = db.query(Progress).filter(
                     Progress.learning_path_id == learning_path.id
-                ).count()
-                
-                if existing_progress == 0:
-                    # Create initial progress entries for skills
-                    for phase in phases:
-                        progress = Progress(
-                            user_id=user.id,
-                            learning_path_id=learning_path.id,
-                            skill_name=phase.get('name', 'Unknown skill'),
-                            progress_percentage=0,
-                            last_updated=datetime.utcnow()
-                        )
-                        db.add(progress)
-            else:
-                # Create initial progress entries for skills
-                for phase in phases:
-                    progress = Progress(
-                        user_id=user.id,
-                        learning_path_id=learning_path.id,
-                        skill_name=phase.get('name', 'Unknown skill'),
-                        progress_percentage=0,
-                        last_updated=datetime.utcnow()
-                    )
-                    db.add(progress)
+                ).count() == 0
+            
+            if create_progress:
+                db.bulk_insert_mappings(Progress, [
+                    {
+                        "user_id": user.id,
+                        "learning_path_id": learning_path.id,
+                        "skill_name": phase.get('name', 'Unknown skill'),
+                        "progress_percentage": 0,
+                        "last_updated": now
+                    }
+                    for phase in phases
+                ])
+            
+            # Phase counters from the newly inserted tasks
+            db.flush()
+            rebuild_phase_counters(db, [learning_path.id])
             
             db.commit()
             
@@ -352,25 +346,8 @@ def toggle_task(user, task_id):
             if not task:
                 return jsonify({"error": "Task không tồn tại hoặc không thuộc về bạn"}), 404
                 
-            # Toggle completion
-            task.completed = not task.completed
-            db.commit()
-            
-            # Update skill progress
-            # Get all tasks for this phase
-            tasks_in_phase = db.query(Task).filter(
-                and_(
-                    Task.learning_path_id == task.learning_path_id,
-                    Task.phase == task.phase
-                )
-            ).all()
-            
-            # Calculate completion percentage
-            total_tasks = len(tasks_in_phase)
-            completed_tasks = sum(1 for t in tasks_in_phase if t.completed)
-            completion_percentage = round(completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
-            
-            # Update progress
+            # Get the phase progress row with its counters (before toggling, so counts
+            # rebuilt from the tasks table reflect the current state)
             progress = db.query(Progress).filter(
                 and_(
                     Progress.learning_path_id == task.learning_path_id,
@@ -378,20 +355,33 @@ def toggle_task(user, task_id):
                 )
             ).first()
             
-            if progress:
-                progress.progress_percentage = completion_percentage
-                progress.last_updated = datetime.utcnow()
-            else:
+            counters_stored = progress is not None and progress.total_tasks is not None \
+                and progress.completed_tasks is not None
+            if progress is None:
                 # Create new progress
                 progress = Progress(
                     user_id=user.id,
                     learning_path_id=task.learning_path_id,
-                    skill_name=task.phase,
-                    progress_percentage=completion_percentage,
-                    last_updated=datetime.utcnow()
+                    skill_name=task.phase
                 )
                 db.add(progress)
-                
+            if not counters_stored:
+                # Counters not initialized yet (new row, or saved before counters existed)
+                progress.total_tasks, progress.completed_tasks = count_phase_tasks(db, task.learning_path_id, task.phase)
+            
+            # Toggle completion and update the phase counter in the same transaction
+            task.completed = not task.completed
+            delta = 1 if task.completed else -1
+            if not counters_stored:
+                progress.completed_tasks += delta
+            else:
+                # Relative update so concurrent toggles in the same phase are not lost
+                progress.completed_tasks = Progress.completed_tasks + delta
+                db.flush()
+            
+            percentage = completion_percentage(progress.completed_tasks, progress.total_tasks)
+            progress.progress_percentage = percentage
+            progress.last_updated = datetime.utcnow()
             db.commit()
             
             return jsonify({
@@ -401,7 +391,7 @@ def toggle_task(user, task_id):
                 },
                 "progress": {
                     "skill_name": task.phase,
-                    "progress_percentage": completion_percentage
+                    "progress_percentage": percentage
                 }
             }), 200
             
@@ -464,70 +454,30 @@ def get_weekly_stats(user):
     try:
         db = get_db()
         try:
-            # Calculate dates for the past week
+            # Completed tasks per day for the recent window (one GROUP BY query)
             today = datetime.utcnow().date()
-            week_ago = today - timedelta(days=7)
+            window_start = today - timedelta(days=STATS_STREAK_WINDOW_DAYS - 1)
+            counts = completed_tasks_by_day(db, user.id, window_start, today)
             
-            # Get completed tasks by day
+            # Stats for the past week
             stats_by_day = []
             for i in range(7):
-                date = week_ago + timedelta(days=i+1)
-                day_start = datetime.combine(date, datetime.min.time())
-                day_end = datetime.combine(date, datetime.max.time())
-                
-                # Count tasks completed on this day
-                completed_count = db.query(func.count(Task.id)).filter(
-                    and_(
-                        Task.user_id == user.id,
-                        Task.completed == True,
-                        Task.date >= day_start,
-                        Task.date <= day_end
-                    )
-                ).scalar()
-                
+                date = today - timedelta(days=6 - i)
                 stats_by_day.append({
                     "date": date.isoformat(),
                     "day_of_week": date.strftime("%A"),
-                    "completed_tasks": completed_count
+                    "completed_tasks": counts.get(date, 0)
                 })
             
             # Calculate overall stats
-            total_paths = db.query(func.count(LearningPath.id)).filter(
-                LearningPath.user_id == user.id
-            ).scalar()
-            
-            total_tasks = db.query(func.count(Task.id)).filter(
-                Task.user_id == user.id
-            ).scalar()
-            
-            completed_tasks = db.query(func.count(Task.id)).filter(
-                and_(
-                    Task.user_id == user.id,
-                    Task.completed == True
-                )
-            ).scalar()
+            total_paths, total_tasks, completed_tasks = get_overall_counts(db, user.id)
             
             # Get streak (consecutive days with completed tasks)
-            streak = 0
-            current_date = today
-            while True:
-                day_start = datetime.combine(current_date, datetime.min.time())
-                day_end = datetime.combine(current_date, datetime.max.time())
-                
-                completed = db.query(func.count(Task.id)).filter(
-                    and_(
-                        Task.user_id == user.id,
-                        Task.completed == True,
-                        Task.date >= day_start,
-                        Task.date <= day_end
-                    )
-                ).scalar()
-                
-                if completed > 0:
-                    streak += 1
-                    current_date -= timedelta(days=1)
-                else:
-                    break
+            streak = count_streak(counts, today)
+            if streak == STATS_STREAK_WINDOW_DAYS:
+                # Streak covers the whole window: count the older days in one more query
+                older_counts = completed_tasks_by_day(db, user.id, None, window_start - timedelta(days=1))
+                streak += count_streak(older_counts, window_start - timedelta(days=1))
             
             return jsonify({
                 "daily_stats": stats_by_day,
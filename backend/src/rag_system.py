@@ -1,36 +1,45 @@
 import os
+import copy
 import json
+import asyncio
 import logging
-import re
-import requests
 import time
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterator, Tuple
 from datetime import datetime, timedelta
-from langchain_cohere import CohereEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from dotenv import load_dotenv
-from langchain.schema import Document
 from src.vector_store import VectorStore
-import cohere
-
-# Cấu hình logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('rag.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+from src.keyword_index import KeywordIndex
+from src.gemini_client import GeminiClient, AsyncGeminiClient, GeminiHTTPError
+from src.stream_parser import LearningPathStreamParser, STREAMED_ARRAYS
+from src.result_cache import LearningPathCache, canonical_request, make_cache_key
+from src.single_flight import SingleFlight
+from src.json_repair import JSONParseMetrics, JSONRepairError, parse_json_object
+from src.learning_path_schema import LEARNING_PATH_RESPONSE_SCHEMA
+from src.daily_plan import WEEKDAY_NAMES, DATE_FORMAT, build_plan_template, expand_daily_plan, parse_daily_hours, parse_duration, plan_days
+from src.resources import load_environment, get_course_catalog, get_topic_registry, get_debug_dump_sink, get_cohere_client, get_gemini_client, get_async_gemini_client
+from src.logging_config import setup_logging
+
+# Cấu hình logging (dùng chung cho toàn bộ ứng dụng, xem src/logging_config.py)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# Kích thước và thời gian sống (giây) của cache lộ trình học tập
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "21600"))
+
+# Yêu cầu Gemini trả về JSON theo response schema (structured output) thay vì JSON trong văn bản tự do
+GEMINI_STRUCTURED_OUTPUT = os.getenv("GEMINI_STRUCTURED_OUTPUT", "true").lower() in ("1", "true", "yes")
+
 class LearningPathRAG:
-    def __init__(self, courses_file="data/courses.json", cohere_api_key=None):
+    def __init__(self, courses_file="data/courses.json", cohere_api_key=None, topic_registry_file="data/topic_registry.json"):
         """Khởi tạo hệ thống RAG"""
         try:
+            init_start = time.perf_counter()
+            timings = {}
+            
             # Load environment variables
-            load_dotenv()
+            step_start = time.perf_counter()
+            load_environment()
+            timings["env"] = time.perf_counter() - step_start
             
             # Thiết lập logging
             self.logger = logging.getLogger(__name__)
@@ -48,14 +57,40 @@ class LearningPathRAG:
             # Thiết lập đường dẫn file courses
             self.courses_file = courses_file
             
-            # Tải dữ liệu khóa học
-            self.courses = self.load_courses()
+            # Bảng chủ đề/nhiệm vụ cho lộ trình dự phòng
+            self.topic_registry_file = topic_registry_file
+            
+            # Tải dữ liệu khóa học (danh mục dùng chung với VectorStore)
+            step_start = time.perf_counter()
+            self.load_courses()
+            timings["catalog"] = time.perf_counter() - step_start
             
-            # Khởi tạo Cohere client
-            self.cohere_client = cohere.Client(api_key=self.cohere_api_key)
+            # Xây dựng chỉ mục từ khóa cho tìm kiếm dự phòng
+            step_start = time.perf_counter()
+            self._keyword_index = None
+            self._keyword_index = self.keyword_index
+            timings["keyword_index"] = time.perf_counter() - step_start
+            
+            # Cache lộ trình học tập cho các request giống nhau
+            self.result_cache = LearningPathCache(max_size=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+            
+            # Gộp các request giống nhau đang được tạo đồng thời thành một lần gọi Gemini
+            self.inflight = SingleFlight()
+            
+            # Thống kê số phản hồi của Gemini vẫn cần sửa JSON
+            self.json_metrics = JSONParseMetrics()
             
             # Khởi tạo vectorstore
+            step_start = time.perf_counter()
             self.vectorstore = self.create_vector_store()
+            timings["vector_store"] = time.perf_counter() - step_start
+            if self.vectorstore is not None:
+                for step, elapsed in self.vectorstore.startup_timings.items():
+                    timings[f"vector_store.{step}"] = elapsed
+            
+            timings["total"] = time.perf_counter() - init_start
+            self.startup_timings = timings
+            logger.info("Thời gian khởi động: " + ", ".join(f"{step}={elapsed:.3f}s" for step, elapsed in timings.items()))
             
             logger.info("Khởi tạo LearningPathRAG thành công")
             
@@ -63,14 +98,40 @@ class LearningPathRAG:
             logger.error(f"Lỗi khởi tạo hệ thống RAG: {str(e)}")
             raise
 
+    @property
+    def courses(self) -> List[Dict[str, Any]]:
+        """Danh mục khóa học dùng chung, tự động cập nhật khi courses.json thay đổi"""
+        return get_course_catalog(self.courses_file)[0]
+
+    @property
+    def keyword_index(self) -> KeywordIndex:
+        """Chỉ mục từ khóa cho tìm kiếm dự phòng, chỉ xây dựng lại khi danh mục khóa học thay đổi"""
+        courses = self.courses
+        if self._keyword_index is None or self._keyword_index.courses is not courses:
+            self._keyword_index = KeywordIndex(courses)
+        return self._keyword_index
+
+    @property
+    def gemini_client(self) -> GeminiClient:
+        """Gemini client dùng chung trong process"""
+        return get_gemini_client(self.google_api_key)
+
+    @property
+    def async_gemini_client(self) -> AsyncGeminiClient:
+        """Gemini client async dùng chung trong event loop đang chạy"""
+        return get_async_gemini_client(self.google_api_key)
+
+    @property
+    def cohere_client(self):
+        """Cohere client dùng chung, chỉ được tạo khi cần"""
+        return get_cohere_client(self.cohere_api_key)
+
     def load_courses(self):
         """Load courses from JSON file"""
         try:
-            with open(self.courses_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                courses = data['courses']
-                logger.info(f"Đã load {len(courses)} khóa học")
-                return courses
+            courses = self.courses
+            logger.info(f"Đã load {len(courses)} khóa học")
+            return courses
         except Exception as e:
             logger.error(f"Lỗi load courses: {str(e)}")
             raise
@@ -78,39 +139,8 @@ class LearningPathRAG:
     def create_vector_store(self):
         """Tạo vector store từ dữ liệu khóa học"""
         try:
-            # Tạo text representations cho các khóa học
-            texts = []
-            metadatas = []
-            for course in self.courses:
-                # Tạo text representation chi tiết hơn
-                text = f"""
-                Khóa học: {course['title']}
-                Mô tả: {course['description']}
-                Chủ đề: {', '.join(course['topics'])}
-                Cấp độ: {course['level']}
-                Điều kiện tiên quyết: {', '.join(course['prerequisites']) if course['prerequisites'] else 'Không có'}
-                Thời lượng: {course['duration']} tuần
-                """
-                
-                # Thêm metadata để dễ dàng lọc và tìm kiếm
-                metadata = {
-                    'title': course['title'],
-                    'level': course['level'],
-                    'topics': course['topics'],
-                    'duration': course['duration']
-                }
-                
-                texts.append(text)
-                metadatas.append(metadata)
-            
-            # Split texts thành chunks
-            docs = [
-                Document(page_content=text, metadata=metadata)
-                for text, metadata in zip(texts, metadatas)
-            ]
-            
-            # Tạo vector store
-            vectorstore = VectorStore()
+            # VectorStore dùng chung danh mục khóa học và client embedding với hệ thống RAG
+            vectorstore = VectorStore(courses_file=self.courses_file, cohere_api_key=self.cohere_api_key)
             
             logger.info("Đã tạo vector store thành công")
             return vectorstore
@@ -127,7 +157,7 @@ class LearningPathRAG:
                 logger.warning("Vector store là None, sẽ tạo mới vector store")
                 try:
                     # Thử tạo lại vector store
-                    self.create_vector_store()
+                    self.vectorstore = self.create_vector_store()
                 except Exception as ve:
                     logger.error(f"Không thể tạo vector store: {str(ve)}")
             
@@ -142,74 +172,9 @@ class LearningPathRAG:
                 except Exception as e:
                     logger.error(f"Lỗi khi tìm kiếm với vector store: {str(e)}")
             
-            # Fallback: Tìm kiếm thủ công trong danh sách khóa học
+            # Fallback: Tìm kiếm theo từ khóa trên chỉ mục ngược của danh sách khóa học
             logger.warning(f"Sử dụng phương pháp tìm kiếm thủ công cho '{query}'")
-            filtered_courses = []
-            
-            # Chuyển query về chữ thường để so sánh
-            query_lower = query.lower()
-            query_terms = query_lower.split()
-            
-            for course in self.courses:
-                # Chuyển title và topics về chữ thường để so sánh
-                course_title = course['title'].lower()
-                course_topics = [topic.lower() for topic in course['topics']]
-                course_description = course['description'].lower() if 'description' in course else ""
-                
-                # Tính điểm phù hợp
-                score = 0
-                
-                # Nếu query hoàn toàn trùng với title
-                if query_lower == course_title:
-                    score += 5
-                    
-                # Nếu query là một phần của title
-                elif query_lower in course_title:
-                    score += 4
-                
-                # Nếu các từ trong query xuất hiện trong title
-                for term in query_terms:
-                    if term in course_title:
-                        score += 3
-                
-                # Nếu query trùng với bất kỳ topic nào
-                if any(query_lower == topic for topic in course_topics):
-                    score += 4
-                
-                # Nếu query là một phần của bất kỳ topic nào
-                elif any(query_lower in topic for topic in course_topics):
-                    score += 3
-                
-                # Nếu các từ trong query xuất hiện trong topics
-                for term in query_terms:
-                    if any(term in topic for topic in course_topics):
-                        score += 2
-                
-                # Nếu query xuất hiện trong description
-                if query_lower in course_description:
-                    score += 2
-                
-                # Nếu các từ trong query xuất hiện trong description
-                for term in query_terms:
-                    if term in course_description:
-                        score += 1
-                
-                # Nếu có điểm phù hợp, thêm vào danh sách kết quả
-                if score > 0:
-                    course_info = {
-                        "title": course['title'],
-                        "level": course['level'],
-                        "topics": course['topics'],
-                        "duration": course['duration'],
-                        "relevance_score": score / 10.0  # Chuẩn hóa về thang điểm 0-1
-                    }
-                    filtered_courses.append(course_info)
-            
-            # Sắp xếp kết quả theo điểm phù hợp giảm dần
-            filtered_courses.sort(key=lambda x: x['relevance_score'], reverse=True)
-            
-            # Giới hạn số lượng kết quả
-            filtered_courses = filtered_courses[:n_results]
+            filtered_courses = self.keyword_index.search(query, n_results=n_results)
             
             logger.info(f"Tìm kiếm thủ công: Đã tìm thấy {len(filtered_courses)} khóa học liên quan")
             return filtered_courses
@@ -219,56 +184,122 @@ class LearningPathRAG:
             # Trong trường hợp lỗi xảy ra, trả về danh sách rỗng
             return []
 
-    def create_learning_path(self, field: str, level: str, duration: int, daily_hours: int, interests: List[str]) -> Dict[str, Any]:
+    async def afind_similar_courses(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
+        """Phiên bản async của find_similar_courses"""
+        try:
+            if self.vectorstore is not None:
+                logger.info(f"Tìm kiếm khóa học liên quan đến '{query}' sử dụng vector store (async)")
+                search_results = await self.vectorstore.asearch_courses(query, n_results=n_results)
+                if search_results:
+                    logger.info(f"Đã tìm thấy {len(search_results)} khóa học liên quan")
+                    return search_results
+            
+            # Không có vector store (hoặc không có kết quả): dùng lại luồng đồng bộ trong thread pool,
+            # gồm cả việc thử tạo lại vector store và tìm kiếm theo từ khóa
+            return await asyncio.to_thread(self.find_similar_courses, query, n_results)
+                
+        except Exception as e:
+            logger.error(f"Lỗi tìm kiếm khóa học: {str(e)}")
+            return []
+
+    @staticmethod
+    def course_queries(field: str, interests: Optional[List[str]]) -> List[str]:
+        """Câu truy vấn khóa học của một request: lĩnh vực và lĩnh vực kèm từng sở thích"""
+        queries = [field]
+        for interest in interests or []:
+            interest = str(interest).strip()
+            if interest:
+                queries.append(f"{field} {interest}")
+        return list(dict.fromkeys(queries))
+
+    @staticmethod
+    def merge_course_results(batch_results: List[List[Dict[str, Any]]], n_results: int) -> List[Dict[str, Any]]:
         """
-        Tạo lộ trình học tập cá nhân hóa dựa trên các tham số đầu vào bằng cách sử dụng Gemini API.
+        Gộp kết quả tìm kiếm của nhiều câu truy vấn theo thứ hạng
+
+        Lấy lần lượt kết quả hạng 1 của mọi câu truy vấn, rồi hạng 2, ... (bỏ khóa học trùng tên),
+        để mỗi sở thích đều có khóa học trong n_results kết quả đầu tiên.
+        """
+        merged = []
+        seen = set()
+        for rank in range(max((len(results) for results in batch_results), default=0)):
+            for results in batch_results:
+                if rank < len(results) and results[rank].get("title") not in seen:
+                    seen.add(results[rank].get("title"))
+                    merged.append(results[rank])
+                    if len(merged) == n_results:
+                        return merged
+        return merged
+
+    def find_courses_for_request(self, field: str, interests: Optional[List[str]], n_results: int = 5) -> List[Dict[str, Any]]:
+        """
+        Tìm khóa học cho lĩnh vực và các sở thích của request
+
+        Các câu truy vấn được embedding và tìm kiếm trong một lần gọi search_courses_batch; không có
+        sở thích (hoặc không có kết quả) thì dùng find_similar_courses như trước.
+        """
+        queries = self.course_queries(field, interests)
+        if len(queries) > 1 and self.vectorstore is not None:
+            logger.info(f"Tìm kiếm khóa học theo lô cho '{field}' và {len(queries) - 1} sở thích")
+            try:
+                merged = self.merge_course_results(self.vectorstore.search_courses_batch(queries, n_results=n_results), n_results)
+                if merged:
+                    logger.info(f"Đã tìm thấy {len(merged)} khóa học liên quan")
+                    return merged
+            except Exception as e:
+                logger.error(f"Lỗi khi tìm kiếm theo lô với vector store: {str(e)}")
+        return self.find_similar_courses(field, n_results=n_results)
+
+    async def afind_courses_for_request(self, field: str, interests: Optional[List[str]], n_results: int = 5) -> List[Dict[str, Any]]:
+        """Phiên bản async của find_courses_for_request"""
+        if len(self.course_queries(field, interests)) > 1:
+            # search_courses_batch gọi Cohere đồng bộ nên chạy trong thread pool
+            return await asyncio.to_thread(self.find_courses_for_request, field, interests, n_results)
+        return await self.afind_similar_courses(field, n_results=n_results)
+
+    def format_courses_info(self, relevant_courses: List[Dict[str, Any]]) -> str:
+        """Tạo đoạn mô tả các khóa học liên quan để đưa vào prompt"""
+        if not relevant_courses:
+            return ""
+        
+        courses_info = "Chúng tôi đã tìm thấy các khóa học sau đây trong cơ sở dữ liệu có thể liên quan đến yêu cầu của bạn:\n"
+        for i, course in enumerate(relevant_courses):
+            course_details = f"- {course.get('title', 'N/A')} (Cấp độ: {course.get('level', 'N/A')}, Thời lượng: {course.get('duration', 'N/A')} tuần"
+            topics = course.get('topics', [])
+            if topics:
+                course_details += f", Chủ đề chính: {', '.join(topics[:3])}"
+            course_details += ")\n"
+            courses_info += course_details
+        return courses_info
+
+    def retrieve_courses_info(self, field: str, level: str, interests: Optional[List[str]] = None):
+        """
+        Tìm các khóa học liên quan và tạo đoạn mô tả khóa học để đưa vào prompt
         
-        Args:
-            field: Lĩnh vực học tập
-            level: Trình độ (Beginner, Intermediate, Advanced)
-            duration: Thời gian học tập (tháng)
-            daily_hours: Số giờ học mỗi ngày
-            interests: Danh sách các chủ đề quan tâm
-            
         Returns:
-            Dict chứa thông tin lộ trình học tập
+            Tuple (danh sách khóa học liên quan, đoạn mô tả khóa học)
         """
+        courses_info = ""
+        relevant_courses = []
+
         try:
-            # Kiểm tra API key
-            if not self.google_api_key:
-                logger.warning("GOOGLE_API_KEY không được cung cấp, sử dụng lộ trình dự phòng")
-                relevant_courses = self.find_similar_courses(field, n_results=5)
-                fallback_result = self.generate_fallback_learning_path(field, level, duration, daily_hours, interests, relevant_courses)
-                if "learning_path" in fallback_result:
-                    fallback_result["learning_path"]["is_fallback"] = True
-                    fallback_result["learning_path"]["fallback_reason"] = "GOOGLE_API_KEY không được cung cấp"
-                logger.info("Đã tạo lộ trình học tập fallback")
-                return fallback_result
-                
-            logger.info(f"Bắt đầu tạo lộ trình học tập cho {field}, trình độ {level}")
-            
-            # Tìm các khóa học tương tự từ vector store
-            courses_info = ""
-            relevant_courses = []
-            
-            try:
-                # Tìm các khóa học tương tự từ vector store
-                relevant_courses = self.find_similar_courses(field, n_results=5)
-                if relevant_courses:
-                    courses_info = "Chúng tôi đã tìm thấy các khóa học sau đây trong cơ sở dữ liệu có thể liên quan đến yêu cầu của bạn:\n"
-                    for i, course in enumerate(relevant_courses):
-                        course_details = f"- {course.get('title', 'N/A')} (Cấp độ: {course.get('level', 'N/A')}, Thời lượng: {course.get('duration', 'N/A')} tuần"
-                        topics = course.get('topics', [])
-                        if topics:
-                            course_details += f", Chủ đề chính: {', '.join(topics[:3])}"
-                        course_details += ")\n"
-                        courses_info += course_details
-            except Exception as e:
-                logger.warning(f"Không thể tìm khóa học tương tự: {str(e)}")
-                courses_info = f"Không tìm thấy khóa học nào đặc biệt phù hợp cho {field}, {level} trong cơ sở dữ liệu."
-            
-            # Tạo prompt cho Gemini
-            prompt = f"""
+            # Tìm các khóa học tương tự từ vector store (lĩnh vực và các sở thích trong một lô)
+            relevant_courses = self.find_courses_for_request(field, interests, n_results=5)
+            courses_info = self.format_courses_info(relevant_courses)
+        except Exception as e:
+            logger.warning(f"Không thể tìm khóa học tương tự: {str(e)}")
+            courses_info = f"Không tìm thấy khóa học nào đặc biệt phù hợp cho {field}, {level} trong cơ sở dữ liệu."
+        
+        return relevant_courses, courses_info
+
+    async def aretrieve_courses_info(self, field: str, level: str, interests: Optional[List[str]] = None):
+        """Phiên bản async của retrieve_courses_info"""
+        relevant_courses = await self.afind_courses_for_request(field, interests, n_results=5)
+        return relevant_courses, self.format_courses_info(relevant_courses)
+
+    def build_learning_path_prompt(self, field: str, level: str, duration: int, daily_hours: int, interests: List[str], courses_info: str) -> str:
+        """Tạo prompt yêu cầu Gemini sinh lộ trình học tập dạng JSON"""
+        return f"""
 Yêu cầu: Tạo lộ trình học tập chi tiết bằng tiếng Việt cho lĩnh vực "{field}", trình độ {level}, trong vòng {duration} tháng, với thời gian học khoảng {daily_hours} giờ/ngày.
 Người dùng có sở thích đặc biệt với: {', '.join(interests)}.
 
@@ -331,35 +362,178 @@ Phản hồi của bạn PHẢI là một JSON object hợp lệ duy nhất, tu
 Hãy đảm bảo JSON trả về là hợp lệ và đầy đủ các trường theo cấu trúc trên.
 """
 
+    def build_gemini_payload(self, prompt: str) -> Dict[str, Any]:
+        """
+        Tạo payload cho request tới Gemini API
+        
+        Khi GEMINI_STRUCTURED_OUTPUT bật, Gemini được yêu cầu trả về JSON theo
+        LEARNING_PATH_RESPONSE_SCHEMA nên phản hồi parse được trực tiếp mà không cần sửa.
+        """
+        generation_config = {
+            "temperature": 1.0,
+            "topP": 0.95,
+            "topK": 40,
+            "maxOutputTokens": 8192
+        }
+        if GEMINI_STRUCTURED_OUTPUT:
+            generation_config["responseMimeType"] = "application/json"
+            generation_config["responseSchema"] = LEARNING_PATH_RESPONSE_SCHEMA
+        
+        return {
+            "generationConfig": generation_config,
+            "contents": [
+                {
+                    "role": "user",
+                    "parts": [{"text": prompt}]
+                }
+            ]
+        }
+
+    def get_cached_learning_path(self, cache_key: str, field: str, level: str, duration: int, daily_hours: int, interests: List[str]) -> Optional[Dict[str, Any]]:
+        """Lấy lộ trình từ cache, gán lại tham số của request hiện tại và ngày tháng tính từ hôm nay"""
+        cached_result = self.result_cache.get(cache_key)
+        if cached_result is None:
+            return None
+        
+        logger.info("Sử dụng lộ trình học tập từ cache")
+        cached_path = cached_result["learning_path"]
+        self.rebind_learning_path(cached_path, field, level, duration, daily_hours, interests)
+        self.normalize_daily_plan_dates(cached_path)
+        return cached_result
+
+    def rebind_learning_path(self, learning_path: Dict[str, Any], field: str, level: str, duration: int, daily_hours: int, interests: List[str]):
+        """Gán tham số của request hiện tại cho lộ trình được tạo từ một request tương đương"""
+        learning_path.update(field=field, level=level, duration=duration, daily_hours=daily_hours, interests=interests)
+
+    def share_result(self, result: Dict[str, Any], field: str, level: str, duration: int, daily_hours: int, interests: List[str]) -> Dict[str, Any]:
+        """Tạo bản sao kết quả của request đã được gộp cho request hiện tại"""
+        result = copy.deepcopy(result)
+        if "learning_path" in result:
+            self.rebind_learning_path(result["learning_path"], field, level, duration, daily_hours, interests)
+        return result
+
+    def create_fallback_result(self, field: str, level: str, duration: int, daily_hours: int, interests: List[str], relevant_courses: List[Dict[str, Any]], reason: str) -> Dict[str, Any]:
+        """Tạo lộ trình dự phòng và đánh dấu lý do sử dụng"""
+        fallback_result = self.generate_fallback_learning_path(field, level, duration, daily_hours, interests, relevant_courses)
+        # Đánh dấu là fallback
+        if "learning_path" in fallback_result:
+            fallback_result["learning_path"]["is_fallback"] = True
+            fallback_result["learning_path"]["fallback_reason"] = reason
+        logger.info("Đã tạo lộ trình học tập fallback")
+        return fallback_result
+
+    def extract_response_text(self, response_data: Dict[str, Any]) -> Optional[str]:
+        """Lấy văn bản do Gemini sinh ra từ JSON phản hồi, trả về None nếu không có candidate nào"""
+        if "candidates" in response_data and len(response_data["candidates"]) > 0:
+            return response_data["candidates"][0]["content"]["parts"][0]["text"]
+        return None
+
+    def create_emergency_result(self, field: str, level: str, duration: int, daily_hours: int, interests: List[str], error: Exception) -> Dict[str, Any]:
+        """Tạo một lộ trình mặc định đơn giản trong trường hợp lỗi nghiêm trọng"""
+        return {
+            "learning_path": {
+                "field": field,
+                "level": level,
+                "duration": duration,
+                "daily_hours": daily_hours,
+                "interests": interests,
+                "is_fallback": True,
+                "fallback_reason": f"Lỗi nghiêm trọng: {str(error)}",
+                "courses": [],
+                "phases": [
+                    {
+                        "name": f"Nền tảng {field}",
+                        "duration": 30,
+                        "tasks": [f"Học cơ bản về {field}"]
+                    }
+                ],
+                "daily_plan": [
+                    {
+                        "date": datetime.now().strftime("%Y-%m-%d"),
+                        "day_of_week": "Ngày 1",
+                        "tasks": [f"Bắt đầu học {field} ({daily_hours} giờ)"]
+                    }
+                ],
+                "overview": f"Lộ trình học tập {field} cơ bản",
+                "projects": [],
+                "resources": [],
+                "tips": []
+            }
+        }
+
+    def finalize_generated_path(self, response_text: str, cache_key: str, field: str, level: str, duration: int, daily_hours: int, interests: List[str]) -> Dict[str, Any]:
+        """Parse phản hồi của Gemini, đánh dấu là kết quả thật và lưu vào cache nếu có nội dung"""
+        result = self.process_learning_path_json(response_text, field, level, duration, daily_hours, interests)
+        # Đánh dấu là kết quả thật từ API
+        if "learning_path" in result:
+            result["learning_path"]["is_fallback"] = False
+            # Chỉ cache khi parse được nội dung lộ trình
+            if result["learning_path"].get("phases") or result["learning_path"].get("daily_plan"):
+                self.result_cache.put(cache_key, result)
+        return result
+
+    def create_learning_path(self, field: str, level: str, duration: int, daily_hours: int, interests: List[str]) -> Dict[str, Any]:
+        """
+        Tạo lộ trình học tập cá nhân hóa dựa trên các tham số đầu vào bằng cách sử dụng Gemini API.
+        
+        Các request có cùng tham số (sau khi chuẩn hóa) đến trong lúc một request đang được tạo
+        sẽ chờ và dùng chung kết quả thay vì gọi Gemini thêm lần nữa.
+        
+        Args:
+            field: Lĩnh vực học tập
+            level: Trình độ (Beginner, Intermediate, Advanced)
+            duration: Thời gian học tập (tháng)
+            daily_hours: Số giờ học mỗi ngày
+            interests: Danh sách các chủ đề quan tâm
+            
+        Returns:
+            Dict chứa thông tin lộ trình học tập
+        """
+        key = make_cache_key(canonical_request(field, level, duration, daily_hours, interests))
+        result, shared = self.inflight.do(
+            key, lambda: self._create_learning_path(field, level, duration, daily_hours, interests)
+        )
+        if shared:
+            logger.info(f"Dùng chung kết quả với request đang chạy cho {field}, trình độ {level}")
+            result = self.share_result(result, field, level, duration, daily_hours, interests)
+        return result
+
+    def _create_learning_path(self, field: str, level: str, duration: int, daily_hours: int, interests: List[str]) -> Dict[str, Any]:
+        """Tạo lộ trình học tập (không gộp request), xem create_learning_path"""
+        try:
+            # Kiểm tra API key
+            if not self.google_api_key:
+                logger.warning("GOOGLE_API_KEY không được cung cấp, sử dụng lộ trình dự phòng")
+                relevant_courses = self.find_courses_for_request(field, interests, n_results=5)
+                return self.create_fallback_result(field, level, duration, daily_hours, interests, relevant_courses,
+                                                   "GOOGLE_API_KEY không được cung cấp")
+                
+            logger.info(f"Bắt đầu tạo lộ trình học tập cho {field}, trình độ {level}")
+            
+            # Tìm các khóa học tương tự từ vector store
+            relevant_courses, courses_info = self.retrieve_courses_info(field, level, interests)
+            
+            # Kiểm tra cache kết quả theo tham số đã chuẩn hóa và tập khóa học tìm được
+            cache_key = make_cache_key(
+                canonical_request(field, level, duration, daily_hours, interests), relevant_courses
+            )
+            cached_result = self.get_cached_learning_path(cache_key, field, level, duration, daily_hours, interests)
+            if cached_result is not None:
+                return cached_result
+            
+            # Tạo prompt cho Gemini
+            prompt = self.build_learning_path_prompt(field, level, duration, daily_hours, interests, courses_info)
+
             # Gọi Gemini API qua HTTP request
             try:
                 logger.info("Gọi Gemini API để tạo lộ trình học tập")
                 
                 # Chuẩn bị request
-                url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={self.google_api_key}"
-                
-                payload = {
-                    "generationConfig": {
-                        "temperature": 1.0,
-                        "topP": 0.95,
-                        "topK": 40,
-                        "maxOutputTokens": 8192
-                    },
-                    "contents": [
-                        {
-                            "role": "user",
-                            "parts": [{"text": prompt}]
-                        }
-                    ]
-                }
+                payload = self.build_gemini_payload(prompt)
                 
-                headers = {
-                    "Content-Type": "application/json"
-                }
-                
-                # Gửi request và đo thời gian
+                # Gửi request qua client dùng chung (keep-alive, timeout, thử lại) và đo thời gian
                 start_time = time.time()
-                response = requests.post(url, json=payload, headers=headers)
+                response = self.gemini_client.post(payload)
                 end_time = time.time()
                 
                 logger.info(f"Thời gian request Gemini: {end_time - start_time:.2f} giây")
@@ -367,87 +541,231 @@ Hãy đảm bảo JSON trả về là hợp lệ và đầy đủ các trường
                 # Kiểm tra kết quả
                 if response.status_code == 200:
                     logger.info("Request thành công!")
-                    response_data = response.json()
+                    response_text = self.extract_response_text(response.json())
                     
-                    if "candidates" in response_data and len(response_data["candidates"]) > 0:
-                        response_text = response_data["candidates"][0]["content"]["parts"][0]["text"]
+                    if response_text is not None:
                         logger.info(f"Nhận được phản hồi từ Gemini API: {len(response_text)} ký tự")
                         
                         # Xử lý kết quả JSON
-                        result = self.process_learning_path_json(response_text, field, level, duration, daily_hours, interests)
-                        # Đánh dấu là kết quả thật từ API
-                        if "learning_path" in result:
-                            result["learning_path"]["is_fallback"] = False
-                        return result
+                        return self.finalize_generated_path(response_text, cache_key, field, level, duration, daily_hours, interests)
                     else:
                         logger.warning("Không nhận được phản hồi hợp lệ từ Gemini API, sử dụng lộ trình dự phòng")
-                        fallback_result = self.generate_fallback_learning_path(field, level, duration, daily_hours, interests, relevant_courses)
-                        # Đánh dấu là fallback
-                        if "learning_path" in fallback_result:
-                            fallback_result["learning_path"]["is_fallback"] = True
-                            fallback_result["learning_path"]["fallback_reason"] = "Gemini API không trả về dữ liệu hợp lệ"
-                        logger.info("Đã tạo lộ trình học tập fallback")
-                        return fallback_result
+                        return self.create_fallback_result(field, level, duration, daily_hours, interests, relevant_courses,
+                                                           "Gemini API không trả về dữ liệu hợp lệ")
                 else:
                     logger.error(f"Request thất bại với mã lỗi: {response.status_code}")
                     logger.error(f"Thông báo lỗi: {response.text}")
                     
                     # Sử dụng fallback khi có lỗi HTTP
                     logger.warning(f"Sử dụng lộ trình dự phòng do lỗi API: {response.status_code}")
-                    fallback_result = self.generate_fallback_learning_path(field, level, duration, daily_hours, interests, relevant_courses)
-                    # Đánh dấu là fallback
-                    if "learning_path" in fallback_result:
-                        fallback_result["learning_path"]["is_fallback"] = True
-                        fallback_result["learning_path"]["fallback_reason"] = f"Lỗi API HTTP {response.status_code}"
-                    logger.info("Đã tạo lộ trình học tập fallback")
-                    return fallback_result
+                    return self.create_fallback_result(field, level, duration, daily_hours, interests, relevant_courses,
+                                                       f"Lỗi API HTTP {response.status_code}")
                     
             except Exception as e:
                 logger.error(f"Lỗi khi gọi Gemini API: {str(e)}")
                 
                 # Fallback: Tạo lộ trình học tập mặc định
-                fallback_result = self.generate_fallback_learning_path(field, level, duration, daily_hours, interests, relevant_courses)
-                # Đánh dấu là fallback
-                if "learning_path" in fallback_result:
-                    fallback_result["learning_path"]["is_fallback"] = True
-                    fallback_result["learning_path"]["fallback_reason"] = f"Lỗi gọi API: {str(e)}"
-                logger.info("Đã tạo lộ trình học tập fallback")
-                return fallback_result
+                return self.create_fallback_result(field, level, duration, daily_hours, interests, relevant_courses,
+                                                   f"Lỗi gọi API: {str(e)}")
             
         except Exception as e:
             logger.error(f"Lỗi khi tạo lộ trình học tập: {str(e)}")
             # Tạo một lộ trình mặc định đơn giản trong trường hợp lỗi nghiêm trọng
-            fallback = {
-                "learning_path": {
-                    "field": field,
-                    "level": level,
-                    "duration": duration,
-                    "daily_hours": daily_hours,
-                    "interests": interests,
-                    "is_fallback": True,
-                    "fallback_reason": f"Lỗi nghiêm trọng: {str(e)}",
-                    "courses": [],
-                    "phases": [
-                        {
-                            "name": f"Nền tảng {field}",
-                            "duration": 30,
-                            "tasks": [f"Học cơ bản về {field}"]
-                        }
-                    ],
-                    "daily_plan": [
-                        {
-                            "date": datetime.now().strftime("%Y-%m-%d"),
-                            "day_of_week": "Ngày 1",
-                            "tasks": [f"Bắt đầu học {field} ({daily_hours} giờ)"]
-                        }
-                    ],
-                    "overview": f"Lộ trình học tập {field} cơ bản",
-                    "projects": [],
-                    "resources": [],
-                    "tips": []
-                }
-            }
-            return fallback
+            return self.create_emergency_result(field, level, duration, daily_hours, interests, e)
+
+    async def acreate_learning_path(self, field: str, level: str, duration: int, daily_hours: int, interests: List[str]) -> Dict[str, Any]:
+        """
+        Phiên bản async của create_learning_path cho server ASGI
+        
+        Embedding câu truy vấn và gọi Gemini được await trên event loop bằng client async, nên
+        một process có thể giữ hàng trăm request đang chờ Gemini mà không cần một thread cho
+        mỗi request. Các bước tốn CPU hoặc ghi file (tìm kiếm FAISS, parse JSON, tạo lộ trình
+        dự phòng) chạy trong thread pool để không chặn event loop.
+        
+        Returns:
+            Dict chứa thông tin lộ trình học tập, cùng định dạng với create_learning_path
+        """
+        key = make_cache_key(canonical_request(field, level, duration, daily_hours, interests))
+        result, shared = await self.inflight.ado(
+            key, lambda: self._acreate_learning_path(field, level, duration, daily_hours, interests)
+        )
+        if shared:
+            logger.info(f"Dùng chung kết quả với request đang chạy cho {field}, trình độ {level}")
+            result = self.share_result(result, field, level, duration, daily_hours, interests)
+        return result
+
+    async def _acreate_learning_path(self, field: str, level: str, duration: int, daily_hours: int, interests: List[str]) -> Dict[str, Any]:
+        """Tạo lộ trình học tập async (không gộp request), xem acreate_learning_path"""
+        try:
+            if not self.google_api_key:
+                logger.warning("GOOGLE_API_KEY không được cung cấp, sử dụng lộ trình dự phòng")
+                relevant_courses = await self.afind_courses_for_request(field, interests, n_results=5)
+                return await asyncio.to_thread(self.create_fallback_result, field, level, duration, daily_hours, interests,
+                                               relevant_courses, "GOOGLE_API_KEY không được cung cấp")
+            
+            logger.info(f"Bắt đầu tạo lộ trình học tập (async) cho {field}, trình độ {level}")
+            relevant_courses, courses_info = await self.aretrieve_courses_info(field, level, interests)
+            
+            cache_key = make_cache_key(
+                canonical_request(field, level, duration, daily_hours, interests), relevant_courses
+            )
+            cached_result = self.get_cached_learning_path(cache_key, field, level, duration, daily_hours, interests)
+            if cached_result is not None:
+                return cached_result
+            
+            prompt = self.build_learning_path_prompt(field, level, duration, daily_hours, interests, courses_info)
+            payload = self.build_gemini_payload(prompt)
+            
+            try:
+                logger.info("Gọi Gemini API (async) để tạo lộ trình học tập")
+                start_time = time.time()
+                response = await self.async_gemini_client.post(payload)
+                logger.info(f"Thời gian request Gemini: {time.time() - start_time:.2f} giây")
+                
+                if response.status_code == 200:
+                    response_text = self.extract_response_text(response.json())
+                    if response_text is not None:
+                        logger.info(f"Nhận được phản hồi từ Gemini API: {len(response_text)} ký tự")
+                        return await asyncio.to_thread(self.finalize_generated_path, response_text, cache_key,
+                                                       field, level, duration, daily_hours, interests)
+                    reason = "Gemini API không trả về dữ liệu hợp lệ"
+                else:
+                    logger.error(f"Request thất bại với mã lỗi: {response.status_code}")
+                    logger.error(f"Thông báo lỗi: {response.text}")
+                    reason = f"Lỗi API HTTP {response.status_code}"
+                    
+            except Exception as e:
+                logger.error(f"Lỗi khi gọi Gemini API: {str(e)}")
+                reason = f"Lỗi gọi API: {str(e)}"
+            
+            logger.warning(f"Sử dụng lộ trình dự phòng: {reason}")
+            return await asyncio.to_thread(self.create_fallback_result, field, level, duration, daily_hours, interests,
+                                           relevant_courses, reason)
+            
+        except Exception as e:
+            logger.error(f"Lỗi khi tạo lộ trình học tập: {str(e)}")
+            return self.create_emergency_result(field, level, duration, daily_hours, interests, e)
+
+    def assign_day_date(self, day: Dict[str, Any], start_date: datetime, index: int):
+        """Gán ngày và thứ trong tuần cho ngày thứ index của daily_plan"""
+        current_date = start_date + timedelta(days=index)
+        # Gán ngày mới
+        day["date"] = current_date.strftime(DATE_FORMAT)
+        # Tính toán thứ trong tuần
+        day["day_of_week"] = WEEKDAY_NAMES[current_date.weekday()]
+
+    def iter_learning_path_events(self, result: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Tách một lộ trình hoàn chỉnh thành các sự kiện course, phase, day theo thứ tự"""
+        learning_path = result.get("learning_path", {})
+        for key, event in STREAMED_ARRAYS.items():
+            items = learning_path.get(key, [])
+            if key == "daily_plan" and learning_path.get("daily_plan_template"):
+                items = expand_daily_plan(learning_path["daily_plan_template"])
+            for item in items:
+                yield event, item
+
+    def stream_learning_path(self, field: str, level: str, duration: int, daily_hours: int, interests: List[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Tạo lộ trình học tập ở chế độ streaming
+        
+        Gọi streamGenerateContent của Gemini và trả về từng khóa học, giai đoạn và ngày học
+        ngay khi phần JSON tương ứng được sinh xong. Sự kiện cuối cùng luôn là "complete"
+        chứa toàn bộ lộ trình (giống kết quả của create_learning_path), kể cả khi phải
+        dùng lộ trình dự phòng.
+        
+        Yields:
+            Tuple (loại sự kiện, dữ liệu): "start", "course", "phase", "day", "complete"
+        """
+        yield "start", {"field": field, "level": level, "duration": duration, "daily_hours": daily_hours, "interests": interests}
+        
+        try:
+            result = yield from self._stream_learning_path_events(field, level, duration, daily_hours, interests)
+        except Exception as e:
+            logger.error(f"Lỗi khi tạo lộ trình học tập (stream): {str(e)}")
+            result = self.create_fallback_result(field, level, duration, daily_hours, interests, [],
+                                                 f"Lỗi nghiêm trọng: {str(e)}")
+        
+        yield "complete", result
+
+    def _stream_learning_path_events(self, field: str, level: str, duration: int, daily_hours: int, interests: List[str]):
+        """Sinh các sự kiện course/phase/day, trả về lộ trình hoàn chỉnh khi kết thúc"""
+        if not self.google_api_key:
+            logger.warning("GOOGLE_API_KEY không được cung cấp, sử dụng lộ trình dự phòng")
+            relevant_courses = self.find_courses_for_request(field, interests, n_results=5)
+            result = self.create_fallback_result(field, level, duration, daily_hours, interests, relevant_courses,
+                                                 "GOOGLE_API_KEY không được cung cấp")
+            yield from self.iter_learning_path_events(result)
+            return result
+        
+        logger.info(f"Bắt đầu tạo lộ trình học tập (stream) cho {field}, trình độ {level}")
+        relevant_courses, courses_info = self.retrieve_courses_info(field, level, interests)
+        
+        cache_key = make_cache_key(
+            canonical_request(field, level, duration, daily_hours, interests), relevant_courses
+        )
+        result = self.get_cached_learning_path(cache_key, field, level, duration, daily_hours, interests)
+        if result is not None:
+            yield from self.iter_learning_path_events(result)
+            return result
+        
+        prompt = self.build_learning_path_prompt(field, level, duration, daily_hours, interests, courses_info)
+        payload = self.build_gemini_payload(prompt)
+        
+        parser = LearningPathStreamParser()
+        chunks = []
+        start_date = datetime.now()
+        day_index = 0
+        start_time = time.time()
+        first_event_time = None
+        
+        try:
+            for text in self.gemini_client.stream(payload):
+                chunks.append(text)
+                for event, item in parser.feed(text):
+                    if event == "day":
+                        self.assign_day_date(item, start_date, day_index)
+                        day_index += 1
+                    if first_event_time is None:
+                        first_event_time = time.time()
+                        logger.info(f"Sự kiện stream đầu tiên sau {first_event_time - start_time:.2f} giây")
+                    yield event, item
+        except Exception as e:
+            logger.error(f"Lỗi khi stream từ Gemini API: {str(e)}")
+            reason = f"Lỗi API HTTP {e.status_code}" if isinstance(e, GeminiHTTPError) else f"Lỗi gọi API: {str(e)}"
+            return self.create_fallback_result(field, level, duration, daily_hours, interests, relevant_courses, reason)
+        
+        logger.info(f"Thời gian stream Gemini: {time.time() - start_time:.2f} giây")
+        response_text = "".join(chunks)
+        if not response_text:
+            return self.create_fallback_result(field, level, duration, daily_hours, interests, relevant_courses,
+                                               "Gemini API không trả về dữ liệu hợp lệ")
+        
+        return self.finalize_generated_path(response_text, cache_key, field, level, duration, daily_hours, interests)
+
+    def normalize_daily_plan_dates(self, learning_path: Dict[str, Any], start_date: Optional[datetime] = None):
+        """
+        Gán lại ngày và thứ trong tuần cho daily_plan, bắt đầu từ start_date (mặc định là hôm nay)
+        
+        Args:
+            learning_path: Dict lộ trình học tập (được sửa trực tiếp)
+            start_date: Ngày bắt đầu lộ trình
+        """
+        try:
+            if learning_path.get("daily_plan_template"):
+                start_date = start_date or datetime.now()
+                learning_path["daily_plan_template"]["start_date"] = start_date.strftime(DATE_FORMAT)
+            
+            if "daily_plan" in learning_path and learning_path["daily_plan"]:
+                # Lấy ngày hiện tại
+                start_date = start_date or datetime.now()
+                
+                # Định dạng lại ngày trong daily_plan
+                for i, day in enumerate(learning_path["daily_plan"]):
+                    self.assign_day_date(day, start_date, i)
+                
+                logger.info(f"Đã chuẩn hóa ngày tháng cho {len(learning_path['daily_plan'])} ngày")
+        except Exception as e:
+            logger.warning(f"Không thể chuẩn hóa ngày tháng: {str(e)}")
 
     def process_learning_path_json(self, response_text: str, field: str, level: str, duration: int, daily_hours: int, interests: List[str]) -> Dict[str, Any]:
         """
@@ -479,132 +797,60 @@ Hãy đảm bảo JSON trả về là hợp lệ và đầy đủ các trường
                 }
             }
             
-            # Tìm phần JSON trong kết quả - Gemini thường trả về JSON trong code block
-            json_str = ""
-            
-            # Trường hợp 1: JSON nằm trong code block ```json ... ```
-            json_block_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', response_text)
-            if json_block_match:
-                json_str = json_block_match.group(1)
-                logger.info("Đã tìm thấy JSON trong code block")
-            else:
-                # Trường hợp 2: JSON không nằm trong code block
-                start_pos = response_text.find('{')
-                end_pos = response_text.rfind('}') + 1
+            # Tìm và parse JSON object ngoài cùng (có thể nằm trong code block ```json ... ```),
+            # chỉ sửa JSON khi parse trực tiếp thất bại. Ở chế độ structured output phản hồi
+            # là JSON thuần nên gần như luôn parse được trực tiếp.
+            try:
+                json_data, repairs = parse_json_object(response_text)
+                self.json_metrics.record(repairs)
+            except JSONRepairError as je:
+                logger.warning(f"Không thể parse JSON từ phản hồi: {str(je)}")
+                self.json_metrics.record_failure()
+                json_data, repairs = None, []
+            
+            if repairs:
+                logger.info(f"Đã sửa JSON tại {len(repairs)} vị trí: " + ", ".join(f"{r.kind}@{r.position}" for r in repairs[:20]))
+            
+            if isinstance(json_data, dict):
+                logger.info("Phân tích JSON thành công")
                 
-                if start_pos >= 0 and end_pos > start_pos:
-                    json_str = response_text[start_pos:end_pos]
-                    logger.info("Đã tìm thấy JSON trong phản hồi")
-            
-            if json_str:
-                logger.info(f"JSON được trích xuất (200 ký tự đầu): {json_str[:200]}")
+                # Đảm bảo cấu trúc JSON đúng định dạng
+                if "learning_path" not in json_data:
+                    logger.warning("Không tìm thấy trường 'learning_path' trong JSON, thử kiểm tra cấu trúc cấp cao hơn")
+                    # JSON có thể không có cấu trúc nested đúng - kiểm tra các trường đặc trưng
+                    if any(key in json_data for key in ["courses", "phases", "daily_plan", "overview"]):
+                        json_data = {"learning_path": json_data}
                 
-                # Loại bỏ các kí tự không mong muốn
-                json_str = json_str.replace('\n', ' ').replace('\r', '')
+                # Đảm bảo tất cả các trường cần thiết đều tồn tại
+                learning_path = json_data.get("learning_path", {})
+                for key in ["courses", "phases", "daily_plan", "projects", "resources", "tips"]:
+                    if key not in learning_path:
+                        learning_path[key] = []
                 
-                # Thử phân tích JSON
-                try:
-                    json_data = json.loads(json_str)
-                    logger.info("Phân tích JSON thành công")
-                    
-                    # Đảm bảo cấu trúc JSON đúng định dạng
-                    if "learning_path" not in json_data:
-                        logger.warning("Không tìm thấy trường 'learning_path' trong JSON, thử kiểm tra cấu trúc cấp cao hơn")
-                        # JSON có thể không có cấu trúc nested đúng - kiểm tra các trường đặc trưng
-                        if any(key in json_data for key in ["courses", "phases", "daily_plan", "overview"]):
-                            json_data = {"learning_path": json_data}
-                    
-                    # Đảm bảo tất cả các trường cần thiết đều tồn tại
-                    learning_path = json_data.get("learning_path", {})
-                    for key in ["courses", "phases", "daily_plan", "projects", "resources", "tips"]:
-                        if key not in learning_path:
-                            learning_path[key] = []
-                    
-                    if "overview" not in learning_path:
-                        learning_path["overview"] = ""
-                    
-                    # Bảo toàn các trường cơ bản
-                    learning_path["field"] = field
-                    learning_path["level"] = level
-                    learning_path["duration"] = duration
-                    learning_path["daily_hours"] = daily_hours
-                    learning_path["interests"] = interests
-                    
-                    # Chuẩn hóa ngày tháng
-                    try:
-                        if "daily_plan" in learning_path and learning_path["daily_plan"]:
-                            # Lấy ngày hiện tại
-                            start_date = datetime.now()
-                            
-                            # Định dạng lại ngày trong daily_plan
-                            for i, day in enumerate(learning_path["daily_plan"]):
-                                # Tính toán ngày mới dựa trên chỉ số
-                                new_date = (start_date + timedelta(days=i)).strftime("%Y-%m-%d")
-                                # Gán ngày mới
-                                day["date"] = new_date
-                                
-                                # Tính toán thứ trong tuần
-                                weekday = (start_date + timedelta(days=i)).weekday()
-                                day_of_week = ["Thứ Hai", "Thứ Ba", "Thứ Tư", "Thứ Năm", "Thứ Sáu", "Thứ Bảy", "Chủ Nhật"][weekday]
-                                day["day_of_week"] = day_of_week
-                            
-                            logger.info(f"Đã chuẩn hóa ngày tháng cho {len(learning_path['daily_plan'])} ngày")
-                    except Exception as e:
-                        logger.warning(f"Không thể chuẩn hóa ngày tháng: {str(e)}")
-                    
-                    json_data["learning_path"] = learning_path
-                    
-                    # Lưu JSON để debug
-                    try:
-                        with open("last_learning_path.json", "w", encoding="utf-8") as f:
-                            json.dump(json_data, f, ensure_ascii=False, indent=2)
-                        logger.info("Đã lưu JSON vào file last_learning_path.json")
-                    except Exception as e:
-                        logger.warning(f"Không thể lưu JSON ra file: {str(e)}")
-                    
-                    return json_data
-                    
-                except json.JSONDecodeError as je:
-                    logger.warning(f"Lỗi parse JSON ban đầu: {str(je)}")
-                    
-                    # Thử cách làm sạch JSON
-                    try:
-                        # Sửa lỗi dấu phẩy thừa
-                        json_str = re.sub(r',\s*}', '}', json_str)
-                        json_str = re.sub(r',\s*]', ']', json_str)
-                        
-                        # Sửa các chuỗi JSON không hợp lệ
-                        json_str = json_str.replace("'", '"')
-                        # Thêm dấu ngoặc kép cho các khóa không có
-                        json_str = re.sub(r'([{,])\s*([a-zA-Z0-9_]+)\s*:', r'\1"\2":', json_str)
-                        
-                        logger.info(f"JSON sau khi làm sạch: {json_str[:200]}")
-                        json_data = json.loads(json_str)
-                        logger.info("Phân tích JSON thành công sau khi làm sạch")
-                        
-                        # Kiểm tra cấu trúc
-                        if "learning_path" not in json_data:
-                            json_data = {"learning_path": json_data}
-                        
-                        # Lưu JSON để debug
-                        try:
-                            with open("last_learning_path_cleaned.json", "w", encoding="utf-8") as f:
-                                json.dump(json_data, f, ensure_ascii=False, indent=2)
-                        except: pass
-                        
-                        return json_data
-                    except Exception as e2:
-                        logger.error(f"Vẫn không thể parse JSON sau khi làm sạch: {str(e2)}")
-            else:
-                logger.warning("Không tìm thấy cấu trúc JSON trong phản hồi")
+                if "overview" not in learning_path:
+                    learning_path["overview"] = ""
+                
+                # Bảo toàn các trường cơ bản
+                learning_path["field"] = field
+                learning_path["level"] = level
+                learning_path["duration"] = duration
+                learning_path["daily_hours"] = daily_hours
+                learning_path["interests"] = interests
+                
+                # Chuẩn hóa ngày tháng
+                self.normalize_daily_plan_dates(learning_path)
+                
+                json_data["learning_path"] = learning_path
+                
+                # Lưu JSON để debug (bản sao vì kết quả còn được sửa sau khi trả về)
+                debug_sink = get_debug_dump_sink()
+                if debug_sink.sample():
+                    debug_sink.write("learning_path", copy.deepcopy(json_data), repairs=[r.kind for r in repairs])
+                
+                return json_data
             
-            # Lưu phản hồi gốc vào file để debug
-            try:
-                with open("last_gemini_response.txt", "w", encoding="utf-8") as f:
-                    f.write(response_text)
-                logger.info("Đã lưu phản hồi gốc vào file last_gemini_response.txt")
-            except Exception as e:
-                logger.warning(f"Không thể lưu phản hồi gốc ra file: {str(e)}")
+            # Lưu phản hồi gốc để debug
+            get_debug_dump_sink().dump("gemini_response", response_text, field=field, level=level)
             
             return default_json
             
@@ -641,6 +887,12 @@ Hãy đảm bảo JSON trả về là hợp lệ và đầy đủ các trường
         try:
             logger.info(f"Sử dụng lộ trình học tập dự phòng cho {field}")
             
+            # duration có thể là chuỗi từ client ("3" * 30 là lặp chuỗi chứ không phải phép nhân)
+            months = parse_duration(duration)
+            duration = int(months) if months.is_integer() else months
+            # daily_hours cũng vậy: "2" / 2 trong expand_daily_plan sẽ lỗi TypeError
+            daily_hours = parse_daily_hours(daily_hours)
+            
             # Tạo kế hoạch học tập hàng ngày chi tiết trong trường hợp fallback
             start_date = datetime.now()
             
@@ -704,62 +956,11 @@ Hãy đảm bảo JSON trả về là hợp lệ và đầy đủ các trường
             # Danh sách nhiệm vụ dựa theo cấp độ
             level_tasks = self.generate_level_specific_tasks(level, field)
             
-            # Tạo kế hoạch chi tiết theo từng ngày
-            for day in range(duration * 30):  # Ước tính 30 ngày mỗi tháng
-                current_date = start_date + timedelta(days=day)
-                weekday = current_date.weekday()
-                day_of_week = ["Thứ Hai", "Thứ Ba", "Thứ Tư", "Thứ Năm", "Thứ Sáu", "Thứ Bảy", "Chủ Nhật"][weekday]
-                
-                # Tính toán giai đoạn hiện tại để tạo nội dung phù hợp
-                phase = min(day // 30 + 1, 3)  # Giai đoạn 1, 2, hoặc 3
-                
-                # Tạo các nhiệm vụ học tập phù hợp với giai đoạn và trình độ
-                if weekday == 6:  # Chủ nhật
-                    if phase == 1:
-                        tasks = [
-                            f"Ôn tập kiến thức cơ bản về {field_topics[day % len(field_topics)]} ({daily_hours/2} giờ)",
-                            f"Làm bài tập thực hành về {field_topics[(day+1) % len(field_topics)]} ({daily_hours/2} giờ)"
-                        ]
-                    elif phase == 2:
-                        tasks = [
-                            f"Ôn tập và tổng hợp kiến thức tuần trước ({daily_hours/3} giờ)",
-                            f"Thực hành dự án nhỏ về {field_topics[(day+2) % len(field_topics)]} ({daily_hours/3} giờ)",
-                            f"Lập kế hoạch học tập cho tuần mới ({daily_hours/3} giờ)"
-                        ]
-                    else:
-                        tasks = [
-                            f"Đánh giá tiến độ dự án ({daily_hours/3} giờ)",
-                            f"Thực hành nâng cao về {field_topics[(day+3) % len(field_topics)]} ({daily_hours/3} giờ)",
-                            f"Chuẩn bị nội dung thuyết trình dự án ({daily_hours/3} giờ)"
-                        ]
-                else:
-                    # Ngày thường
-                    if phase == 1:
-                        time_per_task = daily_hours / 2
-                        tasks = [
-                            f"Học lý thuyết về {field_topics[day % len(field_topics)]} ({time_per_task} giờ)",
-                            f"Thực hành {level_tasks[day % len(level_tasks)]} ({time_per_task} giờ)"
-                        ]
-                    elif phase == 2:
-                        time_per_task = daily_hours / 3
-                        tasks = [
-                            f"Học kỹ thuật {field_topics[(day+1) % len(field_topics)]} ({time_per_task} giờ)",
-                            f"Ứng dụng {level_tasks[(day+1) % len(level_tasks)]} ({time_per_task} giờ)",
-                            f"Nghiên cứu tình huống thực tế về {field_topics[(day+2) % len(field_topics)]} ({time_per_task} giờ)"
-                        ]
-                    else:
-                        time_per_task = daily_hours / 3
-                        tasks = [
-                            f"Học nâng cao về {field_topics[(day+3) % len(field_topics)]} ({time_per_task} giờ)",
-                            f"Phát triển dự án ứng dụng {field_topics[(day+4) % len(field_topics)]} ({time_per_task} giờ)",
-                            f"Giải quyết vấn đề phức tạp trong {field_topics[(day+5) % len(field_topics)]} ({time_per_task} giờ)"
-                        ]
-                
-                fallback_learning_path["daily_plan"].append({
-                    "date": current_date.strftime("%Y-%m-%d"),
-                    "day_of_week": day_of_week,
-                    "tasks": tasks
-                })
+            # Kế hoạch hàng ngày được lưu ở dạng rút gọn (giai đoạn, mẫu nhiệm vụ, quy tắc xoay vòng chủ đề)
+            # và chỉ sinh thành từng ngày cho khoảng ngày client yêu cầu (xem src/daily_plan.py)
+            fallback_learning_path["daily_plan_template"] = build_plan_template(
+                start_date, plan_days(duration), daily_hours, field_topics, level_tasks  # Ước tính 30 ngày mỗi tháng
+            )
             
             return {"learning_path": fallback_learning_path}
             
@@ -784,134 +985,12 @@ Hãy đảm bảo JSON trả về là hợp lệ và đầy đủ các trường
 
     def generate_field_specific_topics(self, field: str, interests: List[str]) -> List[str]:
         """
-        Tạo danh sách các chủ đề cụ thể dựa trên lĩnh vực và sở thích
+        Tạo danh sách các chủ đề cụ thể dựa trên lĩnh vực và sở thích (theo data/topic_registry.json)
         """
-        base_topics = []
-        
-        # Chủ đề chung
-        generic_topics = [
-            "cấu trúc dữ liệu", "thuật toán", "lập trình hướng đối tượng", 
-            "thiết kế phần mềm", "quản lý dự án", "kiến trúc ứng dụng",
-            "tối ưu hóa mã nguồn", "kiểm thử phần mềm", "phương pháp agile"
-        ]
-        
-        # Thêm chủ đề dựa trên lĩnh vực
-        if "python" in field.lower():
-            base_topics.extend([
-                "cú pháp Python", "kiểu dữ liệu trong Python", "vòng lặp và điều kiện", 
-                "hàm và module", "xử lý ngoại lệ", "làm việc với file", 
-                "thư viện numpy", "pandas", "matplotlib", "OOP trong Python",
-                "list comprehension", "generator", "decorator", "lambda function",
-                "regular expression", "virtual environment", "pip"
-            ])
-        elif "java" in field.lower():
-            base_topics.extend([
-                "cú pháp Java", "kiểu dữ liệu trong Java", "cấu trúc điều khiển", 
-                "OOP trong Java", "interface và abstract class", "collection framework", 
-                "xử lý ngoại lệ", "multithreading", "generic", "annotation",
-                "stream API", "lambda expression", "JavaFX", "JDBC", "Servlet"
-            ])
-        elif "javascript" in field.lower() or "js" in field.lower():
-            base_topics.extend([
-                "cú pháp JavaScript", "DOM manipulation", "event handling", 
-                "ES6 features", "promise", "async/await", "callback", 
-                "closure", "scope", "hoisting", "prototype", "JSON",
-                "localStorage", "sessionStorage", "AJAX", "fetch API"
-            ])
-        elif "web" in field.lower():
-            base_topics.extend([
-                "HTML", "CSS", "JavaScript", "responsive design", "CSS framework", 
-                "frontend framework", "backend development", "REST API", 
-                "authentication", "database design", "web security"
-            ])
-        elif "data" in field.lower():
-            base_topics.extend([
-                "SQL", "NoSQL", "data cleaning", "data visualization", 
-                "statistical analysis", "machine learning", "big data", 
-                "data pipeline", "ETL", "data warehousing", "BI tools"
-            ])
-        elif "mobile" in field.lower():
-            base_topics.extend([
-                "native development", "cross-platform development", "UI/UX design", 
-                "state management", "API integration", "local storage", 
-                "push notification", "app deployment", "responsive design"
-            ])
-        
-        # Thêm chủ đề dựa trên sở thích
-        for interest in interests:
-            if "web" in interest.lower():
-                base_topics.extend(["framework React", "Vue.js", "Angular", "Node.js", "Express", "Django", "Laravel"])
-            elif "data" in interest.lower():
-                base_topics.extend(["phân tích dữ liệu", "học máy", "deep learning", "trực quan hóa dữ liệu", "pandas", "sklearn"])
-            elif "automation" in interest.lower():
-                base_topics.extend(["tự động hóa quy trình", "CI/CD", "scripting", "testing automation", "RPA"])
-            elif "game" in interest.lower():
-                base_topics.extend(["game engine", "thiết kế game", "lập trình game", "3D modeling", "game physics"])
-        
-        # Kết hợp các chủ đề và loại bỏ trùng lặp
-        all_topics = list(set(base_topics + generic_topics))
-        
-        # Nếu không có chủ đề nào thì sử dụng generic topics
-        if not all_topics:
-            return generic_topics
-            
-        return all_topics
+        return get_topic_registry(self.topic_registry_file).topics_for(field, interests)
     
     def generate_level_specific_tasks(self, level: str, field: str) -> List[str]:
         """
-        Tạo danh sách các nhiệm vụ cụ thể dựa trên cấp độ và lĩnh vực
+        Tạo danh sách các nhiệm vụ cụ thể dựa trên cấp độ và lĩnh vực (theo data/topic_registry.json)
         """
-        tasks = []
-        
-        # Nhiệm vụ cho người mới bắt đầu
-        if level.lower() in ["beginner", "cơ bản", "basic", "beginer", "newbie"]:
-            tasks = [
-                f"cài đặt môi trường phát triển cho {field}",
-                f"thực hành cú pháp cơ bản trong {field}",
-                f"làm quen với IDE/editor cho {field}",
-                f"giải các bài tập cơ bản về {field}",
-                f"làm mini-project đơn giản về {field}",
-                f"đọc tài liệu cơ bản về {field}",
-                f"xem video hướng dẫn về {field}",
-                f"làm bài tập về cấu trúc dữ liệu đơn giản",
-                f"viết mã theo hướng đối tượng đơn giản",
-                f"debug lỗi cơ bản",
-                f"ghi chú và tổng hợp kiến thức",
-                f"chia sẻ mã nguồn lên GitHub"
-            ]
-        
-        # Nhiệm vụ cho người có kinh nghiệm
-        elif level.lower() in ["intermediate", "trung cấp", "trung bình"]:
-            tasks = [
-                f"áp dụng design pattern trong {field}",
-                f"tối ưu hóa mã nguồn cho {field}",
-                f"viết test cho mã nguồn {field}",
-                f"tìm hiểu framework phổ biến cho {field}",
-                f"đọc mã nguồn mở về {field}",
-                f"tham gia dự án nhóm về {field}",
-                f"tạo REST API cho ứng dụng {field}",
-                f"tách biệt các thành phần trong ứng dụng",
-                f"triển khai ứng dụng lên cloud",
-                f"tích hợp third-party API",
-                f"thiết kế database hiệu quả",
-                f"tìm hiểu security best practices"
-            ]
-        
-        # Nhiệm vụ cho người giỏi
-        else:  # Advanced, expert, etc.
-            tasks = [
-                f"thiết kế kiến trúc phức tạp cho ứng dụng {field}",
-                f"triển khai microservices cho {field}",
-                f"tối ưu hóa hiệu suất ứng dụng {field}",
-                f"xây dựng framework/thư viện cho {field}",
-                f"viết technical blog về {field}",
-                f"đóng góp cho dự án mã nguồn mở về {field}",
-                f"triển khai CI/CD pipeline",
-                f"thực hiện security audit",
-                f"tạo high-performance system",
-                f"đánh giá và cải thiện UX/UI",
-                f"thiết kế và triển khai distributed system",
-                f"nghiên cứu kỹ thuật mới cho {field}"
-            ]
-        
-        return tasks
\ No newline at end of file
+        return get_topic_registry(self.topic_registry_file).tasks_for(level, field)
\ No newline at end of file
@@ -0,0 +1,127 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from src.embeddings import EMBEDDING_BACKEND, create_embeddings
+from src.gemini_client import GeminiClient, AsyncGeminiClient
+from src.topic_registry import TopicRegistry
+from src.debug_dump import DebugDumpSink
+
+logger = logging.getLogger(__name__)
+
+# Tài nguyên dùng chung trong một process (danh mục khóa học, client embedding, client Cohere),
+# được khởi tạo khi cần lần đầu và dùng lại cho LearningPathRAG và VectorStore
+_lock = threading.RLock()
+_env_loaded = False
+_catalogs: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+_topic_registries: Dict[str, Tuple[float, TopicRegistry]] = {}
+_debug_dump_sink: Optional[DebugDumpSink] = None
+_embeddings: Dict[Tuple[str, str], Tuple[Embeddings, str]] = {}
+_cohere_clients: Dict[str, Any] = {}
+_gemini_clients: Dict[str, GeminiClient] = {}
+# Client async gắn với event loop tạo ra nó nên được lưu riêng cho từng loop
+_async_gemini_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AsyncGeminiClient]]" = weakref.WeakKeyDictionary()
+
+
+def load_environment():
+    """Load biến môi trường từ file .env (chỉ một lần cho mỗi process)"""
+    global _env_loaded
+    with _lock:
+        if not _env_loaded:
+            load_dotenv()
+            _env_loaded = True
+
+
+def get_course_catalog(courses_file: str = "data/courses.json") -> Tuple[List[Dict[str, Any]], float]:
+    """
+    Lấy danh mục khóa học dùng chung, chỉ đọc lại file khi file đã thay đổi
+
+    Returns:
+        Tuple (danh sách khóa học, thời điểm sửa đổi của file)
+    """
+    path = os.path.abspath(courses_file)
+    mtime = os.path.getmtime(path)
+    with _lock:
+        cached = _catalogs.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1], mtime
+
+        with open(path, 'r', encoding='utf-8') as f:
+            courses = json.load(f)['courses']
+        _catalogs[path] = (mtime, courses)
+        logger.info(f"Đã load {len(courses)} khóa học từ {courses_file}")
+        return courses, mtime
+
+
+def get_topic_registry(registry_file: str = "data/topic_registry.json") -> TopicRegistry:
+    """Lấy bảng chủ đề/nhiệm vụ dùng chung cho lộ trình dự phòng, chỉ đọc lại file khi file đã thay đổi"""
+    path = os.path.abspath(registry_file)
+    mtime = os.path.getmtime(path)
+    with _lock:
+        cached = _topic_registries.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        registry = TopicRegistry.load(path)
+        _topic_registries[path] = (mtime, registry)
+        return registry
+
+
+def get_debug_dump_sink() -> DebugDumpSink:
+    """Lấy nơi ghi dữ liệu debug dùng chung (cấu hình bằng các biến DEBUG_DUMP_*)"""
+    global _debug_dump_sink
+    with _lock:
+        if _debug_dump_sink is None:
+            _debug_dump_sink = DebugDumpSink()
+        return _debug_dump_sink
+
+
+def get_embeddings(backend: Optional[str] = None, cohere_api_key: Optional[str] = None) -> Tuple[Embeddings, str]:
+    """Lấy client embedding dùng chung cho backend được cấu hình"""
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    key = (backend, cohere_api_key or "")
+    with _lock:
+        if key not in _embeddings:
+            _embeddings[key] = create_embeddings(backend, cohere_api_key=cohere_api_key)
+        return _embeddings[key]
+
+
+def get_cohere_client(api_key: str):
+    """Lấy cohere.Client dùng chung cho API key"""
+    with _lock:
+        if api_key not in _cohere_clients:
+            import cohere
+            _cohere_clients[api_key] = cohere.Client(api_key=api_key)
+        return _cohere_clients[api_key]
+
+
+def get_gemini_client(api_key: str) -> GeminiClient:
+    """Lấy GeminiClient dùng chung (connection pool, giới hạn đồng thời) cho API key"""
+    with _lock:
+        if api_key not in _gemini_clients:
+            _gemini_clients[api_key] = GeminiClient(api_key)
+        return _gemini_clients[api_key]
+
+
+def get_async_gemini_client(api_key: str) -> AsyncGeminiClient:
+    """Lấy AsyncGeminiClient dùng chung cho API key trong event loop đang chạy"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_gemini_clients.setdefault(loop, {})
+        if api_key not in clients:
+            clients[api_key] = AsyncGeminiClient(api_key)
+        return clients[api_key]
+
+
+async def close_async_gemini_clients():
+    """Đóng các AsyncGeminiClient của event loop đang chạy (gọi khi server ASGI dừng)"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_gemini_clients.pop(loop, {})
+    for client in clients.values():
+        await client.aclose()
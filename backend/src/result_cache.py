@@ -0,0 +1,98 @@
+import json
+import copy
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+def canonical_request(field: str, level: str, duration: int, daily_hours: int, interests: List[str]) -> Dict[str, Any]:
+    """Chuẩn hóa tham số tạo lộ trình để các request giống nhau có cùng khóa"""
+    def normalize(text: Any) -> str:
+        return " ".join(str(text).split()).lower()
+
+    def number(value: Any) -> Any:
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return normalize(value)
+        return int(value) if value.is_integer() else value
+
+    return {
+        "field": normalize(field),
+        "level": normalize(level),
+        "duration": number(duration),
+        "daily_hours": number(daily_hours),
+        "interests": sorted({normalize(interest) for interest in interests or []}),
+    }
+
+
+def make_cache_key(request: Dict[str, Any], courses: Optional[List[Dict[str, Any]]] = None) -> str:
+    """
+    Tạo khóa cache từ tham số đã chuẩn hóa và (tùy chọn) tập khóa học được truy xuất
+
+    Args:
+        request: Kết quả của canonical_request
+        courses: Danh sách khóa học được truy xuất; chỉ tiêu đề được dùng, không phụ thuộc thứ tự
+    """
+    data = dict(request)
+    if courses is not None:
+        data["courses"] = sorted(str(course.get("title", "")) for course in courses)
+    return hashlib.sha256(json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class LearningPathCache:
+    """Cache LRU có TTL cho lộ trình học tập đã parse, lưu bản sao để tránh bị sửa từ bên ngoài"""
+
+    def __init__(self, max_size: int = 256, ttl: float = 21600):
+        """
+        Args:
+            max_size: Số lộ trình tối đa được giữ trong cache
+            ttl: Thời gian sống của mỗi lộ trình (giây)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Lấy bản sao lộ trình trong cache, trả về None nếu không có hoặc đã hết hạn"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """Lưu bản sao lộ trình vào cache, loại bỏ phần tử ít dùng nhất khi vượt quá kích thước"""
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Thống kê hit/miss của cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total > 0 else 0.0
+            }
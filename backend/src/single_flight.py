@@ -0,0 +1,105 @@
+import asyncio
+import threading
+from concurrent.futures import CancelledError, Future
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """
+    Gộp các lời gọi có cùng khóa đang chạy đồng thời thành một lần thực thi
+
+    Lời gọi đầu tiên cho một khóa (leader) thực thi hàm; các lời gọi cùng khóa đến trong lúc
+    leader đang chạy chờ trên cùng một Future và nhận chung kết quả (hoặc exception). Nếu leader
+    bị hủy, các lời gọi đang chờ thử lại từ đầu. Dùng được cho cả thread (do) và coroutine (ado),
+    hai loại lời gọi cùng khóa cũng được gộp với nhau.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        """Trả về (Future của lời gọi đang chạy, True nếu lời gọi hiện tại là leader)"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.executions += 1
+            return future, True
+
+    def _finish(self, key: str, future: Future, result: Any = None, error: BaseException = None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is None:
+            future.set_result(result)
+        elif isinstance(error, (CancelledError, asyncio.CancelledError)):
+            future.cancel()
+        else:
+            future.set_exception(error)
+
+    def _record_shared(self):
+        with self._lock:
+            self.coalesced += 1
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Thực thi fn, hoặc chờ kết quả của lời gọi cùng khóa đang chạy
+
+        Returns:
+            Tuple (kết quả, True nếu kết quả được dùng chung từ lời gọi khác)
+        """
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                result = future.result()
+            except CancelledError:
+                continue
+            self._record_shared()
+            return result, True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result, False
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Phiên bản async của do: await fn(), hoặc chờ lời gọi cùng khóa mà không chặn event loop"""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                # shield để việc hủy lời gọi đang chờ không hủy luôn Future của leader
+                result = await asyncio.shield(asyncio.wrap_future(future))
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    continue
+                raise
+            self._record_shared()
+            return result, True
+
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result, False
+
+    def stats(self) -> Dict[str, Any]:
+        """Số lời gọi đang chạy, số lần thực thi thật và số lời gọi đã được gộp"""
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executions": self.executions,
+                "coalesced": self.coalesced
+            }
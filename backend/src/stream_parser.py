@@ -0,0 +1,129 @@
+import json
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Các mảng trong learning_path mà từng phần tử được gửi cho client ngay khi hoàn chỉnh
+STREAMED_ARRAYS = {"courses": "course", "phases": "phase", "daily_plan": "day"}
+
+
+class LearningPathStreamParser:
+    """
+    Phân tích tăng dần JSON lộ trình học tập khi Gemini đang sinh từng đoạn văn bản
+
+    Mỗi lần feed() chỉ duyệt phần văn bản mới nhận được. Khi một phần tử của các mảng
+    courses, phases hoặc daily_plan được đóng lại, phần tử đó được parse và trả về ngay.
+    Bỏ qua code fence ``` và chú thích // bên ngoài chuỗi.
+    """
+
+    def __init__(self):
+        # Văn bản đã bỏ chú thích, chỉ tính từ dấu { đầu tiên
+        self.clean: List[str] = []
+        self.clean_length = 0
+        self.started = False
+        self.in_string = False
+        self.escape = False
+        self.in_comment = False
+        self.pending_slash = False
+        self.string_start = 0
+        # Ngăn xếp container: (loại "{" hoặc "[", khóa của container trong object cha, vị trí bắt đầu)
+        self.stack: List[Tuple[str, Optional[str], int]] = []
+        self.expecting_key = False
+        self.last_key: Optional[str] = None
+        self.finished = False
+
+    def _append(self, char: str):
+        self.clean.append(char)
+        self.clean_length += 1
+
+    def _text(self, start: int, end: int) -> str:
+        return "".join(self.clean[start:end])
+
+    def is_streamed_array(self) -> bool:
+        """Container hiện tại có phải một mảng cần stream, nằm trực tiếp trong learning_path (hoặc object gốc)"""
+        if not self.stack or self.stack[-1][0] != "[" or self.stack[-1][1] not in STREAMED_ARRAYS:
+            return False
+        return len(self.stack) == 2 or (len(self.stack) == 3 and self.stack[1][1] == "learning_path")
+
+    def feed(self, chunk: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Nhận thêm một đoạn văn bản
+
+        Yields:
+            Tuple (loại sự kiện, phần tử đã parse), loại là "course", "phase" hoặc "day"
+        """
+        for char in chunk:
+            if self.finished:
+                return
+
+            if not self.started:
+                if char != "{":
+                    continue
+                self.started = True
+
+            if self.in_comment:
+                if char == "\n":
+                    self.in_comment = False
+                continue
+
+            if self.in_string:
+                self._append(char)
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.expecting_key:
+                        try:
+                            self.last_key = json.loads(self._text(self.string_start, self.clean_length))
+                        except ValueError:
+                            self.last_key = None
+                continue
+
+            if self.pending_slash:
+                self.pending_slash = False
+                if char == "/":
+                    self.in_comment = True
+                    continue
+                self._append("/")
+
+            if char == "/":
+                self.pending_slash = True
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.string_start = self.clean_length
+                self._append(char)
+                continue
+
+            self._append(char)
+
+            if char in "{[":
+                key = self.last_key if self.stack and self.stack[-1][0] == "{" else None
+                self.stack.append((char, key, self.clean_length - 1))
+                self.expecting_key = char == "{"
+                self.last_key = None
+            elif char in "}]":
+                if not self.stack:
+                    continue
+                kind, key, start = self.stack.pop()
+                if kind == "{" and self.is_streamed_array():
+                    event = STREAMED_ARRAYS[self.stack[-1][1]]
+                    try:
+                        yield event, json.loads(self._text(start, self.clean_length))
+                    except ValueError as e:
+                        logger.warning(f"Không thể parse phần tử {event} khi stream: {str(e)}")
+                self.expecting_key = False
+                if not self.stack:
+                    self.finished = True
+            elif char == ",":
+                self.expecting_key = bool(self.stack) and self.stack[-1][0] == "{"
+            elif char == ":":
+                self.expecting_key = False
+
+    def text(self) -> str:
+        """Văn bản JSON (đã bỏ chú thích) nhận được cho đến hiện tại"""
+        return "".join(self.clean)
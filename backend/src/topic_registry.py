@@ -0,0 +1,102 @@
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordMatcher:
+    """
+    Tìm các từ khóa xuất hiện (dạng chuỗi con, không phân biệt hoa thường) trong văn bản bằng trie
+
+    Chi phí mỗi lần tìm tỷ lệ với độ dài văn bản và độ dài từ khóa dài nhất, không phụ thuộc
+    số lượng từ khóa. Tại mỗi vị trí chỉ từ khóa dài nhất được tính, nên "javascript" không
+    bị khớp thêm với "java".
+    """
+
+    def __init__(self):
+        self._root: Dict[str, Any] = {}
+
+    def add(self, keyword: str, value: int):
+        """Thêm từ khóa; khi một từ khóa thuộc nhiều quy tắc thì giữ quy tắc có giá trị nhỏ nhất"""
+        node = self._root
+        for char in keyword.lower():
+            node = node.setdefault(char, {})
+        node[None] = min(node.get(None, value), value)
+
+    def first_match(self, text: str) -> Optional[int]:
+        """Giá trị nhỏ nhất (quy tắc ưu tiên nhất) trong các từ khóa xuất hiện trong text"""
+        text = text.lower()
+        best = None
+        for start in range(len(text)):
+            node = self._root
+            longest = None
+            for position in range(start, len(text)):
+                node = node.get(text[position])
+                if node is None:
+                    break
+                if None in node:
+                    longest = node[None]
+            if longest is not None and (best is None or longest < best):
+                best = longest
+        return best
+
+
+class TopicRegistry:
+    """
+    Bảng chủ đề theo lĩnh vực/sở thích và nhiệm vụ theo trình độ cho lộ trình dự phòng
+
+    Quy tắc trong file được xét theo thứ tự: quy tắc đứng trước được ưu tiên khi nhiều quy tắc
+    cùng khớp. Kết quả luôn theo thứ tự cố định nên lộ trình dự phòng giống nhau giữa các process.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        self.generic_topics: List[str] = list(data["generic_topics"])
+        self.field_topics: List[List[str]] = [rule["topics"] for rule in data["fields"]]
+        self.interest_topics: List[List[str]] = [rule["topics"] for rule in data["interests"]]
+        self.field_matcher = self._build_matcher(rule["keywords"] for rule in data["fields"])
+        self.interest_matcher = self._build_matcher(rule["keywords"] for rule in data["interests"])
+
+        self.level_tasks: Dict[str, List[str]] = {}
+        default_tasks = None
+        for level in data["levels"]:
+            if level["name"] == data["default_level"]:
+                default_tasks = level["tasks"]
+            for alias in level["aliases"]:
+                self.level_tasks.setdefault(alias.lower(), level["tasks"])
+        if default_tasks is None:
+            raise ValueError(f"Không tìm thấy trình độ mặc định: {data['default_level']}")
+        self.default_tasks: List[str] = default_tasks
+
+    @staticmethod
+    def _build_matcher(rules: Iterable[List[str]]) -> KeywordMatcher:
+        matcher = KeywordMatcher()
+        for index, keywords in enumerate(rules):
+            for keyword in keywords:
+                matcher.add(keyword, index)
+        return matcher
+
+    @classmethod
+    def load(cls, registry_file: str) -> "TopicRegistry":
+        """Đọc bảng từ file JSON"""
+        with open(registry_file, 'r', encoding='utf-8') as f:
+            registry = cls(json.load(f))
+        logger.info(f"Đã load {len(registry.field_topics)} lĩnh vực, {len(registry.interest_topics)} sở thích từ {registry_file}")
+        return registry
+
+    def topics_for(self, field: str, interests: List[str]) -> List[str]:
+        """Chủ đề của lĩnh vực, rồi của từng sở thích, rồi chủ đề chung (bỏ trùng lặp, giữ thứ tự)"""
+        topics: List[str] = []
+        match = self.field_matcher.first_match(field)
+        if match is not None:
+            topics.extend(self.field_topics[match])
+        for interest in interests:
+            match = self.interest_matcher.first_match(interest)
+            if match is not None:
+                topics.extend(self.interest_topics[match])
+        return list(dict.fromkeys(topics + self.generic_topics))
+
+    def tasks_for(self, level: str, field: str) -> List[str]:
+        """Nhiệm vụ theo trình độ, {field} trong mẫu được thay bằng tên lĩnh vực"""
+        templates = self.level_tasks.get(level.lower(), self.default_tasks)
+        return [template.format(field=field) for template in templates]
@@ -1,74 +1,194 @@
 import os
 import json
+import asyncio
 import logging
+import threading
+import time
+import uuid
 from typing import List, Dict, Any, Optional
-from langchain_cohere import CohereEmbeddings
+import numpy as np
+import faiss
 from langchain_community.vectorstores import FAISS
 from langchain.schema import Document
-from dotenv import load_dotenv
-
-# Cấu hình logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('vector_store.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+from src.embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from src.embeddings import EMBEDDING_BACKEND, COHERE_EMBEDDING_MODEL
+from src.resources import load_environment, get_course_catalog, get_embeddings
+from src.logging_config import setup_logging
+
+# Cấu hình logging (dùng chung cho toàn bộ ứng dụng, xem src/logging_config.py)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# Khoảng thời gian tối thiểu (giây) giữa hai lần kiểm tra courses.json có thay đổi hay không
+COURSES_SYNC_INTERVAL = float(os.getenv("COURSES_SYNC_INTERVAL", "30"))
+
+# Kích thước và thời gian sống (giây) của cache vector câu truy vấn
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+
+def build_course_document(course: Dict[str, Any]) -> Document:
+    """Tạo Document (text representation + metadata) cho một khóa học"""
+    # Tạo text representation chi tiết hơn
+    text = f"""
+                Khóa học: {course['title']}
+                Mô tả: {course['description']}
+                Chủ đề: {', '.join(course['topics'])}
+                Cấp độ: {course['level']}
+                Điều kiện tiên quyết: {', '.join(course['prerequisites']) if course['prerequisites'] else 'Không có'}
+                Thời lượng: {course['duration']} tuần
+                """
+    
+    # Thêm metadata để dễ dàng lọc và tìm kiếm
+    metadata = {
+        'title': course['title'],
+        'level': course['level'],
+        'topics': course['topics'],
+        'duration': course['duration']
+    }
+    
+    return Document(page_content=text, metadata=metadata)
+
+def course_document_ids(courses: List[Dict[str, Any]]) -> List[str]:
+    """
+    Tạo id ổn định cho document của từng khóa học
+    
+    Id được sinh từ tiêu đề khóa học (kèm số thứ tự nếu trùng tiêu đề), nên không đổi
+    khi nội dung khóa học được chỉnh sửa hoặc thứ tự các khóa học thay đổi.
+    """
+    ids = []
+    seen: Dict[str, int] = {}
+    for course in courses:
+        title = course['title']
+        occurrence = seen.get(title, 0)
+        seen[title] = occurrence + 1
+        ids.append(str(uuid.uuid5(uuid.NAMESPACE_URL, f"course:{title}#{occurrence}")))
+    return ids
+
 class VectorStore:
-    def __init__(self):
-        """Khởi tạo vector store"""
+    def __init__(self, courses_file="data/courses.json", cohere_api_key=None):
+        """
+        Khởi tạo vector store
+        
+        Args:
+            courses_file: Đường dẫn đến file JSON chứa thông tin khóa học
+            cohere_api_key: API key của Cohere, mặc định lấy từ biến môi trường
+        """
+        # Thời gian của từng bước khởi tạo, để theo dõi thời gian khởi động worker
+        self.startup_timings = {}
+        self.vectorstore = None
+        # Cache vector câu truy vấn, tránh gọi Cohere lại cho các truy vấn lặp lại
+        # (tạo trước khi khởi tạo các phần có thể lỗi, /health luôn đọc được thống kê)
+        self.query_cache = QueryEmbeddingCache(max_size=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+        # Khóa bảo vệ index khi đồng bộ trong lúc đang phục vụ tìm kiếm
+        self._lock = threading.RLock()
+        # Khóa cho các thao tác ghi index (đồng bộ, khởi tạo lại); chỉ chặn các lần đồng bộ khác,
+        # không chặn tìm kiếm trong lúc chờ Cohere tạo embedding
+        self._sync_lock = threading.RLock()
         try:
             # Load environment variables
-            load_dotenv()
+            load_environment()
             
             # Lấy COHERE_API_KEY từ biến môi trường
-            self.cohere_api_key = os.getenv("COHERE_API_KEY")
+            self.cohere_api_key = cohere_api_key or os.getenv("COHERE_API_KEY")
             if self.cohere_api_key:
                 logger.info("Cohere API key found in environment variables.")
             else:
                 logger.warning("No Cohere API key found in environment variables.")
                 self.cohere_api_key = ""
             
-            # Tạo embeddings
-            self.embeddings = CohereEmbeddings(
-                cohere_api_key=self.cohere_api_key,
-                model="embed-multilingual-v3.0",
-                user_agent="langchain",
+            # Lấy client embedding dùng chung theo backend được cấu hình (EMBEDDING_BACKEND)
+            step_start = time.perf_counter()
+            self.embedding_backend = EMBEDDING_BACKEND
+            self.embeddings, self.embedding_model = get_embeddings(
+                self.embedding_backend, cohere_api_key=self.cohere_api_key
             )
+            self.startup_timings["embeddings"] = time.perf_counter() - step_start
                 
-            # Đường dẫn đến thư mục và file lưu vector store
+            # Đường dẫn đến file khóa học, thư mục và file lưu vector store
+            # Mỗi backend dùng một index riêng để không trộn lẫn vector của các backend khác nhau
+            self.courses_file = courses_file
             self.index_folder = "index_data"
-            self.index_name = "index"
+            self.index_name = "index" if self.embedding_backend == "cohere" else f"index_{self.embedding_backend}"
             self.index_file = os.path.join(self.index_folder, f"{self.index_name}.faiss")
+            self.index_meta_file = os.path.join(self.index_folder, f"{self.index_name}.meta.json")
+            
+            # Cache embedding theo nội dung khóa học, dùng khi phải tạo lại index
+            cache_name = "embedding_cache" if self.embedding_backend == "cohere" else f"embedding_cache_{self.embedding_backend}"
+            self.embedding_cache = EmbeddingCache(os.path.join(self.index_folder, f"{cache_name}.pkl"))
+            
+            self.courses_mtime = None
+            self.last_sync_check = 0.0
             
             # Kiểm tra và tải vector store nếu tồn tại
             try:
                 if os.path.exists(self.index_file):
                     logger.info(f"Tải vector store từ file {self.index_file}")
+                    step_start = time.perf_counter()
+                    self.check_index_meta()
                     self.vectorstore = FAISS.load_local(
                         self.index_folder, 
                         self.embeddings, 
                         self.index_name,
                         allow_dangerous_deserialization=True
                     )
+                    self.startup_timings["load_index"] = time.perf_counter() - step_start
                     logger.info("Vector store đã được khởi tạo thành công")
+                    
+                    # Đồng bộ các thay đổi của courses.json kể từ lần lưu index trước
+                    step_start = time.perf_counter()
+                    try:
+                        self.sync_vector_store()
+                    except Exception as e:
+                        logger.warning(f"Không thể đồng bộ vector store với {self.courses_file}: {str(e)}")
+                    self.startup_timings["sync"] = time.perf_counter() - step_start
                 else:
                     logger.warning(f"File index {self.index_file} không tồn tại, vector store sẽ được khởi tạo")
+                    step_start = time.perf_counter()
                     self.initialize_vector_store()
+                    self.startup_timings["build_index"] = time.perf_counter() - step_start
             except Exception as e:
                 logger.warning(f"Không thể tải vector store từ file: {str(e)}")
                 # Khởi tạo vector store mới
+                step_start = time.perf_counter()
                 self.initialize_vector_store()
+                self.startup_timings["build_index"] = time.perf_counter() - step_start
                 
         except Exception as e:
             logger.error(f"Lỗi khởi tạo VectorStore: {str(e)}")
             self.vectorstore = None
 
-    def initialize_vector_store(self, courses_file="data/courses.json"):
+    def check_index_meta(self):
+        """Kiểm tra index đã lưu được tạo bởi đúng backend và model embedding hiện tại"""
+        if os.path.exists(self.index_meta_file):
+            with open(self.index_meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        else:
+            # Index cũ chưa có metadata luôn được tạo bằng Cohere
+            meta = {"backend": "cohere", "model": COHERE_EMBEDDING_MODEL}
+        
+        if meta.get("backend") != self.embedding_backend or meta.get("model") != self.embedding_model:
+            raise ValueError(
+                f"Index được tạo bởi {meta.get('backend')}/{meta.get('model')}, "
+                f"không khớp với {self.embedding_backend}/{self.embedding_model}"
+            )
+
+    def save_index(self):
+        """Lưu vector store ra file kèm metadata về backend embedding đã tạo ra nó"""
+        if not os.path.exists(self.index_folder):
+            os.makedirs(self.index_folder)
+        
+        self.vectorstore.save_local(self.index_folder, self.index_name)
+        with open(self.index_meta_file, 'w', encoding='utf-8') as f:
+            json.dump({"backend": self.embedding_backend, "model": self.embedding_model}, f)
+        self.embedding_cache.save()
+
+    def load_courses(self, courses_file: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Lấy danh mục khóa học dùng chung và ghi nhận thời điểm sửa đổi của file"""
+        courses, mtime = get_course_catalog(courses_file or self.courses_file)
+        self.courses_mtime = mtime
+        return courses
+
+    def initialize_vector_store(self, courses_file=None):
         """
         Khởi tạo vector store từ file khóa học
         
@@ -77,41 +197,20 @@ class VectorStore:
         """
         try:
             # Load khóa học từ file
-            with open(courses_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                courses = data['courses']
+            courses = self.load_courses(courses_file)
             
-            # Tạo text representations cho các khóa học
-            texts = []
-            metadatas = []
+            # Tạo documents cho các khóa học
+            documents = [build_course_document(course) for course in courses]
+            ids = course_document_ids(courses)
+            texts = [doc.page_content for doc in documents]
+            metadatas = [doc.metadata for doc in documents]
             
-            for course in courses:
-                # Tạo text representation chi tiết hơn
-                text = f"""
-                Khóa học: {course['title']}
-                Mô tả: {course['description']}
-                Chủ đề: {', '.join(course['topics'])}
-                Cấp độ: {course['level']}
-                Điều kiện tiên quyết: {', '.join(course['prerequisites']) if course['prerequisites'] else 'Không có'}
-                Thời lượng: {course['duration']} tuần
-                """
-                
-                # Thêm metadata để dễ dàng lọc và tìm kiếm
-                metadata = {
-                    'title': course['title'],
-                    'level': course['level'],
-                    'topics': course['topics'],
-                    'duration': course['duration']
-                }
-                
-                texts.append(text)
-                metadatas.append(metadata)
-            
-            # Tạo documents
-            documents = [
-                Document(page_content=text, metadata=metadata)
-                for text, metadata in zip(texts, metadatas)
-            ]
+            # Chỉ gọi Cohere cho các khóa học mới hoặc đã thay đổi
+            vectors = self.embedding_cache.embed_documents(
+                texts, self.embedding_model, self.embeddings.embed_documents
+            )
+            keys = [EmbeddingCache.make_key(text, self.embedding_model) for text in texts]
+            self.embedding_cache.retain(keys)
             
             # Nếu đã có vector store, thì xóa bỏ và tạo mới
             if os.path.exists(self.index_file):
@@ -120,21 +219,13 @@ class VectorStore:
                 if os.path.exists(pkl_file):
                     os.remove(pkl_file)
             
-            # Khởi tạo embeddings model
-            embeddings = CohereEmbeddings(
-                cohere_api_key=os.getenv("COHERE_API_KEY"),
-                model="embed-multilingual-v3.0",
-                user_agent="learning-path-rag"
+            # Tạo vector store từ các embedding đã có
+            self.vectorstore = FAISS.from_embeddings(
+                list(zip(texts, vectors)), self.embeddings, metadatas=metadatas, ids=ids
             )
             
-            # Tạo vector store
-            self.vectorstore = FAISS.from_documents(documents, embeddings)
-            
             # Lưu vector store ra file
-            if not os.path.exists(self.index_folder):
-                os.makedirs(self.index_folder)
-                
-            self.vectorstore.save_local(self.index_folder, self.index_name)
+            self.save_index()
             
             logger.info("Đã tạo vector store thành công")
             
@@ -142,36 +233,221 @@ class VectorStore:
             logger.error(f"Lỗi khi khởi tạo vector store: {str(e)}")
             raise
 
+    def sync_vector_store(self, courses_file=None) -> Dict[str, int]:
+        """
+        Đồng bộ tăng dần vector store với file khóa học
+        
+        So sánh danh sách khóa học với docstore hiện tại, chỉ thêm, xóa hoặc thay thế
+        các vector bị ảnh hưởng (giữ nguyên id ổn định) rồi lưu lại index.
+        
+        Args:
+            courses_file: Đường dẫn đến file JSON chứa thông tin khóa học
+            
+        Returns:
+            Dict thống kê số khóa học được thêm, cập nhật và xóa
+        """
+        with self._sync_lock:
+            if not self.vectorstore:
+                self.initialize_vector_store(courses_file)
+                total = self.vectorstore.index.ntotal
+                return {"added": total, "updated": 0, "removed": 0}
+            
+            courses = self.load_courses(courses_file)
+            new_docs = dict(zip(course_document_ids(courses), (build_course_document(c) for c in courses)))
+            
+            # Document hiện có trong index, theo id (chỉ các thao tác ghi giữ _sync_lock mới sửa index,
+            # nên đọc ở đây không cần khóa _lock)
+            docstore = self.vectorstore.docstore
+            existing_docs = {}
+            for position, doc_id in self.vectorstore.index_to_docstore_id.items():
+                doc = docstore.search(doc_id)
+                if isinstance(doc, Document):
+                    existing_docs[doc_id] = (position, doc)
+            
+            added = [doc_id for doc_id in new_docs if doc_id not in existing_docs]
+            removed = [doc_id for doc_id in existing_docs if doc_id not in new_docs]
+            updated = [
+                doc_id for doc_id, doc in new_docs.items()
+                if doc_id in existing_docs and (
+                    existing_docs[doc_id][1].page_content != doc.page_content
+                    or existing_docs[doc_id][1].metadata != doc.metadata
+                )
+            ]
+            
+            stats = {"added": len(added), "updated": len(updated), "removed": len(removed)}
+            if not (added or removed or updated):
+                logger.info("Vector store đã đồng bộ với file khóa học, không có thay đổi")
+                return stats
+            
+            # Đưa vector của các document sắp bị xóa vào cache, để index cũ (id ngẫu nhiên)
+            # hoặc khóa học bị đổi tên không phải gọi lại Cohere
+            for doc_id in removed:
+                position, doc = existing_docs[doc_id]
+                key = EmbeddingCache.make_key(doc.page_content, self.embedding_model)
+                if key not in self.embedding_cache:
+                    self.embedding_cache.put(key, self.vectorstore.index.reconstruct(position).tolist())
+            
+            to_delete = removed + updated
+            to_add = added + updated
+            texts = [new_docs[doc_id].page_content for doc_id in to_add]
+            metadatas = [new_docs[doc_id].metadata for doc_id in to_add]
+            # Gọi Cohere ngoài khóa _lock để tìm kiếm không phải chờ cả lượt gọi mạng
+            vectors = self.embedding_cache.embed_documents(
+                texts, self.embedding_model, self.embeddings.embed_documents
+            )
+            self.embedding_cache.retain(
+                EmbeddingCache.make_key(doc.page_content, self.embedding_model) for doc in new_docs.values()
+            )
+            
+            with self._lock:
+                if to_delete:
+                    self.vectorstore.delete(to_delete)
+                if to_add:
+                    self.vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=to_add)
+                self.save_index()
+            
+            logger.info(f"Đã đồng bộ vector store: {stats}")
+            return stats
+
+    def refresh_if_changed(self):
+        """Đồng bộ vector store nếu courses.json đã thay đổi (kiểm tra tối đa mỗi COURSES_SYNC_INTERVAL giây)"""
+        now = time.monotonic()
+        if now - self.last_sync_check < COURSES_SYNC_INTERVAL:
+            return
+        self.last_sync_check = now
+        
+        try:
+            mtime = os.path.getmtime(self.courses_file)
+        except OSError:
+            return
+        
+        if self.courses_mtime is not None and mtime == self.courses_mtime:
+            return
+        
+        try:
+            logger.info(f"Phát hiện {self.courses_file} thay đổi, đồng bộ vector store")
+            self.sync_vector_store()
+        except Exception as e:
+            logger.warning(f"Không thể đồng bộ vector store: {str(e)}")
+
+    @staticmethod
+    def format_search_results(docs) -> List[Dict[str, Any]]:
+        """Chuyển danh sách (Document, score) thành danh sách khóa học trả về cho client"""
+        results = []
+        for doc, score in docs:
+            metadata = doc.metadata
+            results.append({
+                "title": metadata.get("title", "Unknown"),
+                "level": metadata.get("level", "Unknown"),
+                "duration": metadata.get("duration", 0),
+                "topics": metadata.get("topics", []),
+                "relevance_score": float(1 - score)  # Convert distance to similarity
+            })
+        return results
+
+    def ensure_ready(self):
+        """Đồng bộ nếu courses.json thay đổi và khởi tạo lại vector store nếu chưa có"""
+        if self.vectorstore:
+            self.refresh_if_changed()
+        
+        if not self.vectorstore:
+            with self._sync_lock:
+                if not self.vectorstore:
+                    logger.warning("Vector store chưa được khởi tạo, thử khởi tạo lại")
+                    self.initialize_vector_store()
+            
+        if not self.vectorstore:
+            raise ValueError("Vector store chưa được khởi tạo và không thể khởi tạo tự động")
+
+    def search_by_vector(self, embedding: List[float], n_results: int = 5) -> List[Dict[str, Any]]:
+        """Tìm kiếm khóa học theo vector câu truy vấn đã có"""
+        with self._lock:
+            docs = self.vectorstore.similarity_search_with_score_by_vector(embedding, k=n_results)
+        # Chỉ format danh sách Document khi bật DEBUG cho module này
+        logger.debug("Kết quả tìm kiếm (docs): %s", docs)
+        return self.format_search_results(docs)
+
     def search_courses(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
         """Tìm kiếm khóa học phù hợp dựa trên câu truy vấn"""
         try:
-            if not self.vectorstore:
-                logger.warning("Vector store chưa được khởi tạo, thử khởi tạo lại")
-                self.initialize_vector_store()
-                
-            if not self.vectorstore:
-                raise ValueError("Vector store chưa được khởi tạo và không thể khởi tạo tự động")
+            self.ensure_ready()
             
             # Tìm kiếm các document phù hợp
             logger.info(f"Thực hiện similarity_search_with_score cho query: '{query}'")
-            docs = self.vectorstore.similarity_search_with_score(query, k=n_results)
-            logger.info(f"Kết quả tìm kiếm (docs): {docs}") # Log kết quả trả về
-            
-            # Format kết quả
-            results = []
-            for doc, score in docs:
-                metadata = doc.metadata
-                results.append({
-                    "title": metadata.get("title", "Unknown"),
-                    "level": metadata.get("level", "Unknown"),
-                    "duration": metadata.get("duration", 0),
-                    "topics": metadata.get("topics", []),
-                    "relevance_score": 1 - score  # Convert distance to similarity
-                })
-            
-            return results
+            embedding = self.query_cache.embed_query(query, self.embedding_model, self.embeddings.embed_query)
+            return self.search_by_vector(embedding, n_results)
             
         except Exception as e:
             # logger.error(f"Lỗi tìm kiếm khóa học: {str(e)}") # Dòng cũ
             logger.exception(f"Lỗi tìm kiếm khóa học:") # Log đầy đủ traceback
-            return [] 
\ No newline at end of file
+            return [] 
+
+    async def asearch_courses(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
+        """
+        Phiên bản async của search_courses
+        
+        Embedding câu truy vấn được await trên event loop (client async của Cohere); đồng bộ
+        index và tìm kiếm FAISS chạy trong thread pool vì có thể phải chờ khóa của vector store.
+        """
+        try:
+            await asyncio.to_thread(self.ensure_ready)
+            
+            logger.info(f"Thực hiện similarity_search_with_score (async) cho query: '{query}'")
+            embedding = await self.query_cache.aembed_query(query, self.embedding_model, self.embeddings.aembed_query)
+            return await asyncio.to_thread(self.search_by_vector, embedding, n_results)
+            
+        except Exception as e:
+            logger.exception(f"Lỗi tìm kiếm khóa học (async):")
+            return []
+
+    def search_courses_batch(self, queries: List[str], n_results: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Tìm kiếm khóa học cho nhiều câu truy vấn cùng lúc
+        
+        Các câu truy vấn chưa có trong cache được embedding trong một lần gọi Cohere,
+        sau đó toàn bộ được tìm kiếm bằng một lần index.search trên ma trận vector.
+        
+        Args:
+            queries: Danh sách câu truy vấn
+            n_results: Số khóa học tối đa cho mỗi câu truy vấn
+            
+        Returns:
+            Danh sách kết quả theo thứ tự của queries, mỗi phần tử có cùng dạng với search_courses
+        """
+        if not queries:
+            return []
+        
+        try:
+            self.ensure_ready()
+            
+            logger.info("Thực hiện tìm kiếm theo lô cho %d query", len(queries))
+            logger.debug("Các query: %s", queries)
+            embeddings = self.query_cache.embed_queries(
+                queries, self.embedding_model,
+                lambda texts: self.embeddings.embed(texts, input_type="search_query")
+            )
+            vectors = np.array(embeddings, dtype=np.float32)
+            
+            with self._lock:
+                if self.vectorstore._normalize_L2:
+                    faiss.normalize_L2(vectors)
+                
+                k = min(n_results, self.vectorstore.index.ntotal)
+                scores, indices = self.vectorstore.index.search(vectors, k)
+                
+                batch_results = []
+                for row_scores, row_indices in zip(scores, indices):
+                    docs = []
+                    for score, position in zip(row_scores, row_indices):
+                        if position == -1:
+                            continue
+                        doc = self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[position])
+                        if isinstance(doc, Document):
+                            docs.append((doc, score))
+                    batch_results.append(self.format_search_results(docs))
+            
+            return batch_results
+            
+        except Exception as e:
+            logger.exception(f"Lỗi tìm kiếm khóa học theo lô:")
+            return [[] for _ in queries]
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# database.py mở ./learning_path.db theo thư mục hiện tại: chạy test trong thư mục tạm để
+# learning_path.db của dự án không bị sửa; không ghi file log
+os.environ.setdefault("LOG_FILE", "")
+os.chdir(tempfile.mkdtemp(prefix="learning_path_tests_"))
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from src.database import Base, engine, SessionLocal, User, LearningPath, Task, Progress
+from src.auth_api import active_tokens
+from src.progress_api import progress_api
+
+TASKS_PER_PATH = 6
+
+
+@pytest.fixture
+def client():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = User(username="tester", email="tester@example.com", hashed_password="-")
+    db.add(user)
+    db.commit()
+    active_tokens["test-token"] = user.id
+    db.close()
+
+    app = Flask(__name__)
+    app.register_blueprint(progress_api)
+    yield app.test_client(), {"Authorization": "Bearer test-token"}
+    active_tokens.pop("test-token", None)
+
+
+def seed_paths(count):
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == "tester").one()
+        for i in range(count):
+            path = LearningPath(user_id=user.id, field=f"Field {i}", level="Beginner", duration=1,
+                                daily_hours=2, total_hours=60, total_days=30,
+                                created_at=datetime(2025, 1, 1) + timedelta(hours=i))
+            db.add(path)
+            db.flush()
+            for j in range(TASKS_PER_PATH):
+                db.add(Task(learning_path_id=path.id, user_id=user.id, title=f"Task {j}", completed=j % 2 == 0,
+                            date=datetime(2025, 1, 1) + timedelta(days=j), phase=f"Phase {j % 3}"))
+            for k in range(3):
+                db.add(Progress(user_id=user.id, learning_path_id=path.id, skill_name=f"Phase {k}",
+                                progress_percentage=50))
+        db.commit()
+    finally:
+        db.close()
+
+
+def count_statements(call):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = call()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return response, len(statements)
+
+
+def test_get_learning_paths_query_count_is_constant(client):
+    test_client, headers = client
+    counts = {}
+    seeded = 0
+    for total in (1, 5, 30):
+        seed_paths(total - seeded)
+        seeded = total
+        response, counts[total] = count_statements(
+            lambda: test_client.get("/api/progress/learning-paths", headers=headers)
+        )
+        assert response.status_code == 200
+        paths = response.get_json()["learning_paths"]
+        assert len(paths) == total
+        assert all(path["progress"]["total_tasks"] == TASKS_PER_PATH for path in paths)
+        assert all(path["progress"]["completed_tasks"] == TASKS_PER_PATH // 2 for path in paths)
+        assert all(len(path["progress"]["skills"]) == 3 for path in paths)
+
+    assert counts[1] == counts[5] == counts[30], counts
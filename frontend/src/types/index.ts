@@ -11,6 +11,20 @@ export interface DailyTask {
   tasks: string[];
 }
 
+export interface DailyPlanWindow {
+  from: string;
+  to: string;
+  total_days: number;
+}
+
+export interface DailyPlanTemplate {
+  start_date: string;
+  total_days: number;
+  daily_hours: number;
+  topics: string[];
+  tasks: string[];
+}
+
 export interface Phase {
   duration: number;
   name: string;
@@ -21,6 +35,8 @@ export interface LearningPath {
   courses: Course[];
   daily_hours: number;
   daily_plan: DailyTask[];
+  daily_plan_template?: DailyPlanTemplate;
+  daily_plan_window?: DailyPlanWindow;
   duration: number;
   field: string;
   interests: string[];